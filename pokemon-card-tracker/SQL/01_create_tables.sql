@@ -1,5 +1,7 @@
 -- 01_create_tables.sql
 PRAGMA foreign_keys = ON;
+-- only takes effect on a new, empty file; lets maintenance.py reclaim free pages incrementally
+PRAGMA auto_vacuum = INCREMENTAL;
 
 DROP TABLE IF EXISTS inventory_item;
 DROP TABLE IF EXISTS card;
@@ -0,0 +1,17 @@
+-- 05_change_log.sql
+-- Append-only change feed. Every create/update/delete writes one row here in
+-- the same transaction as the mutation, so GET /changes?since=<seq> can hand
+-- clients deltas instead of full lists. Safe to re-run (applied by db.py).
+
+CREATE TABLE IF NOT EXISTS change_log (
+  seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name  TEXT NOT NULL,                      -- card_set / card / card_condition / inventory_item
+  row_id      INTEGER NOT NULL,
+  op          TEXT NOT NULL,                      -- insert / update / delete
+  row_json    TEXT,                               -- row as the list endpoints return it (NULL for delete)
+  changed_at  TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+
+  CONSTRAINT ck_change_op CHECK (op IN ('insert','update','delete'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_table_seq ON change_log(table_name, seq);
@@ -0,0 +1,20 @@
+-- 06_inventory_archive.sql
+-- Inventory rows whose quantity was adjusted down to 0 under the "archive"
+-- zero-quantity policy (POST /inventory/{item_id}/adjust). Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS inventory_archive (
+  archive_id     INTEGER PRIMARY KEY,
+  item_id        INTEGER NOT NULL,                 -- item_id it had in inventory_item
+  card_id        INTEGER NOT NULL,
+  condition_id   INTEGER NOT NULL,
+  is_foil        INTEGER NOT NULL,
+  is_graded      INTEGER NOT NULL,
+  graded_company TEXT,
+  grade          REAL,
+  purchase_price REAL NOT NULL,
+  purchase_date  TEXT,
+  notes          TEXT,
+  archived_at    TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_inventory_archive_card_id ON inventory_archive(card_id);
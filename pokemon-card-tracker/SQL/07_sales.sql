@@ -0,0 +1,23 @@
+-- 07_sales.sql
+-- Sales ledger bookkeeping. The sales themselves live in one table per
+-- month (sale_YYYYMM), created on first use by SaleRepository; this file
+-- holds the partition registry and the pre-aggregated rollups that
+-- GET /sales/summary reads. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS sale_partition (
+  month          TEXT PRIMARY KEY,                 -- 'YYYY-MM'
+  table_name     TEXT NOT NULL UNIQUE,             -- sale_YYYYMM
+  archived_path  TEXT,                             -- set once compacted into its own file
+  archived_at    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sale_rollup (
+  period_type    TEXT NOT NULL,                    -- 'day' | 'month'
+  period         TEXT NOT NULL,                    -- 'YYYY-MM-DD' | 'YYYY-MM'
+  sales_count    INTEGER NOT NULL DEFAULT 0,
+  units          INTEGER NOT NULL DEFAULT 0,
+  revenue        REAL NOT NULL DEFAULT 0,
+  cost           REAL NOT NULL DEFAULT 0,          -- purchase_price * units at time of sale
+  PRIMARY KEY (period_type, period),
+  CONSTRAINT ck_period_type CHECK (period_type IN ('day','month'))
+);
@@ -0,0 +1,54 @@
+-- 08_want_lists.sql
+-- Customer want-lists and their stored inventory matches. Entries name a
+-- card by set_code + card_number or by card_name (any printing); matches
+-- are kept up to date incrementally from change_log (see WantListRepository).
+-- Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS want_list (
+  want_list_id   INTEGER PRIMARY KEY,
+  customer       TEXT NOT NULL,
+  notes          TEXT,
+  created_at     TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS want_list_entry (
+  entry_id       INTEGER PRIMARY KEY,
+  want_list_id   INTEGER NOT NULL,
+  set_code       TEXT,
+  card_number    TEXT,
+  card_name      TEXT,
+  quantity       INTEGER NOT NULL DEFAULT 1,
+  min_condition  TEXT NOT NULL DEFAULT 'DMG',      -- worst acceptable condition_code
+  graded         TEXT NOT NULL DEFAULT 'any',      -- any / graded / ungraded
+  min_grade      REAL,                             -- only graded copies at or above this grade
+
+  FOREIGN KEY (want_list_id) REFERENCES want_list(want_list_id) ON DELETE CASCADE,
+
+  CONSTRAINT ck_want_card CHECK ((set_code IS NOT NULL AND card_number IS NOT NULL) OR card_name IS NOT NULL),
+  CONSTRAINT ck_want_quantity CHECK (quantity >= 1),
+  CONSTRAINT ck_want_min_condition CHECK (min_condition IN ('NM','LP','MP','HP','DMG')),
+  CONSTRAINT ck_want_graded CHECK (graded IN ('any','graded','ungraded'))
+);
+
+CREATE TABLE IF NOT EXISTS want_list_match (
+  entry_id       INTEGER NOT NULL,
+  item_id        INTEGER NOT NULL,
+  want_list_id   INTEGER NOT NULL,
+  card_id        INTEGER NOT NULL,
+  PRIMARY KEY (entry_id, item_id),
+  FOREIGN KEY (entry_id) REFERENCES want_list_entry(entry_id) ON DELETE CASCADE
+);
+
+-- change_log position the stored matches reflect (single row)
+CREATE TABLE IF NOT EXISTS want_match_state (
+  id             INTEGER PRIMARY KEY CHECK (id = 1),
+  last_seq       INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO want_match_state (id, last_seq) VALUES (1, 0);
+
+CREATE INDEX IF NOT EXISTS idx_want_list_entry_list ON want_list_entry(want_list_id);
+CREATE INDEX IF NOT EXISTS idx_want_list_entry_set_number ON want_list_entry(set_code, card_number);
+CREATE INDEX IF NOT EXISTS idx_want_list_entry_name ON want_list_entry(lower(card_name));
+CREATE INDEX IF NOT EXISTS idx_want_list_match_item ON want_list_match(item_id);
+CREATE INDEX IF NOT EXISTS idx_want_list_match_card ON want_list_match(card_id);
+CREATE INDEX IF NOT EXISTS idx_want_list_match_list ON want_list_match(want_list_id);
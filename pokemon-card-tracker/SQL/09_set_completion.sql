@@ -0,0 +1,24 @@
+-- 09_set_completion.sql
+-- Per-set completion bitmaps. Cards of a set get a position (card_number
+-- order); bit N of set_completion.bitmap is 1 when the card at position N
+-- has inventory with quantity > 0. Rows are built on first request and
+-- then maintained by the repositories on inventory/card writes, so
+-- completion reads never touch inventory_item. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS set_completion (
+  set_id         INTEGER PRIMARY KEY,
+  total          INTEGER NOT NULL,
+  owned          INTEGER NOT NULL,
+  bitmap         BLOB NOT NULL,                    -- LSB-first: position N -> byte N/8, bit N%8
+  updated_at     TEXT NOT NULL,
+  FOREIGN KEY (set_id) REFERENCES card_set(set_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS set_card_position (
+  card_id        INTEGER PRIMARY KEY,
+  set_id         INTEGER NOT NULL,
+  position       INTEGER NOT NULL,
+  FOREIGN KEY (card_id) REFERENCES card(card_id) ON DELETE CASCADE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_set_card_position ON set_card_position(set_id, position);
@@ -0,0 +1,14 @@
+-- 10_catalog_sync.sql
+-- Content hash of each card as last written by catalog_sync.py, so a weekly
+-- re-sync only touches cards whose dump row changed. A manual edit through
+-- the API drops the card's hash (CardRepository.update). Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS card_content_hash (
+  card_id        INTEGER PRIMARY KEY,
+  content_hash   TEXT NOT NULL,                    -- sha1 of card_name / rarity / card_type
+  synced_at      TEXT NOT NULL,
+  FOREIGN KEY (card_id) REFERENCES card(card_id) ON DELETE CASCADE
+);
+
+-- by-name lookups (want-list entries) resolve through this
+CREATE INDEX IF NOT EXISTS idx_card_name_lower ON card(lower(card_name));
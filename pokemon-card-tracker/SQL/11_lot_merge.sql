@@ -0,0 +1,33 @@
+-- 11_lot_merge.sql
+-- Lot consolidation: the grouping index that finds inventory rows for the
+-- same card/condition/foil/grade, and a log of every merge so it can be
+-- undone (POST /admin/lots/merges/{merge_id}/undo). Safe to re-run.
+
+-- quantity is included so the duplicate search (GROUP BY the lot key,
+-- SUM(quantity)) is answered from the index alone, in key order, without
+-- row lookups or a temp B-tree; it replaces the narrower idx_inventory_lot.
+DROP INDEX IF EXISTS idx_inventory_lot;
+CREATE INDEX IF NOT EXISTS idx_inventory_lot_qty
+  ON inventory_item(card_id, condition_id, is_foil, is_graded, graded_company, grade, quantity);
+
+CREATE TABLE IF NOT EXISTS lot_merge_log (
+  merge_id       INTEGER PRIMARY KEY,
+  kept_item_id   INTEGER NOT NULL,                 -- surviving row
+  merged_count   INTEGER NOT NULL,                 -- rows folded into it
+  kept_before    TEXT NOT NULL,                    -- JSON: surviving row before the merge
+  kept_after     TEXT NOT NULL,                    -- JSON: surviving row right after the merge
+  merged_rows    TEXT NOT NULL,                    -- JSON array: the deleted rows, as they were
+  merged_at      TEXT NOT NULL,
+  undone_at      TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_lot_merge_log_kept ON lot_merge_log(kept_item_id);
+
+-- change_log position the last complete consolidation pass covered (single
+-- row). The next pass only probes idx_inventory_lot_qty for the lot keys of
+-- inventory rows inserted or updated after it.
+CREATE TABLE IF NOT EXISTS lot_scan_state (
+  id             INTEGER PRIMARY KEY CHECK (id = 1),
+  last_seq       INTEGER                           -- NULL: no complete pass yet
+);
+INSERT OR IGNORE INTO lot_scan_state (id, last_seq) VALUES (1, NULL);
@@ -0,0 +1,16 @@
+-- 12_maintenance.sql
+-- Bookkeeping for the maintenance scheduler (maintenance.py): one row per
+-- task with when it last ran, the change_log head at that time (to measure
+-- write volume since), and its last result. Shared by every worker process
+-- so a task due in one worker is not repeated by the others. SQLite only;
+-- PostgreSQL maintains itself with autovacuum. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS maintenance_run (
+  task           TEXT PRIMARY KEY,                 -- optimize | vacuum | quick_check | prune_changes
+  last_run_at    TEXT,
+  last_seq       INTEGER NOT NULL DEFAULT 0,       -- change_log head when it last ran
+  last_ms        REAL,
+  last_result    TEXT,
+  runs           INTEGER NOT NULL DEFAULT 0,
+  freed_pages    INTEGER NOT NULL DEFAULT 0        -- total pages returned to the OS (vacuum)
+);
@@ -0,0 +1,19 @@
+-- 13_change_feed.sql
+-- Bookkeeping for the change feed. floor_seq is the oldest cursor the feed
+-- still serves: change_log rows up to it may be gone (pruned by the
+-- maintenance task in maintenance.py, or rewound by a restore in
+-- backup.py), so GET /changes?since=<seq> with seq < floor_seq answers 410
+-- and the client reloads its full lists. The change_log head and every
+-- table version are reported as at least floor_seq. Safe to re-run
+-- (applied by db.py).
+
+CREATE TABLE IF NOT EXISTS change_feed (
+  id          INTEGER PRIMARY KEY CHECK (id = 1),
+  floor_seq   INTEGER NOT NULL DEFAULT 0,
+  updated_at  TEXT                                -- when floor_seq last moved
+);
+
+INSERT OR IGNORE INTO change_feed (id, floor_seq) VALUES (1, 0);
+
+-- compaction looks up older entries for the same row with one index seek
+CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log(table_name, row_id, seq);
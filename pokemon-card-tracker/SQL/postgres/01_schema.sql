@@ -0,0 +1,82 @@
+-- postgres/01_schema.sql
+-- PostgreSQL version of 01_create_tables.sql + 05_change_log.sql.
+-- Loaded by db.PostgresBackend.init_schema(); seeds reuse SQL/02-04.
+
+-- tables from later files that reference these
+DROP TABLE IF EXISTS card_content_hash;
+DROP TABLE IF EXISTS set_card_position;
+DROP TABLE IF EXISTS set_completion;
+DROP TABLE IF EXISTS change_log;
+DROP TABLE IF EXISTS inventory_item;
+DROP TABLE IF EXISTS card;
+DROP TABLE IF EXISTS card_set;
+DROP TABLE IF EXISTS card_condition;
+
+CREATE TABLE card_set (
+  set_id        INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  set_code      TEXT NOT NULL UNIQUE,
+  set_name      TEXT NOT NULL,
+  release_date  TEXT NOT NULL,                     -- ISO date string "YYYY-MM-DD"
+  era           TEXT NOT NULL
+);
+
+CREATE TABLE card (
+  card_id     INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  set_id      INTEGER NOT NULL REFERENCES card_set(set_id) ON DELETE RESTRICT ON UPDATE CASCADE,
+  card_number TEXT NOT NULL,
+  card_name   TEXT NOT NULL,
+  rarity      TEXT NOT NULL,
+  card_type   TEXT NOT NULL,
+  CONSTRAINT uq_card_per_set UNIQUE (set_id, card_number),
+  CONSTRAINT ck_rarity CHECK (rarity IN ('Common','Uncommon','Rare','Double Rare','Ultra Rare','IR','SIR','Hyper Rare','Promo')),
+  CONSTRAINT ck_card_type CHECK (card_type IN ('Pokémon','Trainer','Energy'))
+);
+
+CREATE TABLE card_condition (
+  condition_id   INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  condition_code TEXT NOT NULL UNIQUE,
+  description    TEXT NOT NULL,
+  CONSTRAINT ck_condition_code CHECK (condition_code IN ('NM','LP','MP','HP','DMG'))
+);
+
+CREATE TABLE inventory_item (
+  item_id        INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  card_id        INTEGER NOT NULL REFERENCES card(card_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  condition_id   INTEGER NOT NULL REFERENCES card_condition(condition_id) ON DELETE RESTRICT ON UPDATE CASCADE,
+  is_foil        INTEGER NOT NULL DEFAULT 0,
+  is_graded      INTEGER NOT NULL DEFAULT 0,
+  graded_company TEXT,
+  grade          DOUBLE PRECISION,
+  quantity       INTEGER NOT NULL DEFAULT 1,
+  purchase_price DOUBLE PRECISION NOT NULL DEFAULT 0.0,
+  purchase_date  TEXT,
+  notes          TEXT,
+
+  CONSTRAINT ck_is_foil CHECK (is_foil IN (0,1)),
+  CONSTRAINT ck_is_graded CHECK (is_graded IN (0,1)),
+  CONSTRAINT ck_quantity CHECK (quantity >= 0),
+  CONSTRAINT ck_purchase_price CHECK (purchase_price >= 0),
+  CONSTRAINT ck_graded_fields CHECK (
+    (is_graded = 1 AND graded_company IS NOT NULL AND grade IS NOT NULL AND grade BETWEEN 1.0 AND 10.0)
+    OR
+    (is_graded = 0 AND graded_company IS NULL AND grade IS NULL)
+  ),
+  CONSTRAINT ck_graded_company CHECK (
+    graded_company IS NULL OR graded_company IN ('PSA','BGS','CGC')
+  )
+);
+
+CREATE INDEX idx_card_set_id ON card(set_id);
+CREATE INDEX idx_inventory_card_id ON inventory_item(card_id);
+
+CREATE TABLE change_log (
+  seq         BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  table_name  TEXT NOT NULL,
+  row_id      INTEGER NOT NULL,
+  op          TEXT NOT NULL,
+  row_json    TEXT,
+  changed_at  TEXT NOT NULL DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"'),
+  CONSTRAINT ck_change_op CHECK (op IN ('insert','update','delete'))
+);
+
+CREATE INDEX idx_change_log_table_seq ON change_log(table_name, seq);
@@ -0,0 +1,21 @@
+-- postgres/02_inventory_archive.sql
+-- PostgreSQL version of 06_inventory_archive.sql.
+
+DROP TABLE IF EXISTS inventory_archive;
+
+CREATE TABLE inventory_archive (
+  archive_id     INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  item_id        INTEGER NOT NULL,
+  card_id        INTEGER NOT NULL,
+  condition_id   INTEGER NOT NULL,
+  is_foil        INTEGER NOT NULL,
+  is_graded      INTEGER NOT NULL,
+  graded_company TEXT,
+  grade          DOUBLE PRECISION,
+  purchase_price DOUBLE PRECISION NOT NULL,
+  purchase_date  TEXT,
+  notes          TEXT,
+  archived_at    TEXT NOT NULL DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"')
+);
+
+CREATE INDEX idx_inventory_archive_card_id ON inventory_archive(card_id);
@@ -0,0 +1,23 @@
+-- postgres/03_sales.sql
+-- PostgreSQL version of 07_sales.sql (sale_YYYYMM tables are created on first use).
+
+DROP TABLE IF EXISTS sale_rollup;
+DROP TABLE IF EXISTS sale_partition;
+
+CREATE TABLE sale_partition (
+  month          TEXT PRIMARY KEY,
+  table_name     TEXT NOT NULL UNIQUE,
+  archived_path  TEXT,
+  archived_at    TEXT
+);
+
+CREATE TABLE sale_rollup (
+  period_type    TEXT NOT NULL,
+  period         TEXT NOT NULL,
+  sales_count    INTEGER NOT NULL DEFAULT 0,
+  units          INTEGER NOT NULL DEFAULT 0,
+  revenue        DOUBLE PRECISION NOT NULL DEFAULT 0,
+  cost           DOUBLE PRECISION NOT NULL DEFAULT 0,
+  PRIMARY KEY (period_type, period),
+  CONSTRAINT ck_period_type CHECK (period_type IN ('day','month'))
+);
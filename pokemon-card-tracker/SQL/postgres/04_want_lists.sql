@@ -0,0 +1,52 @@
+-- postgres/04_want_lists.sql
+-- PostgreSQL version of 08_want_lists.sql.
+
+DROP TABLE IF EXISTS want_match_state;
+DROP TABLE IF EXISTS want_list_match;
+DROP TABLE IF EXISTS want_list_entry;
+DROP TABLE IF EXISTS want_list;
+
+CREATE TABLE want_list (
+  want_list_id   INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  customer       TEXT NOT NULL,
+  notes          TEXT,
+  created_at     TEXT NOT NULL DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"')
+);
+
+CREATE TABLE want_list_entry (
+  entry_id       INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  want_list_id   INTEGER NOT NULL REFERENCES want_list(want_list_id) ON DELETE CASCADE,
+  set_code       TEXT,
+  card_number    TEXT,
+  card_name      TEXT,
+  quantity       INTEGER NOT NULL DEFAULT 1,
+  min_condition  TEXT NOT NULL DEFAULT 'DMG',
+  graded         TEXT NOT NULL DEFAULT 'any',
+  min_grade      DOUBLE PRECISION,
+  CONSTRAINT ck_want_card CHECK ((set_code IS NOT NULL AND card_number IS NOT NULL) OR card_name IS NOT NULL),
+  CONSTRAINT ck_want_quantity CHECK (quantity >= 1),
+  CONSTRAINT ck_want_min_condition CHECK (min_condition IN ('NM','LP','MP','HP','DMG')),
+  CONSTRAINT ck_want_graded CHECK (graded IN ('any','graded','ungraded'))
+);
+
+CREATE TABLE want_list_match (
+  entry_id       INTEGER NOT NULL REFERENCES want_list_entry(entry_id) ON DELETE CASCADE,
+  item_id        INTEGER NOT NULL,
+  want_list_id   INTEGER NOT NULL,
+  card_id        INTEGER NOT NULL,
+  PRIMARY KEY (entry_id, item_id)
+);
+
+CREATE TABLE want_match_state (
+  id             INTEGER PRIMARY KEY CHECK (id = 1),
+  last_seq       INTEGER NOT NULL DEFAULT 0
+);
+INSERT INTO want_match_state (id, last_seq) VALUES (1, 0);
+
+CREATE INDEX idx_want_list_entry_list ON want_list_entry(want_list_id);
+CREATE INDEX idx_want_list_entry_set_number ON want_list_entry(set_code, card_number);
+CREATE INDEX idx_want_list_entry_name ON want_list_entry(lower(card_name));
+CREATE INDEX idx_want_list_match_item ON want_list_match(item_id);
+CREATE INDEX idx_want_list_match_card ON want_list_match(card_id);
+CREATE INDEX idx_want_list_match_list ON want_list_match(want_list_id);
+CREATE INDEX IF NOT EXISTS idx_card_name_lower ON card(lower(card_name));
@@ -0,0 +1,21 @@
+-- postgres/05_set_completion.sql
+-- PostgreSQL version of 09_set_completion.sql.
+
+DROP TABLE IF EXISTS set_card_position;
+DROP TABLE IF EXISTS set_completion;
+
+CREATE TABLE set_completion (
+  set_id         INTEGER PRIMARY KEY REFERENCES card_set(set_id) ON DELETE CASCADE,
+  total          INTEGER NOT NULL,
+  owned          INTEGER NOT NULL,
+  bitmap         BYTEA NOT NULL,
+  updated_at     TEXT NOT NULL
+);
+
+CREATE TABLE set_card_position (
+  card_id        INTEGER PRIMARY KEY REFERENCES card(card_id) ON DELETE CASCADE,
+  set_id         INTEGER NOT NULL,
+  position       INTEGER NOT NULL
+);
+
+CREATE UNIQUE INDEX idx_set_card_position ON set_card_position(set_id, position);
@@ -0,0 +1,10 @@
+-- postgres/06_catalog_sync.sql
+-- PostgreSQL version of 10_catalog_sync.sql.
+
+DROP TABLE IF EXISTS card_content_hash;
+
+CREATE TABLE card_content_hash (
+  card_id        INTEGER PRIMARY KEY REFERENCES card(card_id) ON DELETE CASCADE,
+  content_hash   TEXT NOT NULL,
+  synced_at      TEXT NOT NULL
+);
@@ -0,0 +1,28 @@
+-- postgres/07_lot_merge.sql
+-- PostgreSQL version of 11_lot_merge.sql.
+
+DROP TABLE IF EXISTS lot_merge_log;
+DROP TABLE IF EXISTS lot_scan_state;
+
+DROP INDEX IF EXISTS idx_inventory_lot;
+CREATE INDEX IF NOT EXISTS idx_inventory_lot_qty
+  ON inventory_item(card_id, condition_id, is_foil, is_graded, graded_company, grade) INCLUDE (quantity);
+
+CREATE TABLE lot_merge_log (
+  merge_id       INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  kept_item_id   INTEGER NOT NULL,
+  merged_count   INTEGER NOT NULL,
+  kept_before    TEXT NOT NULL,
+  kept_after     TEXT NOT NULL,
+  merged_rows    TEXT NOT NULL,
+  merged_at      TEXT NOT NULL,
+  undone_at      TEXT
+);
+
+CREATE INDEX idx_lot_merge_log_kept ON lot_merge_log(kept_item_id);
+
+CREATE TABLE lot_scan_state (
+  id             INTEGER PRIMARY KEY CHECK (id = 1),
+  last_seq       INTEGER                           -- NULL: no complete pass yet
+);
+INSERT INTO lot_scan_state (id, last_seq) VALUES (1, NULL);
@@ -0,0 +1,14 @@
+-- postgres/08_change_feed.sql
+-- PostgreSQL version of 13_change_feed.sql.
+
+DROP TABLE IF EXISTS change_feed;
+
+CREATE TABLE change_feed (
+  id          INTEGER PRIMARY KEY CHECK (id = 1),
+  floor_seq   BIGINT NOT NULL DEFAULT 0,
+  updated_at  TEXT
+);
+
+INSERT INTO change_feed (id, floor_seq) VALUES (1, 0);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log(table_name, row_id, seq);
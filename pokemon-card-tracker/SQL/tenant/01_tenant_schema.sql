@@ -0,0 +1,59 @@
+-- tenant/01_tenant_schema.sql
+-- Schema of a tenant shard (tenants/<tenant_id>.db). The shared catalog
+-- (card_set, card, card_condition) lives in the main database, ATTACHed
+-- read-only as "catalog"; unqualified names like `card` resolve to it.
+-- SQLite cannot enforce foreign keys across database files, so the
+-- catalog references below are plain columns (the API validates card_id
+-- and condition_id before writing). The rest of the shard schema comes
+-- from the shared migrations listed in db.TENANT_MIGRATIONS. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS inventory_item (
+  item_id        INTEGER PRIMARY KEY,
+  card_id        INTEGER NOT NULL,                 -- catalog.card
+  condition_id   INTEGER NOT NULL,                 -- catalog.card_condition
+  is_foil        INTEGER NOT NULL DEFAULT 0,
+  is_graded      INTEGER NOT NULL DEFAULT 0,
+  graded_company TEXT,
+  grade          REAL,
+  quantity       INTEGER NOT NULL DEFAULT 1,
+  purchase_price REAL NOT NULL DEFAULT 0.0,
+  purchase_date  TEXT,
+  notes          TEXT,
+
+  CONSTRAINT ck_is_foil CHECK (is_foil IN (0,1)),
+  CONSTRAINT ck_is_graded CHECK (is_graded IN (0,1)),
+  CONSTRAINT ck_quantity CHECK (quantity >= 0),
+  CONSTRAINT ck_purchase_price CHECK (purchase_price >= 0),
+  CONSTRAINT ck_graded_fields CHECK (
+    (is_graded = 1 AND graded_company IS NOT NULL AND grade IS NOT NULL AND grade BETWEEN 1.0 AND 10.0)
+    OR
+    (is_graded = 0 AND graded_company IS NULL AND grade IS NULL)
+  ),
+  CONSTRAINT ck_graded_company CHECK (
+    graded_company IS NULL OR graded_company IN ('PSA','BGS','CGC')
+  )
+);
+
+CREATE INDEX IF NOT EXISTS idx_inventory_card_id ON inventory_item(card_id);
+
+-- set completion for this tenant's inventory (09_set_completion.sql minus the catalog foreign keys).
+-- Card writes happen in the catalog and cannot refresh this table, so each
+-- row records the catalog's card change_log head it was built from and is
+-- rebuilt on read once the catalog moves past it. Shards created before
+-- catalog_seq existed get the column from TenantShardBackend._ensure_schema.
+CREATE TABLE IF NOT EXISTS set_completion (
+  set_id         INTEGER PRIMARY KEY,
+  total          INTEGER NOT NULL,
+  owned          INTEGER NOT NULL,
+  bitmap         BLOB NOT NULL,
+  updated_at     TEXT NOT NULL,
+  catalog_seq    INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS set_card_position (
+  card_id        INTEGER PRIMARY KEY,
+  set_id         INTEGER NOT NULL,
+  position       INTEGER NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_set_card_position ON set_card_position(set_id, position);
@@ -0,0 +1,221 @@
+# admission.py
+"""
+Admission control and load shedding for the API.
+
+Every request is put in a class and admitted through that class's pool:
+
+- point:  GET of one row (/cards/{id}, /inventory/{id}, ...): cheap
+- scan:   every other GET (lists, exports, summaries) and POST /batch: expensive
+- write:  POST / PUT / PATCH / DELETE
+
+A pool runs at most `limit` requests at once and holds at most `queue`
+more, each waiting up to queue_timeout_s for a slot. Anything beyond that
+gets an immediate 503 with Retry-After, estimated from the pool's recent
+service time, instead of piling up and slowing every endpoint down.
+Because the pools are separate, a burst of full scans can't take the slots
+point lookups need. Point lookups get the big pool, scans a small one.
+
+Optionally each client (X-Api-Key, else the client address) gets a token
+bucket of `rate` requests per second with bursts of `burst`. A client over
+it gets 429 with Retry-After.
+
+/admin/*, the docs, GET /ready and long-lived streams (/changes/stream)
+are not limited. GET /admin/admission returns the metrics: in flight, queue depth,
+admitted, queued, shed and timed-out counts per pool, and rate-limited
+requests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+POINT_RE = re.compile(r"^/(sets|cards|conditions|inventory|want-lists)/\d+/?$")
+EXEMPT_PREFIXES = ("/admin", "/docs", "/redoc", "/openapi.json", "/changes/stream", "/ready")
+READ_POSTS = ("/batch",)  # POSTs that only read; a batch of GETs is admitted as one scan
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """'point' | 'scan' | 'write', or None for requests that are not limited."""
+    if path.startswith(EXEMPT_PREFIXES) or method in ("OPTIONS", "HEAD"):
+        return None
+    if method != "GET" and path not in READ_POSTS:
+        return "write"
+    return "point" if POINT_RE.match(path) else "scan"
+
+
+class Pool:
+    """Concurrency limit + bounded FIFO queue; only touched from the event loop."""
+
+    def __init__(self, name: str, limit: int, queue: int, queue_timeout_s: float):
+        if limit < 1 or queue < 0:
+            raise ValueError("limit must be >= 1 and queue >= 0")
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.queue_timeout_s = queue_timeout_s
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._service_s = 0.05  # EWMA of time a request holds a slot
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0, "timed_out": 0, "max_queue_depth": 0}
+
+    async def acquire(self) -> bool:
+        """True once a slot is held; False if the request should be shed."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.queue:
+            self.stats["shed"] += 1
+            return False
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                return self._admitted()  # handed a slot just as the wait ran out
+            fut.cancel()
+            self._discard(fut)
+            self.stats["timed_out"] += 1
+            self.stats["shed"] += 1
+            return False
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                self.release(0.0)  # got a slot but the client went away
+            else:
+                fut.cancel()
+                self._discard(fut)
+            raise
+        return self._admitted()
+
+    def _admitted(self) -> bool:
+        self.stats["admitted"] += 1
+        return True
+
+    def _discard(self, fut: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(fut)
+        except ValueError:
+            pass
+
+    def release(self, held_s: float) -> None:
+        if held_s:
+            self._service_s = 0.8 * self._service_s + 0.2 * held_s
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)  # the slot passes straight to the next waiter
+                return
+        self.in_flight -= 1
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiters) + self.in_flight
+        return max(1, math.ceil(self._service_s * backlog / self.limit))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit, "queue": self.queue, "queue_timeout_s": self.queue_timeout_s,
+            "in_flight": self.in_flight, "queue_depth": len(self._waiters),
+            "avg_service_ms": round(self._service_s * 1000, 1), **self.stats,
+        }
+
+
+class TokenBuckets:
+    """Per-client token buckets; the least recently seen clients are forgotten past max_clients."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # client -> (tokens, updated)
+        self.limited = 0
+
+    def take(self, client: str) -> float:
+        """0 if the request may go ahead, else seconds until a token is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1.0:
+            tokens -= 1.0
+        else:
+            wait = (1.0 - tokens) / self.rate
+            self.limited += 1
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets), "limited": self.limited}
+
+
+class AdmissionController:
+    def __init__(self, pools: Dict[str, Pool], buckets: Optional[TokenBuckets] = None):
+        self.pools = pools
+        self.buckets = buckets
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pools": {name: pool.snapshot() for name, pool in self.pools.items()},
+            "rate_limit": self.buckets.snapshot() if self.buckets else {"enabled": False},
+        }
+
+
+def controller_from_env() -> AdmissionController:
+    env = os.environ.get
+    timeout = float(env("POKEMON_QUEUE_TIMEOUT_MS", "2000")) / 1000
+    pools = {
+        "point": Pool("point", int(env("POKEMON_LIMIT_POINT", "64")), int(env("POKEMON_QUEUE_POINT", "256")), timeout),
+        "scan": Pool("scan", int(env("POKEMON_LIMIT_SCAN", "4")), int(env("POKEMON_QUEUE_SCAN", "8")), timeout),
+        "write": Pool("write", int(env("POKEMON_LIMIT_WRITE", "8")), int(env("POKEMON_QUEUE_WRITE", "64")), timeout),
+    }
+    rate = float(env("POKEMON_RATE_LIMIT", "0"))  # requests/second per client; 0 = off
+    buckets = TokenBuckets(rate, float(env("POKEMON_RATE_BURST", str(max(1.0, 2 * rate))))) if rate > 0 else None
+    return AdmissionController(pools, buckets)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        kind = classify(scope["method"], scope["path"])
+        if kind is None:
+            return await self.app(scope, receive, send)
+
+        buckets = self.controller.buckets
+        if buckets is not None:
+            headers = dict(scope["headers"])
+            client = headers.get(b"x-api-key", b"").decode("latin-1") or (scope.get("client") or ("?",))[0]
+            wait = buckets.take(client)
+            if wait:
+                return await self._reject(scope, receive, send, 429, "rate limit exceeded", math.ceil(wait))
+
+        pool = self.controller.pools[kind]
+        if not await pool.acquire():
+            return await self._reject(scope, receive, send, 503, f"server busy ({kind} requests)", pool.retry_after())
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            pool.release(time.perf_counter() - start)
+
+    @staticmethod
+    async def _reject(scope, receive, send, status: int, detail: str, retry_after: int) -> None:
+        response = JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": str(retry_after)})
+        await response(scope, receive, send)
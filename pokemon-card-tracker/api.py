@@ -1,14 +1,89 @@
 from __future__ import annotations
 
-from typing import Optional
-
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-
-from business import PokemonCardBusiness
-
-app = FastAPI(title="Pokemon Card Tracker API", version="4.0")
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from admission import AdmissionMiddleware, controller_from_env
+from backup import manager_from_env as backup_manager_from_env
+from business import CursorTooOldError, InsufficientQuantityError, PokemonCardBusiness
+from cache import ResponseCache
+from consolidation import LotConsolidator
+from maintenance import TASKS as MAINTENANCE_TASKS, MaintenanceScheduler, maintenance_from_env
+from singleflight import SingleFlight
+from replication import ReplicationMiddleware
+from startup import StartupReport, prepare, warm_in_background
+from tenancy import TenantMiddleware
+from db import (
+    DB_ERRORS,
+    ReadOnlyReplicaError,
+    current_tenant,
+    get_backend,
+    pinned_snapshot,
+    read_replicas,
+    shards,
+    use_backend,
+    use_snapshot,
+)
+from repositories import InventoryRepository
+from writebehind import WriteBehindQueue
+
+
+def write_queue_from_env(inv_repo: InventoryRepository) -> Optional[WriteBehindQueue]:
+    """POKEMON_WRITE_BEHIND=1 turns on group-committed inventory writes."""
+    if os.environ.get("POKEMON_WRITE_BEHIND") != "1":
+        return None
+    return WriteBehindQueue(
+        inv_repo,
+        flush_ms=int(os.environ.get("POKEMON_WB_FLUSH_MS", "50")),
+        max_ops=int(os.environ.get("POKEMON_WB_MAX_OPS", "500")),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # find / create / migrate the database before taking requests (see startup.py);
+    # serve.py sets POKEMON_REQUIRE_WAL=1 when it starts more than one worker
+    prepare(startup_report, require_wal=os.environ.get("POKEMON_REQUIRE_WAL") == "1")
+    if os.environ.get("POKEMON_WARMUP", "1") != "0":
+        warm_in_background(startup_report, WARM_LISTS)  # GET /ready says 503 until it is done
+    else:
+        startup_report.mark_ready()
+    yield
+    if maint_scheduler is not None:
+        maint_scheduler.stop()
+    if consolidator is not None:
+        consolidator.stop()
+    if biz.write_queue is not None:
+        biz.write_queue.stop()
+
+
+app = FastAPI(title="Pokemon Card Tracker API", version="4.0", lifespan=lifespan)
+startup_report = StartupReport()
+
+# read-only replica instances and X-Max-Staleness reads (see replication.py); innermost,
+# so it sees the tenant chosen below
+app.add_middleware(ReplicationMiddleware)
+# X-Tenant-Id: <tenant> routes the request to that tenant's shard (see tenancy.py);
+# added before CORS so CORS stays the outermost layer; backups and maintenance cover the main database only
+app.add_middleware(TenantMiddleware, untenanted=("/admin/tenants", "/admin/backup", "/admin/maintenance"))
+# per-class concurrency limits, bounded queues and optional per-client rate limits (see admission.py);
+# POKEMON_ADMISSION=0 turns it off
+admission = controller_from_env() if os.environ.get("POKEMON_ADMISSION", "1") != "0" else None
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,11 +93,129 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-biz = PokemonCardBusiness()
+
+@app.exception_handler(ReadOnlyReplicaError)
+def read_only_replica(request: Request, exc: ReadOnlyReplicaError):
+    # a write routed to a read-only replica instance
+    return JSONResponse({"detail": str(exc)}, status_code=405)
+
+
+inv_repo = InventoryRepository()
+biz = PokemonCardBusiness(
+    inv_repo=inv_repo,
+    write_queue=write_queue_from_env(inv_repo),
+    # delete | archive | keep: what an adjust down to quantity 0 does
+    zero_qty_policy=os.environ.get("POKEMON_ZERO_QTY_POLICY", "delete"),
+    # POST /inventory?merge=true/false overrides per request
+    merge_on_insert=os.environ.get("POKEMON_MERGE_ON_INSERT") == "1",
+    # constraints | precheck: how inventory writes check the card / condition they reference
+    validation=os.environ.get("POKEMON_VALIDATION", "constraints"),
+)
+
+# POKEMON_CONSOLIDATE_SECS=N merges duplicate lots every N seconds in the background
+consolidator = (
+    LotConsolidator(biz.consolidate_lots, interval_s=float(os.environ["POKEMON_CONSOLIDATE_SECS"]))
+    if os.environ.get("POKEMON_CONSOLIDATE_SECS")
+    else None
+)
+
+
+# ANALYZE / incremental vacuum / quick_check when due, checked every POKEMON_MAINT_SECS (0 = off)
+maintenance = maintenance_from_env()
+_maint_secs = float(os.environ.get("POKEMON_MAINT_SECS", "60"))
+maint_scheduler = (
+    MaintenanceScheduler(maintenance.tick, interval_s=_maint_secs)
+    if _maint_secs > 0 and get_backend().name == "sqlite" and not getattr(get_backend(), "read_only", False)
+    else None
+)
+
+# where compacted sales months go (POST /admin/sales/archive)
+SALES_ARCHIVE_DIR = Path(os.environ.get("POKEMON_SALES_ARCHIVE_DIR", Path(__file__).resolve().parent / "sales_archive"))
+
+# online snapshots of the SQLite database (POKEMON_BACKUP_DIR / _KEEP / _PAGES)
+backups = backup_manager_from_env()
+
+response_cache = ResponseCache(budget_mb=float(os.environ.get("POKEMON_CACHE_MB", "64")))
+read_flights = SingleFlight(max_keys=int(os.environ.get("POKEMON_SINGLEFLIGHT_KEYS", "1024")))
+
+# tables each cached list response is built from
+SET_TABLES = ("card_set",)
+CARD_TABLES = ("card", "card_set")
+CONDITION_TABLES = ("card_condition",)
+INVENTORY_TABLES = ("inventory_item", "card", "card_set", "card_condition")
 
 
 def row_to_dict(r):
-    return dict(r) if r is not None else None
+    if r is None or isinstance(r, dict):  # dict: a row with queued write-behind changes on top
+        return r
+    return r._asdict()
+
+
+MAX_IDS = 500  # one IN query
+
+
+def parse_ids(ids: str) -> List[int]:
+    """?ids=1,2,3 -> [1, 2, 3]; 400 unless it is 1..MAX_IDS integers."""
+    try:
+        out = [int(x) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if not out or len(out) > MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"ids takes 1 to {MAX_IDS} ids")
+    return out
+
+
+# same compact encoding FastAPI's JSONResponse uses
+_json_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def encode_rows(rows) -> bytes:
+    """JSON array of row objects, one row dict alive at a time instead of a dict per row."""
+    return ("[" + ",".join(_json_encoder.encode(row_to_dict(r)) for r in rows) + "]").encode("utf-8")
+
+
+def rows_response(rows) -> Response:
+    return Response(content=encode_rows(rows), media_type="application/json")
+
+
+def list_etag(key, versions) -> str:
+    # same key + same table versions = same body, so the ETag is known before building it
+    return 'W/"' + hashlib.sha1(repr((key, versions)).encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def cached_list(key, tables, build, request: Optional[Request] = None):
+    """
+    Serve a list endpoint from the encoded-response cache; build() returns the rows
+    (records or dicts), which are encoded straight to JSON.
+    On a miss, concurrent identical requests share one build (single-flight).
+    The flight key includes the table versions, so a request that follows a
+    write never joins a query that started before that write.
+    Responses carry an ETag; a matching If-None-Match gets 304 without a build.
+    """
+    if biz.has_pending_writes():
+        return rows_response(build())
+    key = (current_tenant(), key)  # tenants share the catalog but not their inventory
+    versions = biz.table_versions(tables)
+    etag = list_etag(key, versions)
+    if request is not None and etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    body = response_cache.get(key, versions) if response_cache.enabled else None
+    if body is None:
+        body = read_flights.do((key, versions), lambda: encode_rows(build()))
+        if response_cache.enabled:
+            response_cache.put(key, versions, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def change_to_dict(r):
+    d = dict(r)
+    row_json = d.pop("row_json", None)
+    d["row"] = json.loads(row_json) if row_json else None
+    return d
+
+
+SSE_POLL_SECONDS = 1.0
+SSE_HEARTBEAT_SECONDS = 15.0
 
 
 # -----------------------------
@@ -92,19 +285,82 @@ class InventoryUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+class InventoryAdjust(BaseModel):
+    delta: int = Field(..., description="added to quantity; negative for a sale")
+    zero_policy: Optional[str] = Field(None, pattern="^(delete|archive|keep)$")
+
+
+class InventoryAdjustItem(BaseModel):
+    item_id: int
+    delta: int
+
+
+class InventoryAdjustMany(BaseModel):
+    items: List[InventoryAdjustItem] = Field(..., min_length=1)
+    zero_policy: Optional[str] = Field(None, pattern="^(delete|archive|keep)$")
+
+
+class SaleCreate(BaseModel):
+    item_id: int
+    quantity: int = Field(1, ge=1)
+    sale_price: float = Field(..., ge=0, description="price per copy")
+    sold_at: Optional[str] = Field(None, description="ISO date or date-time; defaults to now (UTC)")
+    notes: Optional[str] = None
+    zero_policy: Optional[str] = Field(None, pattern="^(delete|archive|keep)$")
+
+
+class WantEntry(BaseModel):
+    set_code: Optional[str] = None
+    card_number: Optional[str] = None
+    card_name: Optional[str] = Field(None, description="matches any printing (within set_code if given)")
+    quantity: int = Field(1, ge=1)
+    min_condition: Optional[str] = Field(None, description="worst acceptable condition, NM..DMG")
+    graded: Optional[str] = Field(None, pattern="^(any|graded|ungraded)$")
+    min_grade: Optional[float] = None
+
+
+class WantListCreate(BaseModel):
+    customer: str
+    notes: Optional[str] = None
+    entries: List[WantEntry] = Field(..., min_length=1)
+
+
+class TenantCreate(BaseModel):
+    tenant_id: str
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None  # echoed back so clients can match results
+    method: str = "GET"
+    path: str = Field(..., min_length=1, description="route path with query string, e.g. /cards?ids=1,2")
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(..., min_length=1)
+
+
 # -----------------------------
 # SETS
 # -----------------------------
 @app.get("/sets")
-def get_sets(set_code: Optional[str] = None, era: Optional[str] = None):
-    rows = [row_to_dict(r) for r in biz.list_sets()]
-    if set_code:
-        sc = set_code.lower()
-        rows = [r for r in rows if sc in str(r.get("set_code", "")).lower()]
-    if era:
-        e = era.lower()
-        rows = [r for r in rows if e in str(r.get("era", "")).lower()]
-    return rows
+def get_sets(request: Request, set_code: Optional[str] = None, era: Optional[str] = None):
+    def build():
+        rows = biz.list_sets()
+        if set_code:
+            sc = set_code.lower()
+            rows = [r for r in rows if sc in str(r.get("set_code", "")).lower()]
+        if era:
+            e = era.lower()
+            rows = [r for r in rows if e in str(r.get("era", "")).lower()]
+        return rows
+
+    return cached_list(("sets", (set_code or "").lower(), (era or "").lower()), SET_TABLES, build, request)
+
+
+@app.get("/sets/completion")
+def get_completion_leaderboard(limit: int = Query(50, ge=1, le=1000)):
+    # most complete sets first, straight from the per-set bitmaps
+    return [row_to_dict(r) for r in biz.completion_leaderboard(limit)]
 
 
 @app.get("/sets/{set_id}")
@@ -115,6 +371,14 @@ def get_set(set_id: int):
     return row_to_dict(r)
 
 
+@app.get("/sets/{set_id}/completion")
+def get_set_completion(set_id: int, cards: str = Query("missing", pattern="^(missing|owned|none)$")):
+    r = biz.get_set_completion(set_id, cards=cards)
+    if r is None:
+        raise HTTPException(status_code=404, detail="Set not found")
+    return r
+
+
 @app.post("/sets", status_code=201)
 def create_set(payload: SetCreate):
     try:
@@ -156,17 +420,24 @@ def delete_set(set_id: int):
 # CARDS
 # -----------------------------
 @app.get("/cards")
-def get_cards(set_id: Optional[int] = None, rarity: Optional[str] = None):
-    if set_id is not None:
-        rows = [row_to_dict(r) for r in biz.list_cards_in_set(set_id)]
-    else:
-        rows = [row_to_dict(r) for r in biz.list_cards()]
+def get_cards(request: Request, set_id: Optional[int] = None, rarity: Optional[str] = None, ids: Optional[str] = None):
+    def build():
+        if ids is not None:
+            rows = biz.get_cards_by_ids(parse_ids(ids))  # set_id is ignored
+        elif set_id is not None:
+            rows = biz.list_cards_in_set(set_id)
+        else:
+            rows = biz.list_cards()
 
-    if rarity:
-        rr = rarity.lower()
-        rows = [r for r in rows if rr in str(r.get("rarity", "")).lower()]
+        if rarity:
+            rr = rarity.lower()
+            rows = [r for r in rows if rr in str(r.get("rarity", "")).lower()]
 
-    return rows
+        return rows
+
+    if ids is not None:
+        return rows_response(build())  # arbitrary id lists are not worth caching
+    return cached_list(("cards", set_id, (rarity or "").lower()), CARD_TABLES, build, request)
 
 
 @app.get("/cards/{card_id}")
@@ -178,12 +449,15 @@ def get_card(card_id: int):
 
 
 @app.get("/sets/{set_id}/cards")
-def get_cards_in_set(set_id: int, rarity: Optional[str] = None):
-    rows = [row_to_dict(r) for r in biz.list_cards_in_set(set_id)]
-    if rarity:
-        rr = rarity.lower()
-        rows = [r for r in rows if rr in str(r.get("rarity", "")).lower()]
-    return rows
+def get_cards_in_set(request: Request, set_id: int, rarity: Optional[str] = None):
+    def build():
+        rows = biz.list_cards_in_set(set_id)
+        if rarity:
+            rr = rarity.lower()
+            rows = [r for r in rows if rr in str(r.get("rarity", "")).lower()]
+        return rows
+
+    return cached_list(("set_cards", set_id, (rarity or "").lower()), CARD_TABLES, build, request)
 
 
 @app.post("/cards", status_code=201)
@@ -227,16 +501,19 @@ def delete_card(card_id: int):
 # CONDITIONS
 # -----------------------------
 @app.get("/conditions")
-def get_conditions(query: Optional[str] = None):
-    rows = [row_to_dict(r) for r in biz.list_conditions()]
-    if query:
-        q = query.lower()
-        rows = [
-            r for r in rows
-            if q in str(r.get("condition_code", "")).lower()
-            or q in str(r.get("description", "")).lower()
-        ]
-    return rows
+def get_conditions(request: Request, query: Optional[str] = None):
+    def build():
+        rows = biz.list_conditions()
+        if query:
+            q = query.lower()
+            rows = [
+                r for r in rows
+                if q in str(r.get("condition_code", "")).lower()
+                or q in str(r.get("description", "")).lower()
+            ]
+        return rows
+
+    return cached_list(("conditions", (query or "").lower()), CONDITION_TABLES, build, request)
 
 
 @app.get("/conditions/{condition_id}")
@@ -283,18 +560,31 @@ def delete_condition(condition_id: int):
 # -----------------------------
 @app.get("/inventory")
 def get_inventory(
+    request: Request,
     set_id: Optional[int] = None,
     is_graded: Optional[int] = None,
+    ids: Optional[str] = None,
+    after_id: int = Query(0, ge=0, description="with limit: items with a larger item_id"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="page size; pages are in item_id order"),
 ):
-    if set_id is not None:
-        rows = [row_to_dict(r) for r in biz.list_inventory_by_set(set_id)]
-    else:
-        rows = [row_to_dict(r) for r in biz.list_inventory()]
+    def build():
+        if ids is not None:
+            rows = biz.get_inventory_items_by_ids(parse_ids(ids))  # set_id is ignored
+        elif limit is not None:
+            return biz.list_inventory_page(after_id, limit, set_id, is_graded)
+        elif set_id is not None:
+            rows = biz.list_inventory_by_set(set_id)
+        else:
+            rows = biz.list_inventory()
+
+        if is_graded is not None:
+            rows = [r for r in rows if int(r.get("is_graded", 0)) == int(is_graded)]
 
-    if is_graded is not None:
-        rows = [r for r in rows if int(r.get("is_graded", 0)) == int(is_graded)]
+        return rows
 
-    return rows
+    if ids is not None:
+        return rows_response(build())
+    return cached_list(("inventory", set_id, is_graded, after_id, limit), INVENTORY_TABLES, build, request)
 
 
 @app.get("/inventory/{item_id}")
@@ -306,17 +596,23 @@ def get_inventory_item(item_id: int):
 
 
 @app.get("/sets/{set_id}/inventory")
-def get_inventory_by_set(set_id: int, is_graded: Optional[int] = None):
-    rows = [row_to_dict(r) for r in biz.list_inventory_by_set(set_id)]
-    if is_graded is not None:
-        rows = [r for r in rows if int(r.get("is_graded", 0)) == int(is_graded)]
-    return rows
+def get_inventory_by_set(request: Request, set_id: int, is_graded: Optional[int] = None):
+    def build():
+        rows = biz.list_inventory_by_set(set_id)
+        if is_graded is not None:
+            rows = [r for r in rows if int(r.get("is_graded", 0)) == int(is_graded)]
+        return rows
+
+    return cached_list(("set_inventory", set_id, is_graded), INVENTORY_TABLES, build, request)
 
 
 @app.post("/inventory", status_code=201)
-def create_inventory_item(payload: InventoryCreate):
+def create_inventory_item(
+    payload: InventoryCreate,
+    merge: Optional[bool] = Query(None, description="add to an identical existing lot instead of a new row"),
+):
     try:
-        item_id = biz.create_inventory_item(**payload.model_dump())
+        item_id = biz.create_inventory_item(merge=merge, **payload.model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -327,14 +623,23 @@ def create_inventory_item(payload: InventoryCreate):
 
 
 @app.put("/inventory/{item_id}")
-def update_inventory_item(item_id: int, payload: InventoryUpdate):
+def update_inventory_item(
+    item_id: int,
+    payload: InventoryUpdate,
+    response: Response,
+    ack: str = Query("durable", pattern="^(durable|fast)$"),
+):
+    # ack=fast only differs when write-behind mode is on: 202 once queued
+    fast = ack == "fast" and biz.write_queue is not None
     try:
-        ok = biz.update_inventory_item(item_id, **payload.model_dump(exclude_unset=True))
+        ok = biz.update_inventory_item(item_id, durable=not fast, **payload.model_dump(exclude_unset=True))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
     if not ok:
         raise HTTPException(status_code=404, detail="Inventory item not found")
+    if fast:
+        response.status_code = 202
 
     updated = biz.get_inventory_item(item_id)
     if updated:
@@ -342,9 +647,500 @@ def update_inventory_item(item_id: int, payload: InventoryUpdate):
     return {"item_id": item_id, "message": "Inventory item updated successfully"}
 
 
+@app.post("/inventory/adjust")
+def adjust_inventory_items(payload: InventoryAdjustMany):
+    # all-or-nothing: one transaction, nothing changes if any item fails
+    try:
+        items = biz.adjust_inventory_quantities(
+            [(i.item_id, i.delta) for i in payload.items], zero_policy=payload.zero_policy
+        )
+    except InsufficientQuantityError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items}
+
+
+@app.post("/inventory/{item_id}/adjust")
+def adjust_inventory_item(item_id: int, payload: InventoryAdjust):
+    try:
+        result = biz.adjust_inventory_quantity(item_id, payload.delta, zero_policy=payload.zero_policy)
+    except InsufficientQuantityError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Inventory item not found")
+    return result
+
+
 @app.delete("/inventory/{item_id}")
 def delete_inventory_item(item_id: int):
     ok = biz.delete_inventory_item(item_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Inventory item not found")
-    return {"item_id": item_id, "message": "Inventory item deleted successfully"}
\ No newline at end of file
+    return {"item_id": item_id, "message": "Inventory item deleted successfully"}
+
+
+# -----------------------------
+# SALES
+# -----------------------------
+@app.post("/sales", status_code=201)
+def create_sale(payload: SaleCreate):
+    try:
+        sale = biz.record_sale(**payload.model_dump())
+    except InsufficientQuantityError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if sale is None:
+        raise HTTPException(status_code=404, detail="Inventory item not found")
+    return sale
+
+
+@app.get("/sales")
+def get_sales(month: str = Query(..., description="YYYY-MM")):
+    try:
+        rows = biz.list_sales(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return [row_to_dict(r) for r in rows]
+
+
+@app.get("/sales/summary")
+def get_sales_summary(
+    period: str = Query("month", pattern="^(day|month)$"),
+    start: Optional[str] = Query(None, description="first period, YYYY-MM-DD or YYYY-MM"),
+    end: Optional[str] = Query(None, description="last period (inclusive)"),
+):
+    # served from the pre-aggregated sale_rollup table: one row per period
+    return [row_to_dict(r) for r in biz.sales_summary(period, start, end)]
+
+
+@app.get("/admin/sales/partitions")
+def get_sale_partitions():
+    return [row_to_dict(r) for r in biz.list_sale_partitions()]
+
+
+@app.post("/admin/sales/archive")
+def archive_sales(month: str = Query(..., description="YYYY-MM, must be in the past")):
+    try:
+        path = biz.archive_sales_month(month, SALES_ARCHIVE_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No sales recorded for {month}")
+    return {"month": month, "archived_path": path}
+
+
+# -----------------------------
+# WANT LISTS
+# -----------------------------
+@app.get("/want-lists")
+def get_want_lists():
+    return [row_to_dict(r) for r in biz.list_want_lists()]
+
+
+@app.post("/want-lists", status_code=201)
+def create_want_list(payload: WantListCreate):
+    try:
+        want_list_id = biz.create_want_list(
+            payload.customer, [e.model_dump() for e in payload.entries], notes=payload.notes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"want_list_id": want_list_id, "entries": biz.match_want_list(want_list_id)}
+
+
+@app.post("/want-lists/rematch")
+def rematch_want_lists(full: bool = False):
+    # incremental: only entries touched by inventory/card changes since the last run
+    return biz.rematch_want_lists(full=full)
+
+
+@app.get("/want-lists/{want_list_id}")
+def get_want_list(want_list_id: int):
+    row = biz.get_want_list(want_list_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Want list not found")
+    return {**row_to_dict(row), "entries": [row_to_dict(e) for e in biz.get_want_list_entries(want_list_id)]}
+
+
+@app.get("/want-lists/{want_list_id}/matches")
+def get_want_list_matches(want_list_id: int):
+    entries = biz.match_want_list(want_list_id)
+    if entries is None:
+        raise HTTPException(status_code=404, detail="Want list not found")
+    return {"want_list_id": want_list_id, "entries": entries}
+
+
+@app.delete("/want-lists/{want_list_id}")
+def delete_want_list(want_list_id: int):
+    ok = biz.delete_want_list(want_list_id)
+    if not ok:
+        raise HTTPException(status_code=404, detail="Want list not found")
+    return {"want_list_id": want_list_id, "message": "Want list deleted successfully"}
+
+
+# -----------------------------
+# BATCH
+# -----------------------------
+MAX_BATCH = int(os.environ.get("POKEMON_BATCH_MAX", "50"))
+# copied from the /batch request into every sub-request; routing fills in the rest
+_BATCH_SCOPE_KEYS = ("type", "asgi", "http_version", "scheme", "server", "client", "root_path", "app", "state",
+                     "starlette.exception_handlers")
+# the routes plus the per-request exit stack FastAPI's own middleware stack puts around them
+_batch_router = AsyncExitStackMiddleware(app.router)
+
+
+async def _batch_call(request: Request, item: BatchItem) -> dict:
+    """Run one GET through the app's routes in-process; returns {"id", "status", "body"}."""
+    if item.method.upper() != "GET":
+        return {"id": item.id, "status": 405, "body": {"detail": "batch sub-requests must be GETs"}}
+    path, _, query = item.path.partition("?")
+    if not path.startswith("/") or path.startswith(("/batch", "/changes/stream")):
+        return {"id": item.id, "status": 400, "body": {"detail": f"{path} cannot be batched"}}
+
+    scope = {k: request.scope[k] for k in _BATCH_SCOPE_KEYS if k in request.scope}
+    scope.update(
+        method="GET",
+        path=path,
+        raw_path=path.encode("utf-8"),
+        query_string=query.encode("latin-1"),
+        # the caller's headers (X-Tenant-Id, auth, ...) minus the ones describing the batch body
+        headers=[(k, v) for k, v in request.scope["headers"] if k not in (b"content-length", b"content-type")],
+    )
+    status = 500
+    content_type = ""
+    chunks: List[bytes] = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status, content_type
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            content_type = dict(message.get("headers", [])).get(b"content-type", b"").decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await _batch_router(scope, receive, send)
+    except StarletteHTTPException as e:  # raised by the router itself, e.g. no route matched
+        return {"id": item.id, "status": e.status_code, "body": {"detail": e.detail}}
+    body = b"".join(chunks)
+    if content_type.startswith("application/json"):
+        return {"id": item.id, "status": status, "body": json.loads(body) if body else None}
+    return {"id": item.id, "status": status, "body": body.decode("utf-8", "replace")}
+
+
+@app.post("/batch")
+async def batch(payload: BatchRequest, request: Request):
+    if len(payload.requests) > MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH} requests per batch")
+    # one read transaction for the whole batch: every sub-request sees the same state
+    snapshot_cm = pinned_snapshot()
+    snapshot = await run_in_threadpool(snapshot_cm.__enter__)
+    try:
+        with use_snapshot(snapshot):
+            results = await asyncio.gather(*(_batch_call(request, item) for item in payload.requests))
+    finally:
+        await run_in_threadpool(snapshot_cm.__exit__, None, None, None)
+    return {"responses": results, "statements": snapshot.statements}
+
+
+# -----------------------------
+# CHANGE FEED
+# -----------------------------
+@app.get("/changes")
+def get_changes(
+    since: int = 0,
+    limit: int = Query(500, ge=1, le=5000),
+    table: Optional[str] = None,
+):
+    try:
+        rows = [change_to_dict(r) for r in biz.list_changes(since, limit, table)]
+    except CursorTooOldError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "since": since,
+        "last_seq": rows[-1]["seq"] if rows else since,
+        "has_more": len(rows) == limit,
+        "changes": rows,
+    }
+
+
+@app.get("/changes/latest")
+def get_latest_change():
+    return {"last_seq": biz.latest_change_seq()}
+
+
+@app.get("/changes/stream")
+async def stream_changes(request: Request, since: Optional[int] = None, table: Optional[str] = None):
+    # EventSource reconnects send Last-Event-ID; it wins over ?since=
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = await run_in_threadpool(biz.latest_change_seq)
+    try:
+        await run_in_threadpool(biz.list_changes, since, 1, table)
+    except CursorTooOldError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        seq = since
+        idle = 0.0
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                rows = await run_in_threadpool(biz.list_changes, seq, 500, table)
+            except CursorTooOldError as e:
+                # pruned or restored under this stream: the client reloads, a reconnect would get 410
+                yield f"event: resync\ndata: {json.dumps({'detail': str(e)})}\n\n"
+                return
+            for r in rows:
+                change = change_to_dict(r)
+                seq = change["seq"]
+                yield f"id: {seq}\nevent: change\ndata: {json.dumps(change)}\n\n"
+            if rows:
+                idle = 0.0
+                continue
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            idle += SSE_POLL_SECONDS
+            if idle >= SSE_HEARTBEAT_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# -----------------------------
+# ADMIN
+# -----------------------------
+@app.get("/admin/write-behind")
+def get_write_behind_stats():
+    q = biz.write_queue
+    if q is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "flush_ms": q.flush_ms,
+        "max_ops": q.max_ops,
+        "queue_depth": q.queue_depth(),
+        **q.stats,
+        "dropped_updates": q.dropped_updates(),
+    }
+
+
+@app.get("/admin/lots/duplicates")
+def get_duplicate_lots(limit: int = Query(500, ge=1, le=10000), full: bool = False):
+    return [row_to_dict(r) for r in biz.find_duplicate_lots(limit, full=full)]
+
+
+@app.post("/admin/lots/consolidate")
+def consolidate_lots(dry_run: bool = False, limit: int = Query(500, ge=1, le=10000), full: bool = False):
+    return biz.consolidate_lots(dry_run=dry_run, limit=limit, full=full)
+
+
+@app.get("/admin/lots/merges")
+def get_lot_merges(limit: int = Query(100, ge=1, le=1000)):
+    out = []
+    for r in biz.list_lot_merges(limit):
+        d = row_to_dict(r)
+        for key in ("kept_before", "kept_after", "merged_rows"):
+            d[key] = json.loads(d[key])
+        out.append(d)
+    return {
+        "background": consolidator.snapshot() if consolidator is not None else {"enabled": False},
+        "merges": out,
+    }
+
+
+@app.post("/admin/lots/merges/{merge_id}/undo")
+def undo_lot_merge(merge_id: int):
+    try:
+        result = biz.undo_lot_merge(merge_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Merge not found")
+    return result
+
+
+@app.get("/admin/cache")
+def get_cache_stats():
+    return {**response_cache.stats(), "single_flight": read_flights.snapshot()}
+
+
+# -----------------------------
+# STARTUP / READINESS
+# -----------------------------
+# reference lists built into the response cache before /ready reports ready
+WARM_LISTS = [
+    ("sets", lambda: get_sets(None)),
+    ("conditions", lambda: get_conditions(None)),
+    ("cards", lambda: get_cards(None)),
+    ("inventory", lambda: get_inventory(None, after_id=0, limit=None)),
+]
+
+
+def use_database(backend):
+    """
+    Serve the app (and the repositories under it) from another database,
+    e.g. an in-memory clone for in-process tests:
+
+        previous = use_database(db.memory_clone())
+        client = TestClient(app)
+
+    Queued write-behind updates are committed first and cached responses
+    dropped, since they describe the old database. Returns the previous backend.
+    """
+    if biz.write_queue is not None:
+        biz.write_queue.drain()
+    previous = use_backend(backend)
+    response_cache.clear()
+    return previous
+
+
+@app.get("/ready")
+def get_ready():
+    """200 once startup and warm-up are done, 503 before; both with the phase timings."""
+    body = startup_report.snapshot()
+    if not body["ready"]:
+        return JSONResponse(body, status_code=503, headers={"Retry-After": "1"})
+    return body
+
+
+# -----------------------------
+# TENANTS
+# -----------------------------
+@app.get("/admin/tenants")
+def list_tenants():
+    try:
+        cache = shards()
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return {"tenants": cache.tenants(), "shard_cache": cache.snapshot()}
+
+
+@app.post("/admin/tenants", status_code=201)
+def create_tenant(payload: TenantCreate):
+    try:
+        created = shards().create(payload.tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    if not created:
+        raise HTTPException(status_code=409, detail=f"tenant {payload.tenant_id} already exists")
+    return {"tenant_id": payload.tenant_id}
+
+
+# -----------------------------
+# BACKUPS
+# -----------------------------
+@app.post("/admin/backup", status_code=202)
+def start_backup():
+    try:
+        job, started = backups.start()
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    if not started:
+        raise HTTPException(status_code=409, detail={"message": "a backup is already running", "job": job})
+    return job
+
+
+@app.get("/admin/backup/{job_id}")
+def get_backup_job(job_id: int):
+    job = backups.job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Backup job not found")
+    return job
+
+
+@app.get("/admin/backups")
+def list_backups():
+    return {"keep": backups.keep, "snapshots": backups.snapshots(), "jobs": backups.jobs()}
+
+
+@app.post("/admin/backups/{name}/restore")
+def restore_backup(name: str):
+    if biz.write_queue is not None:
+        biz.write_queue.drain()  # queued writes would land on top of the restored data
+    try:
+        result = backups.restore(name)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    response_cache.clear()
+    return result
+
+
+# -----------------------------
+# REPLICATION
+# -----------------------------
+@app.get("/admin/replication")
+def get_replication_status():
+    backend = get_backend()
+    if getattr(backend, "read_only", False):
+        return {"role": "replica", "replica": str(backend.path), **backend.state()}
+    replicas = []
+    for r in read_replicas():
+        try:
+            replicas.append({"replica": str(r.path), **r.state()})
+        except (OSError, *DB_ERRORS) as e:  # not shipped yet
+            replicas.append({"replica": str(r.path), "error": str(e)})
+    return {"role": "primary", "read_replicas": replicas}
+
+
+# -----------------------------
+# MAINTENANCE
+# -----------------------------
+@app.get("/admin/maintenance")
+def get_maintenance_status():
+    try:
+        status = maintenance.status()
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    status["scheduler"] = maint_scheduler.snapshot() if maint_scheduler is not None else {"enabled": False}
+    return status
+
+
+@app.post("/admin/maintenance/{task}")
+def run_maintenance_task(task: str):
+    if task not in MAINTENANCE_TASKS:
+        raise HTTPException(status_code=400, detail=f"task must be one of: {', '.join(MAINTENANCE_TASKS)}")
+    try:
+        return maintenance.run(task, force=True)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+
+# -----------------------------
+# ADMISSION CONTROL
+# -----------------------------
+@app.get("/admin/admission")
+def get_admission_stats():
+    if admission is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission.snapshot()}
@@ -0,0 +1,380 @@
+# backup.py
+"""
+Online backups of the SQLite database with the sqlite3 backup API.
+
+    python backup.py create
+    python backup.py list
+    python backup.py restore pokemon_cards-20261019T021507Z.db
+    python backup.py --tenant ash create
+
+A backup copies `pages` database pages per step and sleeps briefly between
+steps, so the writer lock is never held by the backup and API writes keep
+flowing while it runs. If other connections keep writing, SQLite restarts
+the copy from page 1. After max_restarts restarts the rest is copied in one
+step. Under WAL that step holds only a read snapshot, so writers are still
+not blocked.
+
+Every snapshot is quick_check'ed, written to a temporary file, renamed into
+backup_dir and given a sha256 sidecar (<snapshot>.sha256, sha256sum
+format). Only the newest `keep` snapshots are kept.
+
+A restore verifies the checksum, then copies the snapshot back into the
+live database with the backup API under the writer lock. The file is not
+swapped, so open connections in other workers simply see the restored
+data on their next read. The restored change feed starts past every seq
+the live one ever handed out (change_feed.floor_seq, 13_change_feed.sql):
+feed clients get 410 and reload, and table versions, ETags and response
+caches in every worker move to values no earlier state had.
+
+The API (api.py) runs backups as background jobs: POST /admin/backup,
+then poll GET /admin/backup/{job_id} for progress.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import db
+
+BACKUP_DIR = Path(os.environ.get("POKEMON_BACKUP_DIR", db.ROOT / "backups"))
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def sha256_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BackupManager:
+    def __init__(self, backup_dir: Path = BACKUP_DIR, keep: int = 7, pages: int = 256,
+                 sleep_s: float = 0.005, max_restarts: int = 3, max_jobs: int = 20):
+        if keep < 1 or pages < 1:
+            raise ValueError("keep and pages must be >= 1")
+        self.backup_dir = Path(backup_dir)
+        self.keep = keep
+        self.pages = pages
+        self.sleep_s = sleep_s
+        self.max_restarts = max_restarts
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 1
+        self._running: Optional[int] = None
+
+    # -----------------------
+    # jobs
+    # -----------------------
+    def start(self, backend=None) -> Tuple[Dict[str, Any], bool]:
+        """Start a backup on a background thread; (job, False) if one is already running."""
+        backend = backend or db.get_backend()
+        self._check_backend(backend)
+        with self._lock:
+            if self._running is not None:
+                return dict(self._jobs[self._running]), False
+            job = self._new_job(backend)
+        threading.Thread(target=self._run_job, args=(backend, job["job_id"]), name="backup", daemon=True).start()
+        return dict(job), True
+
+    def run(self, backend=None) -> Dict[str, Any]:
+        """Take a backup on the calling thread (CLI); returns the finished job."""
+        backend = backend or db.get_backend()
+        self._check_backend(backend)
+        with self._lock:
+            if self._running is not None:
+                raise RuntimeError("a backup is already running")
+            job = self._new_job(backend)
+        self._run_job(backend, job["job_id"])
+        return self.job(job["job_id"])
+
+    def job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(j) for j in reversed(self._jobs.values())]
+
+    @staticmethod
+    def _check_backend(backend) -> None:
+        if backend.name != "sqlite":
+            raise RuntimeError("online backups use the SQLite backup API; use pg_dump for PostgreSQL")
+
+    def _new_job(self, backend) -> Dict[str, Any]:
+        # caller holds self._lock
+        job = {
+            "job_id": self._next_id, "state": "running", "source": str(backend.path),
+            "pages_total": None, "pages_done": 0, "percent": 0.0, "steps": 0, "restarts": 0,
+            "started_at": _now(), "finished_at": None, "elapsed_ms": None,
+            "snapshot": None, "sha256": None, "error": None,
+        }
+        self._next_id += 1
+        self._jobs[job["job_id"]] = job
+        self._running = job["job_id"]
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        return job
+
+    def _update(self, job_id: int, **fields) -> None:
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run_job(self, backend, job_id: int) -> None:
+        start = time.perf_counter()
+        try:
+            target, digest = self._snapshot(Path(backend.path), job_id)
+            self._update(job_id, state="done", snapshot=target.name, sha256=digest, percent=100.0)
+            self.rotate()
+        except Exception as e:
+            self._update(job_id, state="failed", error=str(e))
+        finally:
+            with self._lock:
+                self._jobs[job_id].update(finished_at=_now(), elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+                self._running = None
+
+    # -----------------------
+    # snapshot
+    # -----------------------
+    def _snapshot(self, source: Path, job_id: int) -> Tuple[Path, str]:
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        target = self._snapshot_name(source)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.unlink(missing_ok=True)
+
+        state = {"remaining": None, "restarts": 0}
+
+        def progress(status, remaining, total):
+            if state["remaining"] is not None and remaining > state["remaining"]:
+                # another connection wrote to the source; SQLite started over
+                state["restarts"] += 1
+                if state["restarts"] > self.max_restarts:
+                    raise _TooManyRestarts()
+            state["remaining"] = remaining
+            with self._lock:
+                job = self._jobs[job_id]
+                job.update(pages_total=total, pages_done=total - remaining, restarts=state["restarts"],
+                           percent=round(100.0 * (total - remaining) / total, 1) if total else 100.0)
+                job["steps"] += 1
+            if remaining and self.sleep_s:
+                # backup(sleep=) only applies on SQLITE_BUSY; pause here so writers get the disk between steps
+                time.sleep(self.sleep_s)
+
+        src = sqlite3.connect(str(source), timeout=db.BUSY_TIMEOUT_MS / 1000)
+        dst = sqlite3.connect(str(tmp))
+        try:
+            try:
+                src.backup(dst, pages=self.pages, progress=progress)
+            except _TooManyRestarts:
+                src.backup(dst, progress=progress)  # one step: a single read snapshot of the source
+            result = dst.execute("PRAGMA quick_check;").fetchone()[0]
+            if result != "ok":
+                raise RuntimeError(f"snapshot failed quick_check: {result}")
+        except BaseException:
+            dst.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            src.close()
+        dst.close()
+
+        digest = sha256_file(tmp)
+        os.replace(tmp, target)
+        self._checksum_path(target).write_text(f"{digest}  {target.name}\n", encoding="utf-8")
+        return target, digest
+
+    def _snapshot_name(self, source: Path) -> Path:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        target = self.backup_dir / f"{source.stem}-{stamp}.db"
+        n = 1
+        while target.exists():
+            n += 1
+            target = self.backup_dir / f"{source.stem}-{stamp}-{n}.db"
+        return target
+
+    @staticmethod
+    def _checksum_path(snapshot: Path) -> Path:
+        return snapshot.with_name(snapshot.name + ".sha256")
+
+    # -----------------------
+    # snapshots on disk
+    # -----------------------
+    def snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshots newest first, with the checksum recorded when each was taken."""
+        if not self.backup_dir.is_dir():
+            return []
+        out = []
+        for path in self.backup_dir.glob("*.db"):
+            stat = path.stat()
+            checksum = self._checksum_path(path)
+            out.append({
+                "name": path.name,
+                "bytes": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(timespec="seconds"),
+                "sha256": checksum.read_text(encoding="utf-8").split()[0] if checksum.is_file() else None,
+                "_mtime": stat.st_mtime,
+            })
+        out.sort(key=lambda s: (s["_mtime"], s["name"]), reverse=True)
+        for s in out:
+            del s["_mtime"]
+        return out
+
+    def rotate(self) -> List[str]:
+        """Delete all but the newest `keep` snapshots; returns the removed names."""
+        removed = []
+        for snap in self.snapshots()[self.keep:]:
+            path = self.backup_dir / snap["name"]
+            path.unlink(missing_ok=True)
+            self._checksum_path(path).unlink(missing_ok=True)
+            removed.append(snap["name"])
+        return removed
+
+    def _resolve(self, name: str) -> Path:
+        path = self.backup_dir / name
+        if Path(name).name != name or path.suffix != ".db" or not path.is_file():
+            raise LookupError(f"no snapshot named {name}")
+        return path
+
+    def verify(self, name: str) -> bool:
+        """True if the snapshot still matches the checksum written when it was taken."""
+        path = self._resolve(name)
+        checksum = self._checksum_path(path)
+        if not checksum.is_file():
+            return False
+        return sha256_file(path) == checksum.read_text(encoding="utf-8").split()[0]
+
+    # -----------------------
+    # restore
+    # -----------------------
+    def restore(self, name: str, backend=None) -> Dict[str, Any]:
+        """
+        Copy a verified snapshot over the live database in one transaction.
+        LookupError: unknown snapshot; ValueError: checksum mismatch.
+        """
+        backend = backend or db.get_backend()
+        self._check_backend(backend)
+        path = self._resolve(name)
+        if not self.verify(name):
+            raise ValueError(f"{name} does not match its sha256 checksum; not restoring it")
+
+        start = time.perf_counter()
+        # staged in memory so the feed can be moved on before anyone sees the restored data
+        staged = sqlite3.connect(":memory:")
+        try:
+            snap = sqlite3.connect(path.resolve().as_uri() + "?mode=ro", uri=True)
+            try:
+                snap.backup(staged)
+            finally:
+                snap.close()
+            pages = staged.execute("PRAGMA page_count;").fetchone()[0]
+            with backend._write_lock():
+                live = sqlite3.connect(str(backend.path), timeout=db.BUSY_TIMEOUT_MS / 1000)
+                try:
+                    floor = _move_feed_past(staged, live)
+                    staged.backup(live)
+                finally:
+                    live.close()
+        finally:
+            staged.close()
+        backend._schema_ready = False  # an older snapshot may predate the latest migrations
+        return {"restored": name, "pages": pages, "change_feed_floor": floor,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+def _issued_seq(conn: sqlite3.Connection) -> int:
+    """Highest change_log seq ever handed out (AUTOINCREMENT never reuses one)."""
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log';").fetchone()
+    except sqlite3.OperationalError:  # no AUTOINCREMENT table yet
+        return 0
+    return int(row[0]) if row else 0
+
+
+def _move_feed_past(staged: sqlite3.Connection, live: sqlite3.Connection) -> int:
+    """
+    Set the staged copy's feed floor past everything the live feed issued,
+    so no seq, cursor or table version of the live database means something
+    else after the restore. The copy's own change_log entries are all below
+    the floor, so no cursor can reach them; they are dropped. Returns the floor.
+    """
+    floor = max(_issued_seq(live), _issued_seq(staged)) + 1
+    for name in ("05_change_log.sql", "13_change_feed.sql"):  # the snapshot may predate them
+        staged.executescript((db.SQL_DIR / name).read_text(encoding="utf-8"))
+    staged.execute("DELETE FROM change_log;")
+    staged.execute("UPDATE change_feed SET floor_seq = ?, updated_at = ? WHERE id = 1;", (floor, _now()))
+    # the next entry gets floor + 1, so a client that resyncs at the floor misses nothing
+    if staged.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'change_log';", (floor,)).rowcount == 0:
+        staged.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', ?);", (floor,))
+    staged.commit()
+    return floor
+
+
+def manager_from_env() -> BackupManager:
+    return BackupManager(
+        keep=int(os.environ.get("POKEMON_BACKUP_KEEP", "7")),
+        pages=int(os.environ.get("POKEMON_BACKUP_PAGES", "256")),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Online backup / restore of the SQLite database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create", help="take a snapshot now")
+    sub.add_parser("list", help="list snapshots, newest first")
+    p = sub.add_parser("verify", help="check a snapshot against its sha256")
+    p.add_argument("name")
+    p = sub.add_parser("restore", help="restore a snapshot into the live database")
+    p.add_argument("name")
+    parser.add_argument("--tenant", default=None, help="back up / restore a tenant shard instead of the main database")
+    args = parser.parse_args()
+
+    manager = manager_from_env()
+    if args.tenant:
+        manager.backup_dir = manager.backup_dir / "tenants" / args.tenant  # rotated separately
+    try:
+        with db.use_tenant(args.tenant):
+            _command(manager, args)
+    except (LookupError, ValueError, RuntimeError) as e:
+        sys.exit(str(e))
+
+
+def _command(manager: BackupManager, args) -> None:
+    if args.command == "create":
+        job = manager.run()
+        if job["state"] != "done":
+            sys.exit(f"backup failed: {job['error']}")
+        print(f"{job['snapshot']}  {job['pages_total']} pages in {job['elapsed_ms']} ms "
+              f"({job['restarts']} restart(s))  sha256 {job['sha256']}")
+    elif args.command == "list":
+        for s in manager.snapshots():
+            print(f"{s['name']}  {s['bytes']:>10} bytes  {s['created_at']}  {s['sha256']}")
+    elif args.command == "verify":
+        ok = manager.verify(args.name)
+        print(f"{args.name}: {'ok' if ok else 'CHECKSUM MISMATCH'}")
+        sys.exit(0 if ok else 1)
+    else:
+        result = manager.restore(args.name)
+        print(f"restored {result['restored']} ({result['pages']} pages) in {result['elapsed_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+# bench.py
+"""
+Benchmarks for the service. Run from the pokemon-card-tracker folder:
+
+    python bench.py scaling --max-workers 4 --seconds 5
+
+    python bench.py backends --rows 5000 [--pg-url postgresql://...]
+
+    python bench.py contention --threads 8 --hot-items 2 --ops 500
+
+    python bench.py backup --rows 50000 --seconds 3
+
+    python bench.py rows --rows 1000000
+
+    python bench.py fresh --runs 50
+
+scaling:  starts serve.py with 1, 2, 4, ... workers and measures read
+          throughput (requests/second) against one endpoint.
+backends: runs the same repository workload against SQLite (a temporary
+          copy of the database) and, with --pg-url, PostgreSQL. The
+          PostgreSQL database is DROPPED and re-seeded: use a scratch one.
+contention: threads decrementing a few hot inventory items, comparing the
+          atomic adjust (one conditional UPDATE) against the old
+          read-then-PUT pattern; reports ops/s and lost updates.
+backup:   write latency (p50/p99/max) of a steady writer with no backup
+          running vs. while online backups (backup.py) run back to back.
+rows:     fetches the full inventory listing (on a copy with --rows extra
+          items) as sqlite3.Row, dicts and the records from models.py, and
+          reports fetch time, memory held by the result (tracemalloc) and
+          JSON encoding time.
+fresh:    what a test pays for a clean database: rebuilding a file from
+          the SQL scripts, copying pokemon_cards.db, or cloning an
+          in-memory template (db.DatabaseTemplate), plus a small
+          repository workload on each.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import requests
+
+import db
+from startup import prepare
+
+ROOT = Path(__file__).resolve().parent
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def _client_loop(args) -> int:
+    url, seconds = args
+    done = 0
+    deadline = time.time() + seconds
+    with requests.Session() as session:
+        while time.time() < deadline:
+            if session.get(url).status_code == 200:
+                done += 1
+    return done
+
+
+def run_load(url: str, clients: int, seconds: float) -> float:
+    """Hammer url from `clients` processes (keep-alive sessions); return requests/sec."""
+    with multiprocessing.Pool(clients) as pool:
+        counts = pool.map(_client_loop, [(url, seconds)] * clients)
+    return sum(counts) / seconds
+
+
+# -----------------------------
+# scaling
+# -----------------------------
+def bench_scaling(args) -> None:
+    counts = []
+    n = 1
+    while n <= args.max_workers:
+        counts.append(n)
+        n *= 2
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    url = f"http://127.0.0.1:{args.port}{args.path}"
+    baseline = None
+    print(f"{'workers':>7} | {'req/s':>9} | speedup")
+    for workers in counts:
+        proc = subprocess.Popen(
+            [sys.executable, "serve.py", "--workers", str(workers), "--port", str(args.port)],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(url)
+            run_load(url, args.clients, 1.0)  # warm-up
+            rps = run_load(url, args.clients, args.seconds)
+        finally:
+            proc.terminate()
+            proc.wait()
+        baseline = baseline or rps
+        print(f"{workers:>7} | {rps:>9.1f} | {rps / baseline:.2f}x")
+
+
+# -----------------------------
+# backends
+# -----------------------------
+def _timed(label: str, n: int, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {elapsed * 1000:>9.1f} ms  ({n / elapsed:>10.0f} rows/s)")
+
+
+def _repository_workload(rows: int) -> None:
+    from repositories import InventoryRepository
+
+    repo = InventoryRepository()
+    item = {"card_id": 4, "condition_id": 1, "quantity": 1, "purchase_price": 1.0, "purchase_date": "2026-01-01"}
+    ids = []
+
+    _timed("create (1 txn each)", rows, lambda: ids.extend(repo.create(**item) for _ in range(rows)))
+    _timed("get_by_id", rows, lambda: [repo.get_by_id(i) for i in ids])
+    _timed("update quantity", rows, lambda: [repo.update(i, quantity=2) for i in ids])
+    _timed("bulk_create", rows, lambda: repo.bulk_create(item for _ in range(rows)))
+    total = len(repo.get_all())
+    _timed("get_all (joined)", total, repo.get_all)
+    _timed("iter_all (streamed)", total, lambda: sum(1 for _ in repo.iter_all()))
+    _timed("delete", rows, lambda: [repo.delete(i) for i in ids])
+
+
+def bench_backends(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / "pokemon_cards.db"
+        shutil.copyfile(db.pick_db(), copy)
+        targets = [("sqlite", lambda: db.SQLiteBackend(copy))]
+        if args.pg_url:
+            def make_pg():
+                backend = db.PostgresBackend(args.pg_url)
+                backend.init_schema(seed=True)
+                return backend
+            targets.append(("postgres", make_pg))
+
+        for name, make in targets:
+            previous = db.use_backend(make())
+            try:
+                print(f"{name}:")
+                _repository_workload(args.rows)
+            finally:
+                db.use_backend(previous)
+
+
+# -----------------------------
+# contention
+# -----------------------------
+def _hammer(threads: int, ops: int, hot_ids, op) -> float:
+    """Each thread runs `ops` decrements spread over the hot items; returns ops/sec."""
+    barrier = threading.Barrier(threads)
+
+    def worker(n: int) -> None:
+        barrier.wait()
+        for k in range(ops):
+            op(hot_ids[(n + k) % len(hot_ids)])
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return threads * ops / (time.perf_counter() - start)
+
+
+def bench_contention(args) -> None:
+    from repositories import InventoryRepository
+
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / "pokemon_cards.db"
+        shutil.copyfile(db.pick_db(), copy)
+        previous = db.use_backend(db.SQLiteBackend(copy))
+        try:
+            repo = InventoryRepository()
+            total = args.threads * args.ops
+            stock = total // args.hot_items + 1  # never reaches 0
+
+            def read_modify_write(item_id: int) -> None:
+                row = repo.get_by_id(item_id)
+                repo.update(item_id, quantity=row["quantity"] - 1)
+
+            def atomic_adjust(item_id: int) -> None:
+                repo.adjust(item_id, -1)
+
+            print(f"{args.threads} threads x {args.ops} ops on {args.hot_items} hot item(s)")
+            print(f"{'method':<20} | {'ops/s':>9} | lost updates")
+            for label, op in (("read + update", read_modify_write), ("atomic adjust", atomic_adjust)):
+                item = {"card_id": 4, "condition_id": 1, "quantity": stock, "purchase_price": 1.0}
+                hot_ids = [repo.create(**item) for _ in range(args.hot_items)]
+                rate = _hammer(args.threads, args.ops, hot_ids, op)
+                remaining = sum(repo.get_by_id(i)["quantity"] for i in hot_ids)
+                lost = remaining - (stock * args.hot_items - total)
+                print(f"{label:<20} | {rate:>9.1f} | {lost}")
+        finally:
+            db.use_backend(previous)
+
+
+# -----------------------------
+# backup
+# -----------------------------
+def _percentile(sorted_ms, q: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))]
+
+
+def _write_latencies(op, seconds: float, busy: threading.Event = None) -> list:
+    """Run op() back to back for `seconds` (or while `busy` is set); latencies in ms, sorted."""
+    out = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline and (busy is None or busy.is_set()):
+        start = time.perf_counter()
+        op()
+        out.append((time.perf_counter() - start) * 1000)
+    return sorted(out)
+
+
+def bench_backup(args) -> None:
+    from backup import BackupManager
+    from repositories import InventoryRepository
+
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / "pokemon_cards.db"
+        shutil.copyfile(db.pick_db(), copy)
+        backend = db.SQLiteBackend(copy)
+        previous = db.use_backend(backend)
+        try:
+            backend.startup_check(require_wal=True)
+            repo = InventoryRepository()
+            item = {"card_id": 4, "condition_id": 1, "quantity": 1, "purchase_price": 1.0, "purchase_date": "2026-01-01"}
+            repo.bulk_create(item for _ in range(args.rows))
+            hot = repo.create(**item)
+            op = lambda: repo.adjust(hot, 1)
+            manager = BackupManager(Path(tmp) / "backups", keep=1, pages=args.pages)
+
+            baseline = _write_latencies(op, args.seconds)
+
+            busy = threading.Event()
+            busy.set()
+            jobs = []
+
+            def backups() -> None:
+                deadline = time.perf_counter() + args.seconds
+                while time.perf_counter() < deadline:
+                    jobs.append(manager.run(backend))
+                busy.clear()
+
+            runner = threading.Thread(target=backups)
+            runner.start()
+            during = _write_latencies(op, args.seconds * 10, busy)
+            runner.join()
+
+            pages = jobs[-1]["pages_total"]
+            print(f"{args.rows} extra rows, {pages} pages, {args.pages} pages per step")
+            print(f"{'writes':<16} | {'count':>6} | {'p50 ms':>7} | {'p99 ms':>7} | {'max ms':>7}")
+            for label, lat in (("no backup", baseline), ("during backup", during)):
+                print(f"{label:<16} | {len(lat):>6} | {_percentile(lat, 0.5):>7.2f} | "
+                      f"{_percentile(lat, 0.99):>7.2f} | {lat[-1]:>7.2f}")
+            done = [j for j in jobs if j["state"] == "done"]
+            print(f"{len(done)}/{len(jobs)} backups ok, avg {sum(j['elapsed_ms'] for j in done) / max(1, len(done)):.1f} ms, "
+                  f"{sum(j['restarts'] for j in jobs)} restart(s)")
+        finally:
+            db.use_backend(previous)
+
+
+def _fetch_all(conn, sql: str, factory):
+    conn.row_factory = factory
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = conn.execute(sql).fetchall()
+    elapsed = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return rows, elapsed, held
+
+
+def bench_rows(args) -> None:
+    from models import sqlite_row
+    from repositories import INVENTORY_LIST_SQL, InventoryRepository
+
+    # (label, row_factory, row -> dict for the JSON encoder)
+    variants = (
+        ("sqlite3.Row", sqlite3.Row, dict),
+        ("dict", lambda cur, row: {d[0]: v for d, v in zip(cur.description, row)}, lambda r: r),
+        ("record", sqlite_row, lambda r: r._asdict()),
+    )
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / "pokemon_cards.db"
+        shutil.copyfile(db.pick_db(), copy)
+        backend = db.SQLiteBackend(copy)
+        previous = db.use_backend(backend)
+        try:
+            item = {"card_id": 4, "condition_id": 1, "quantity": 1, "purchase_price": 1.0,
+                    "purchase_date": "2026-01-01", "notes": "bench"}
+            InventoryRepository().bulk_create(item for _ in range(args.rows))
+        finally:
+            db.use_backend(previous)
+
+        conn = sqlite3.connect(str(copy))
+        try:
+            print(f"inventory listing, {args.rows} extra rows")
+            print(f"{'rows as':<12} | {'rows':>8} | {'fetch s':>7} | {'held MB':>8} | {'B/row':>6} | {'encode s':>8}")
+            for label, factory, to_dict in variants:
+                rows, elapsed, held = _fetch_all(conn, INVENTORY_LIST_SQL + ";", factory)
+                start = time.perf_counter()
+                ",".join(encoder.encode(to_dict(r)) for r in rows)
+                encode_s = time.perf_counter() - start
+                print(f"{label:<12} | {len(rows):>8} | {elapsed:>7.2f} | {held / 2**20:>8.1f} | "
+                      f"{held // max(1, len(rows)):>6} | {encode_s:>8.2f}")
+                del rows
+        finally:
+            conn.close()
+
+
+def bench_fresh(args) -> None:
+    from repositories import InventoryRepository
+    from startup import bootstrap_sqlite
+
+    item = {"card_id": 4, "condition_id": 1, "quantity": 1, "purchase_price": 1.0, "purchase_date": "2026-01-01"}
+
+    def workload() -> None:
+        repo = InventoryRepository()
+        repo.adjust(repo.create(**item), -1)
+        repo.get_all()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = db.pick_db()
+        counter = iter(range(10 ** 9))
+
+        def from_scripts():
+            path = Path(tmp) / f"scripts-{next(counter)}.db"
+            bootstrap_sqlite(path)
+            return db.SQLiteBackend(path)
+
+        def file_copy():
+            path = Path(tmp) / f"copy-{next(counter)}.db"
+            shutil.copyfile(source, path)
+            return db.SQLiteBackend(path)
+
+        start = time.perf_counter()
+        template = db.DatabaseTemplate()
+        template_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{args.runs} fresh databases each (template built once in {template_ms:.1f} ms)")
+        print(f"{'fresh database':<18} | {'setup ms':>8} | {'workload ms':>11}")
+        for label, make in (("SQL scripts", from_scripts), ("file copy", file_copy), ("template clone", template.clone)):
+            setup = work = 0.0
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                backend = make()
+                mid = time.perf_counter()
+                with db.using_backend(backend):
+                    workload()
+                work += time.perf_counter() - mid
+                setup += mid - start
+                if isinstance(backend, db.MemoryBackend):
+                    backend.close()
+            print(f"{label:<18} | {setup * 1000 / args.runs:>8.2f} | {work * 1000 / args.runs:>11.2f}")
+        template.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pokemon Card Tracker benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scaling", help="read throughput vs. number of worker processes")
+    p.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--clients", type=int, default=16)
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--path", default="/inventory")
+    p.set_defaults(func=bench_scaling)
+
+    p = sub.add_parser("backends", help="repository workload on SQLite vs PostgreSQL")
+    p.add_argument("--rows", type=int, default=2000)
+    p.add_argument("--pg-url", default=None, help="scratch PostgreSQL database (will be re-created)")
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser("contention", help="atomic adjust vs read-modify-write on hot items")
+    p.add_argument("--threads", type=int, default=8)
+    p.add_argument("--hot-items", type=int, default=2)
+    p.add_argument("--ops", type=int, default=500, help="decrements per thread")
+    p.set_defaults(func=bench_contention)
+
+    p = sub.add_parser("backup", help="write latency while online backups run")
+    p.add_argument("--rows", type=int, default=50000, help="inventory rows added so the copy has some size")
+    p.add_argument("--pages", type=int, default=256, help="pages copied per backup step")
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.set_defaults(func=bench_backup)
+
+    p = sub.add_parser("rows", help="memory and time of a big listing per row type")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.set_defaults(func=bench_rows)
+
+    p = sub.add_parser("fresh", help="cost of a clean database per test: scripts vs file copy vs template clone")
+    p.add_argument("--runs", type=int, default=50)
+    p.set_defaults(func=bench_fresh)
+
+    args = parser.parse_args()
+    prepare()  # the copies below are taken from data/pokemon_cards.db
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
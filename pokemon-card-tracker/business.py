@@ -2,18 +2,74 @@
 """
 Business layer: wraps the repositories, adds validation + "did it exist?" checks.
 This layer is called by the service layer (api.py).
+
+Writes lean on the database constraints (foreign keys, CHECKs, UNIQUE)
+instead of looking referenced rows up first: a violation comes back as the
+same ValueError a pre-check would raise. validation="precheck" (and
+write-behind mode) keeps the lookups before the write.
 """
 
 from __future__ import annotations
-from typing import Optional, Any, Dict
+import re
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Any, Dict, List, Tuple
 
+from db import INTEGRITY_ERRORS, current_tenant, violated_constraint
 from repositories import (
     SetRepository,
     CardRepository,
     ConditionRepository,
     InventoryRepository,
+    ChangeLogRepository,
+    SaleRepository,
+    WantListRepository,
+    CompletionRepository,
+    AdjustmentRejected,
+    bitmap_has,
+    CONDITION_ORDER,
+    LOT_KEY,
+    ZERO_QTY_POLICIES,
 )
 
+if TYPE_CHECKING:
+    from writebehind import WriteBehindQueue
+
+CHANGE_TABLES = ("card_set", "card", "card_condition", "inventory_item")
+SUMMARY_PERIODS = ("day", "month")
+GRADED_PREFERENCES = ("any", "graded", "ungraded")
+COMPLETION_LISTS = ("missing", "owned", "none")
+VALIDATION_MODES = ("constraints", "precheck")
+
+# violated constraint (SQLite / PostgreSQL name) -> the ValueError message callers get
+CONSTRAINT_MESSAGES = {
+    "ck_graded_fields": "graded_company and grade required if is_graded=1",
+    "ck_quantity": "quantity must be >= 1",
+    "ck_purchase_price": "purchase_price must be >= 0",
+    "ck_is_graded": "is_graded must be 0 or 1",
+    "ck_is_foil": "is_foil must be 0 or 1",
+    "ck_graded_company": "graded_company must be PSA, BGS or CGC",
+    "ck_rarity": "rarity must be one of: Common, Uncommon, Rare, Double Rare, Ultra Rare, IR, SIR, Hyper Rare, Promo",
+    "ck_card_type": "card_type must be Pokémon, Trainer or Energy",
+    "ck_condition_code": "condition_code must be one of: NM, LP, MP, HP, DMG",
+    "card_set.set_code": "set_code already exists",
+    "card_set_set_code_key": "set_code already exists",
+    "card.set_id, card.card_number": "card_number already exists in that set",
+    "uq_card_per_set": "card_number already exists in that set",
+    "card_condition.condition_code": "condition_code already exists",
+    "card_condition_condition_code_key": "condition_code already exists",
+}
+_MONTH_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+class InsufficientQuantityError(ValueError):
+    """An adjust would take an item's quantity below zero (api.py maps this to 409)."""
+
+
+class CursorTooOldError(ValueError):
+    """A change feed cursor below the feed floor (api.py maps this to 410): reload the full lists."""
+
 
 class PokemonCardBusiness:
     def __init__(
@@ -22,11 +78,70 @@ class PokemonCardBusiness:
         cards_repo: Optional[CardRepository] = None,
         cond_repo: Optional[ConditionRepository] = None,
         inv_repo: Optional[InventoryRepository] = None,
+        changes_repo: Optional[ChangeLogRepository] = None,
+        write_queue: Optional["WriteBehindQueue"] = None,
+        zero_qty_policy: str = "delete",
+        merge_on_insert: bool = False,
+        sales_repo: Optional[SaleRepository] = None,
+        wants_repo: Optional[WantListRepository] = None,
+        completion_repo: Optional[CompletionRepository] = None,
+        validation: str = "constraints",
     ):
         self.sets_repo = sets_repo or SetRepository()
         self.cards_repo = cards_repo or CardRepository()
         self.cond_repo = cond_repo or ConditionRepository()
         self.inv_repo = inv_repo or InventoryRepository()
+        self.changes_repo = changes_repo or ChangeLogRepository()
+        self.sales_repo = sales_repo or SaleRepository(self.inv_repo)
+        self.wants_repo = wants_repo or WantListRepository()
+        self.completion_repo = completion_repo or CompletionRepository()
+        # optional write-behind queue for inventory creates/updates (see writebehind.py)
+        self._write_queue = write_queue
+        # what happens to an inventory row adjusted down to quantity 0
+        self.zero_qty_policy = self._check_zero_policy(zero_qty_policy)
+        # fold new purchases into an existing identical lot instead of adding a row
+        self.merge_on_insert = merge_on_insert
+        # constraints: write and map constraint violations to ValueError;
+        # precheck: look the referenced card/condition up before writing
+        if validation not in VALIDATION_MODES:
+            raise ValueError(f"validation must be one of: {', '.join(VALIDATION_MODES)}")
+        self.validation = validation
+
+    @property
+    def write_queue(self) -> Optional["WriteBehindQueue"]:
+        # the flusher commits to the main database, so tenant requests write directly to their shard
+        return self._write_queue if current_tenant() is None else None
+
+    @contextmanager
+    def _constraint_errors(self, *refs: Tuple[str, Any, Any]):
+        """
+        Turn a constraint violation in the block into the ValueError callers
+        expect. refs are (field, value, exists) for the foreign keys the write
+        sets; they are only looked up after a foreign key failed, to name it.
+        """
+        try:
+            yield
+        except INTEGRITY_ERRORS as e:
+            kind, name = violated_constraint(e)
+            if kind == "foreign_key":
+                for field, value, exists in refs:
+                    if name is not None and field not in name:
+                        continue  # PostgreSQL names the constraint, e.g. inventory_item_card_id_fkey
+                    if value is not None and not exists(int(value)):
+                        raise ValueError(f"{field} {value} does not exist") from e
+                raise ValueError("a referenced row does not exist") from e
+            if kind == "not_null":
+                raise ValueError(f"{(name or 'a required field').split('.')[-1]} is required") from e
+            message = CONSTRAINT_MESSAGES.get(name or "")
+            if message is None:
+                raise
+            raise ValueError(message) from e
+
+    def _inventory_refs(self, fields: Dict[str, Any]):
+        return (
+            ("card_id", fields.get("card_id"), self.get_card),
+            ("condition_id", fields.get("condition_id"), self._condition_exists),
+        )
 
     # -----------------------
     # SETS (CRUD)
@@ -34,7 +149,8 @@ class PokemonCardBusiness:
     def create_set(self, set_code: str, set_name: str, release_date: str, era: str) -> int:
         if not set_code or not set_name:
             raise ValueError("set_code and set_name are required")
-        return self.sets_repo.create(set_code, set_name, release_date, era)
+        with self._constraint_errors():
+            return self.sets_repo.create(set_code, set_name, release_date, era)
 
     def list_sets(self):
         return self.sets_repo.get_all()
@@ -45,7 +161,8 @@ class PokemonCardBusiness:
     def update_set(self, set_id: int, **fields: Any) -> bool:
         if not self.get_set(set_id):
             return False
-        self.sets_repo.update(set_id, **fields)
+        with self._constraint_errors():
+            self.sets_repo.update(set_id, **fields)
         return True
 
     def delete_set(self, set_id: int) -> bool:
@@ -62,7 +179,10 @@ class PokemonCardBusiness:
             raise ValueError("set_id must be positive")
         if not card_number or not card_name:
             raise ValueError("card_number and card_name are required")
-        return self.cards_repo.create(set_id, card_number, card_name, rarity, card_type)
+        with self._constraint_errors(("set_id", set_id, self.get_set)):
+            card_id = self.cards_repo.create(set_id, card_number, card_name, rarity, card_type)
+        self._refresh_want_matches()
+        return card_id
 
     def list_cards(self):
         return self.cards_repo.get_all()
@@ -70,63 +190,79 @@ class PokemonCardBusiness:
     def get_card(self, card_id: int):
         return self.cards_repo.get_by_id(card_id)
 
+    def get_cards_by_ids(self, card_ids: List[int]):
+        return self.cards_repo.get_by_ids(sorted(set(card_ids)))
+
     def list_cards_in_set(self, set_id: int):
         return self.cards_repo.get_by_set(set_id)
 
     def update_card(self, card_id: int, **fields: Any) -> bool:
         if not self.get_card(card_id):
             return False
-        self.cards_repo.update(card_id, **fields)
+        with self._constraint_errors(("set_id", fields.get("set_id"), self.get_set)):
+            self.cards_repo.update(card_id, **fields)
+        self._refresh_want_matches()
         return True
 
     def delete_card(self, card_id: int) -> bool:
         if not self.get_card(card_id):
             return False
         self.cards_repo.delete(card_id)
+        self._refresh_want_matches()
         return True
 
     # -----------------------
-    # CONDITIONS (CRUD-ish)
-    # (your repo has create/get_all/update/delete; no get_by_id)
+    # CONDITIONS (CRUD)
     # -----------------------
     def create_condition(self, condition_code: str, description: str) -> int:
         if not condition_code or not description:
             raise ValueError("condition_code and description are required")
-        return self.cond_repo.create(condition_code, description)
+        with self._constraint_errors():
+            return self.cond_repo.create(condition_code, description)
 
     def list_conditions(self):
         return self.cond_repo.get_all()
 
+    def get_condition(self, condition_id: int):
+        return self.cond_repo.get_by_id(condition_id)
+
     def update_condition(self, condition_id: int, **fields: Any) -> bool:
-        # no get_by_id in repo; approximate existence check by scanning get_all
-        exists = any(r["condition_id"] == condition_id for r in self.list_conditions())
-        if not exists:
+        if not self.get_condition(condition_id):
             return False
-        self.cond_repo.update(condition_id, **fields)
+        with self._constraint_errors():
+            self.cond_repo.update(condition_id, **fields)
         return True
 
     def delete_condition(self, condition_id: int) -> bool:
-        exists = any(r["condition_id"] == condition_id for r in self.list_conditions())
-        if not exists:
+        if not self.get_condition(condition_id):
             return False
         self.cond_repo.delete(condition_id)
         return True
 
-       # -----------------------
+    # -----------------------
     # INVENTORY (CRUD)
     # -----------------------
     def _condition_exists(self, condition_id: int) -> bool:
-        return any(r["condition_id"] == condition_id for r in self.list_conditions())
+        return self.get_condition(condition_id) is not None
 
-    def create_inventory_item(self, **fields: Any) -> int:
-        # REQUIRED existence checks (prevents DB constraint explosions)
-        card_id = int(fields.get("card_id", 0))
-        condition_id = int(fields.get("condition_id", 0))
+    def _precheck(self) -> bool:
+        # write-behind commits in groups later, so a bad row must be caught before it is queued;
+        # a tenant shard has no foreign keys to the catalog it ATTACHes, so nothing else would catch it
+        return self.validation == "precheck" or self.write_queue is not None or current_tenant() is not None
 
-        if not self.get_card(card_id):
-            raise ValueError(f"card_id {card_id} does not exist")
-        if not self._condition_exists(condition_id):
-            raise ValueError(f"condition_id {condition_id} does not exist")
+    @staticmethod
+    def _check_grade(grade: Any) -> None:
+        if grade is not None and not 1 <= grade <= 10:
+            raise ValueError("grade must be between 1 and 10")
+
+    def _check_refs(self, fields: Dict[str, Any]) -> None:
+        for field, value, exists in self._inventory_refs(fields):
+            if value is not None and not exists(int(value)):
+                raise ValueError(f"{field} {value} does not exist")
+
+    def create_inventory_item(self, merge: Optional[bool] = None, **fields: Any) -> int:
+        if self._precheck():
+            self._check_refs({"card_id": int(fields.get("card_id", 0)), "condition_id": int(fields.get("condition_id", 0))})
 
         # enforce sanity
         if fields.get("quantity", 1) < 1:
@@ -141,34 +277,64 @@ class PokemonCardBusiness:
         if is_graded == 1:
             if fields.get("graded_company") is None or fields.get("grade") is None:
                 raise ValueError("graded_company and grade required if is_graded=1")
+            self._check_grade(fields["grade"])
         else:
             fields["graded_company"] = None
             fields["grade"] = None
 
-        return self.inv_repo.create(**fields)
+        with self._constraint_errors(*self._inventory_refs(fields)):
+            item_id = None
+            if self.merge_on_insert if merge is None else merge:
+                if self.write_queue is not None:
+                    self.write_queue.drain()  # queued updates must not overwrite the merged quantity
+                item_id = self.inv_repo.add_to_lot(fields)
+
+            if item_id is None and self.write_queue is not None:
+                # group-committed with other queued writes; wait for the new item_id
+                item_id = self.write_queue.submit_create(fields).result()
+            elif item_id is None:
+                item_id = self.inv_repo.create(**fields)
+        self._refresh_want_matches()
+        return item_id
+
+    def _overlay_pending(self, rows):
+        # read-your-writes: show queued write-behind updates on top of committed rows
+        if self.write_queue is None:
+            return rows
+        pending = self.write_queue.pending_all()
+        if not pending:
+            return rows
+        return [{**r._asdict(), **pending[r.item_id]} if r.item_id in pending else r for r in rows]
 
     def list_inventory(self):
-        return self.inv_repo.get_all()
+        return self._overlay_pending(self.inv_repo.get_all())
 
     def list_inventory_by_set(self, set_id: int):
-        return self.inv_repo.get_by_set(set_id)
+        return self._overlay_pending(self.inv_repo.get_by_set(set_id))
 
-    def get_inventory_item(self, item_id: int):
-        return self.inv_repo.get_by_id(item_id)
-
-    def update_inventory_item(self, item_id: int, **fields: Any) -> bool:
-        current = self.get_inventory_item(item_id)
-        if not current:
-            return False
+    def list_inventory_page(self, after_id: int, limit: int, set_id: Optional[int] = None,
+                            is_graded: Optional[int] = None):
+        return self._overlay_pending(self.inv_repo.get_page(after_id, limit, set_id, is_graded))
 
-        # if card_id/condition_id are being changed, validate they exist
-        if "card_id" in fields and fields["card_id"] is not None:
-            if not self.get_card(int(fields["card_id"])):
-                raise ValueError(f"card_id {fields['card_id']} does not exist")
+    def get_inventory_items_by_ids(self, item_ids: List[int]):
+        return self._overlay_pending(self.inv_repo.get_by_ids(sorted(set(item_ids))))
 
-        if "condition_id" in fields and fields["condition_id"] is not None:
-            if not self._condition_exists(int(fields["condition_id"])):
-                raise ValueError(f"condition_id {fields['condition_id']} does not exist")
+    def get_inventory_item(self, item_id: int):
+        row = self.inv_repo.get_by_id(item_id)
+        if row is None or self.write_queue is None:
+            return row
+        pending = self.write_queue.pending(item_id)
+        return {**row._asdict(), **pending} if pending else row
+
+    def update_inventory_item(self, item_id: int, durable: bool = True, **fields: Any) -> bool:
+        precheck = self._precheck()
+        current = None
+        if precheck or not fields:
+            current = self.get_inventory_item(item_id)
+            if not current:
+                return False
+        if precheck:
+            self._check_refs(fields)  # only the card_id / condition_id being changed
 
         # enforce sanity if provided
         if "quantity" in fields and fields["quantity"] is not None and fields["quantity"] < 1:
@@ -177,25 +343,361 @@ class PokemonCardBusiness:
         if "purchase_price" in fields and fields["purchase_price"] is not None and fields["purchase_price"] < 0:
             raise ValueError("purchase_price must be >= 0")
 
+        self._check_grade(fields.get("grade"))
+
         # graded rules on UPDATE too:
         # - if is_graded set to 0 -> clear grade fields
         # - if is_graded set to 1 -> require graded_company/grade either in update OR already present
+        #   (without a precheck read, ck_graded_fields checks the row as it ends up)
         if "is_graded" in fields and fields["is_graded"] is not None:
             is_graded = int(fields["is_graded"])
             if is_graded == 0:
                 fields["graded_company"] = None
                 fields["grade"] = None
-            else:
+            elif current is not None:
                 graded_company = fields.get("graded_company", current.get("graded_company"))
                 grade = fields.get("grade", current.get("grade"))
                 if graded_company is None or grade is None:
                     raise ValueError("graded_company and grade required if is_graded=1")
 
-        self.inv_repo.update(item_id, **fields)
-        return True
+        if self.write_queue is not None:
+            # durable=False is the fast ack: return once the update is queued
+            pending = self.write_queue.submit_update(item_id, fields)
+            if durable:
+                with self._constraint_errors(*self._inventory_refs(fields)):
+                    pending.result()
+                self._refresh_want_matches()
+            return True
+
+        with self._constraint_errors(*self._inventory_refs(fields)):
+            updated = self.inv_repo.update(item_id, **fields)
+        self._refresh_want_matches()
+        return updated or current is not None
 
     def delete_inventory_item(self, item_id: int) -> bool:
         if not self.get_inventory_item(item_id):
             return False
+        if self.write_queue is not None:
+            self.write_queue.discard(item_id)
         self.inv_repo.delete(item_id)
+        self._refresh_want_matches()
+        return True
+
+    # -----------------------
+    # INVENTORY (lot consolidation)
+    # -----------------------
+    def find_duplicate_lots(self, limit: int = 500, full: bool = False):
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        return self.inv_repo.find_duplicate_lots(limit, full=full)
+
+    def consolidate_lots(self, dry_run: bool = False, limit: int = 500, full: bool = False) -> Dict[str, Any]:
+        """
+        Merge up to `limit` duplicate lots (each in its own transaction); dry_run
+        only lists them. Only lots changed since the last complete pass are
+        looked at, unless full=True.
+        """
+        if not dry_run and self.write_queue is not None:
+            self.write_queue.drain()  # queued rows must be in change_log before the mark moves past them
+        # read before the search: rows written during the pass are left for the next one
+        head = self.changes_repo.table_heads(("inventory_item",))["inventory_item"]
+        lots = self.find_duplicate_lots(limit, full=full)
+        report: Dict[str, Any] = {"candidates": len(lots), "merge_ids": [], "rows_removed": 0}
+        if dry_run:
+            report["lots"] = [dict(r) for r in lots]
+            return report
+        for lot in lots:
+            merge_id = self.inv_repo.merge_lot({c: lot[c] for c in LOT_KEY})
+            if merge_id is not None:
+                report["merge_ids"].append(merge_id)
+                report["rows_removed"] += lot["row_count"] - 1
+        if len(lots) < limit:
+            self.inv_repo.mark_lots_scanned(head)  # nothing left behind the limit
+        if report["merge_ids"]:
+            self._refresh_want_matches()
+        return report
+
+    def list_lot_merges(self, limit: int = 100):
+        return self.inv_repo.get_merges(limit)
+
+    def undo_lot_merge(self, merge_id: int) -> Optional[Dict[str, Any]]:
+        """None if merge_id is unknown; ValueError if it can no longer be undone."""
+        try:
+            return self.inv_repo.undo_merge(merge_id)
+        except LookupError:
+            return None
+
+    # -----------------------
+    # INVENTORY (atomic quantity adjust, e.g. point-of-sale)
+    # -----------------------
+    @staticmethod
+    def _check_zero_policy(policy: str) -> str:
+        if policy not in ZERO_QTY_POLICIES:
+            raise ValueError(f"zero_policy must be one of: {', '.join(ZERO_QTY_POLICIES)}")
+        return policy
+
+    def _settle_pending(self, item_ids) -> None:
+        # a queued absolute update would overwrite the adjusted quantity: commit it first
+        if self.write_queue is not None and any(self.write_queue.pending(i) for i in item_ids):
+            self.write_queue.drain()
+
+    def adjust_inventory_quantity(
+        self, item_id: int, delta: int, zero_policy: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        quantity += delta in one conditional UPDATE. Returns None if the item
+        does not exist; raises InsufficientQuantityError if it would go below 0.
+        """
+        if delta == 0:
+            raise ValueError("delta must not be 0")
+        policy = self._check_zero_policy(zero_policy or self.zero_qty_policy)
+        self._settle_pending([item_id])
+        try:
+            quantity, removed = self.inv_repo.adjust(item_id, delta, policy)
+        except AdjustmentRejected as e:
+            if e.quantity is None:
+                return None
+            raise InsufficientQuantityError(f"item_id {item_id} has quantity {e.quantity}, cannot adjust by {delta}")
+        self._refresh_want_matches()
+        return {"item_id": item_id, "quantity": quantity, "removed": removed}
+
+    def adjust_inventory_quantities(
+        self, adjustments: List[Tuple[int, int]], zero_policy: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """All-or-nothing multi-item adjust (one transaction); any failure rolls back every item."""
+        if not adjustments:
+            raise ValueError("at least one adjustment is required")
+        item_ids = [item_id for item_id, _ in adjustments]
+        if len(set(item_ids)) != len(item_ids):
+            raise ValueError("each item_id may appear only once")
+        if any(delta == 0 for _, delta in adjustments):
+            raise ValueError("delta must not be 0")
+        policy = self._check_zero_policy(zero_policy or self.zero_qty_policy)
+        self._settle_pending(item_ids)
+        try:
+            results = self.inv_repo.adjust_many(adjustments, policy)
+        except AdjustmentRejected as e:
+            if e.quantity is None:
+                raise ValueError(f"item_id {e.item_id} does not exist")
+            delta = dict(adjustments)[e.item_id]
+            raise InsufficientQuantityError(f"item_id {e.item_id} has quantity {e.quantity}, cannot adjust by {delta}")
+        self._refresh_want_matches()
+        return [
+            {"item_id": item_id, "quantity": quantity, "removed": removed}
+            for item_id, (quantity, removed) in zip(item_ids, results)
+        ]
+
+    # -----------------------
+    # SET COMPLETION
+    # (bitmaps are maintained by the repositories; the first request for a set builds it)
+    # -----------------------
+    def get_set_completion(self, set_id: int, cards: str = "missing") -> Optional[Dict[str, Any]]:
+        if cards not in COMPLETION_LISTS:
+            raise ValueError(f"cards must be one of: {', '.join(COMPLETION_LISTS)}")
+        if not self.get_set(set_id):
+            return None
+        self.completion_repo.build_missing(set_id)
+        row = self.completion_repo.get(set_id)
+        if row is None:
+            return None
+
+        bitmap = bytes(row["bitmap"])
+        result = {
+            "set_id": set_id,
+            "set_code": row["set_code"],
+            "set_name": row["set_name"],
+            "total": row["total"],
+            "owned": row["owned"],
+            "missing_count": row["total"] - row["owned"],
+            "percent": round(100.0 * row["owned"] / row["total"], 1) if row["total"] else 0.0,
+            "updated_at": row["updated_at"],
+        }
+        if cards != "none":
+            want_owned = cards == "owned"
+            result[cards] = [
+                dict(p) for p in self.completion_repo.get_positions(set_id)
+                if bitmap_has(bitmap, p["position"]) == want_owned
+            ]
+        return result
+
+    def completion_leaderboard(self, limit: int = 50):
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        self.completion_repo.build_missing()
+        return self.completion_repo.leaderboard(limit)
+
+    # -----------------------
+    # SALES LEDGER
+    # -----------------------
+    @staticmethod
+    def _check_month(month: str) -> str:
+        if not _MONTH_RE.match(month or ""):
+            raise ValueError("month must be YYYY-MM")
+        return month
+
+    @staticmethod
+    def _normalize_sold_at(sold_at: Optional[str]) -> str:
+        if sold_at is None:
+            return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            if len(sold_at) == 10:
+                return date.fromisoformat(sold_at).isoformat()
+            return datetime.fromisoformat(sold_at).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            raise ValueError("sold_at must be an ISO date (YYYY-MM-DD) or date-time")
+
+    def record_sale(
+        self, item_id: int, sale_price: float, quantity: int = 1, sold_at: Optional[str] = None,
+        notes: Optional[str] = None, zero_policy: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Sell quantity copies of an item: decrement + ledger row + rollups in one transaction."""
+        if quantity < 1:
+            raise ValueError("quantity must be >= 1")
+        if sale_price < 0:
+            raise ValueError("sale_price must be >= 0")
+        sold_at = self._normalize_sold_at(sold_at)
+        policy = self._check_zero_policy(zero_policy or self.zero_qty_policy)
+        self._settle_pending([item_id])
+        try:
+            sale = self.sales_repo.record(item_id, quantity, sale_price, sold_at, notes, policy)
+        except AdjustmentRejected as e:
+            if e.quantity is None:
+                return None
+            raise InsufficientQuantityError(f"item_id {item_id} has quantity {e.quantity}, cannot sell {quantity}")
+        self._refresh_want_matches()
+        return sale
+
+    def sales_summary(self, period: str = "month", start: Optional[str] = None, end: Optional[str] = None):
+        if period not in SUMMARY_PERIODS:
+            raise ValueError(f"period must be one of: {', '.join(SUMMARY_PERIODS)}")
+        return self.sales_repo.summary(period, start, end)
+
+    def list_sales(self, month: str):
+        return self.sales_repo.get_month(self._check_month(month))
+
+    def list_sale_partitions(self):
+        return self.sales_repo.partitions()
+
+    def archive_sales_month(self, month: str, archive_dir: Path) -> Optional[str]:
+        """Compact a finished month into its own file. None if the month has no sales."""
+        month = self._check_month(month)
+        if month >= datetime.now(timezone.utc).strftime("%Y-%m"):
+            raise ValueError("only past months can be archived")
+        tenant_id = current_tenant()
+        if tenant_id is not None:
+            archive_dir = archive_dir / tenant_id  # same sale_YYYYMM.db names in every shard
+        try:
+            return self.sales_repo.archive_month(month, archive_dir)
+        except LookupError:
+            return None
+
+    # -----------------------
+    # WANT LISTS
+    # -----------------------
+    @staticmethod
+    def _clean_want_entry(n: int, entry: Dict[str, Any]) -> Dict[str, Any]:
+        entry = dict(entry)
+        for key in ("set_code", "card_number", "card_name"):
+            if isinstance(entry.get(key), str):
+                entry[key] = entry[key].strip() or None
+        if not ((entry.get("set_code") and entry.get("card_number")) or entry.get("card_name")):
+            raise ValueError(f"entry {n}: give set_code + card_number, or card_name")
+        if entry.get("card_number") and not entry.get("set_code"):
+            raise ValueError(f"entry {n}: card_number needs a set_code")
+        if entry.setdefault("quantity", 1) < 1:
+            raise ValueError(f"entry {n}: quantity must be >= 1")
+        entry["min_condition"] = (entry.get("min_condition") or CONDITION_ORDER[-1]).upper()
+        if entry["min_condition"] not in CONDITION_ORDER:
+            raise ValueError(f"entry {n}: min_condition must be one of: {', '.join(CONDITION_ORDER)}")
+        entry["graded"] = entry.get("graded") or "any"
+        if entry["graded"] not in GRADED_PREFERENCES:
+            raise ValueError(f"entry {n}: graded must be one of: {', '.join(GRADED_PREFERENCES)}")
+        if entry.get("min_grade") is not None and entry["graded"] == "ungraded":
+            raise ValueError(f"entry {n}: min_grade conflicts with graded=ungraded")
+        return entry
+
+    def create_want_list(self, customer: str, entries: List[Dict[str, Any]], notes: Optional[str] = None) -> int:
+        if not customer or not customer.strip():
+            raise ValueError("customer is required")
+        if not entries:
+            raise ValueError("at least one entry is required")
+        cleaned = [self._clean_want_entry(n, e) for n, e in enumerate(entries, 1)]
+        return self.wants_repo.create(customer.strip(), notes, cleaned)
+
+    def list_want_lists(self):
+        return self.wants_repo.get_all()
+
+    def get_want_list(self, want_list_id: int):
+        return self.wants_repo.get_by_id(want_list_id)
+
+    def get_want_list_entries(self, want_list_id: int):
+        return self.wants_repo.get_entries(want_list_id)
+
+    def delete_want_list(self, want_list_id: int) -> bool:
+        if not self.get_want_list(want_list_id):
+            return False
+        self.wants_repo.delete(want_list_id)
         return True
+
+    def rematch_want_lists(self, full: bool = False) -> Dict[str, Any]:
+        return self.wants_repo.rematch(full=full)
+
+    def _refresh_want_matches(self) -> None:
+        # called after card / inventory writes, so reading matches never has to write
+        last, head, entries = self.wants_repo.match_state()
+        if entries and head > last:
+            self.wants_repo.rematch()
+
+    def match_want_list(self, want_list_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Per entry: how many are wanted, how many we have, and the matching
+        items (best condition, then cheapest). Read-only: the stored matches
+        are refreshed on the card / inventory write path, and quantities and
+        prices are read live.
+        """
+        if not self.get_want_list(want_list_id):
+            return None
+
+        by_entry: Dict[int, List[Dict[str, Any]]] = {}
+        for m in self.wants_repo.get_matches(want_list_id):
+            by_entry.setdefault(m["entry_id"], []).append(dict(m))
+        result = []
+        for e in self.get_want_list_entries(want_list_id):
+            items = by_entry.get(e["entry_id"], [])
+            available = sum(i["available"] for i in items)
+            result.append({
+                **dict(e),
+                "available": available,
+                "fillable": min(available, e["quantity"]),
+                "items": items,
+            })
+        return result
+
+    # -----------------------
+    # CHANGE FEED
+    # (rows are written by the repositories inside each mutation's transaction)
+    # -----------------------
+    def list_changes(self, since: int = 0, limit: int = 500, table_name: Optional[str] = None):
+        if since < 0:
+            raise ValueError("since must be >= 0")
+        if table_name is not None and table_name not in CHANGE_TABLES:
+            raise ValueError(f"table must be one of: {', '.join(CHANGE_TABLES)}")
+        rows = self.changes_repo.get_since(since, limit, table_name)
+        if rows is None:
+            raise CursorTooOldError(
+                f"since={since} is older than the change feed keeps (floor {self.changes_repo.floor_seq()}); "
+                "reload the full lists and continue from GET /changes/latest"
+            )
+        return rows
+
+    def latest_change_seq(self) -> int:
+        return self.changes_repo.latest_seq()
+
+    def table_versions(self, table_names) -> tuple:
+        """Write version per table (its change_log head), in the order asked for."""
+        heads = self.changes_repo.table_heads(table_names)
+        return tuple(heads[t] for t in table_names)
+
+    def has_pending_writes(self) -> bool:
+        """True while write-behind updates are queued but not committed yet."""
+        return self.write_queue is not None and bool(self.write_queue.pending_all())
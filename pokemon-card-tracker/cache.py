@@ -0,0 +1,89 @@
+# cache.py
+"""
+LRU cache of fully encoded JSON response bodies for the list endpoints.
+
+Entries are keyed by endpoint + normalized query params and remember the
+write version of every table the response was built from. A lookup with
+newer versions is a miss and drops the entry, so a write to card_set
+invalidates GET /cards but leaves GET /conditions cached. Versions come
+from PokemonCardBusiness.table_versions() (the change_log head per table,
+written by every mutation), so writes made by other worker processes
+invalidate too.
+
+Total size is bounded by a memory budget in bytes of encoded body; the
+least recently used entries are evicted first.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ResponseCache:
+    def __init__(self, budget_mb: float = 64.0):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, ...], bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_bytes > 0
+
+    def get(self, key: Hashable, versions: Tuple[int, ...]) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != versions:
+                self._drop(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, versions: Tuple[int, ...], body: bytes) -> None:
+        if len(body) > self.budget_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (versions, body)
+            self._size += len(body)
+            while self._size > self.budget_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _drop(self, key: Hashable) -> None:
+        _, body = self._entries.pop(key)
+        self._size -= len(body)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,248 @@
+# catalog_sync.py
+"""
+Incremental catalog sync from a local card dump (JSON array, NDJSON or CSV).
+
+    python catalog_sync.py cards.csv
+    python catalog_sync.py cards.json --batch-size 2000 --prune
+    python catalog_sync.py cards.ndjson --dry-run
+
+Each dump row needs set_code, card_number, card_name, rarity and card_type;
+set_code must name an existing card_set. The dump is streamed, every row is
+content-hashed, and only rows whose hash differs from the stored one
+(card_content_hash) are written, in batches of UPSERTs keyed on
+(set_id, card_number). Cards missing from the dump are only deleted with
+--prune, and never while they still have inventory in the main database or
+any tenant shard. A row that fails validation still counts as naming its
+card, so --prune never deletes a card the dump lists; a row without a
+set_code or card_number names nothing, and --prune then deletes nothing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from db import get_conn, tenant_ids, use_tenant
+from repositories import CardRepository, SetRepository
+
+# mirror ck_rarity / ck_card_type in SQL/01_create_tables.sql
+RARITIES = {"Common", "Uncommon", "Rare", "Double Rare", "Ultra Rare", "IR", "SIR", "Hyper Rare", "Promo"}
+CARD_TYPES = {"Pokémon", "Trainer", "Energy"}
+FIELDS = ("set_code", "card_number", "card_name", "rarity", "card_type")
+
+
+# -----------------------------
+# Reading the dump
+# -----------------------------
+def _iter_json_array(fh, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Yield the objects of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    started = False
+    eof = False
+    while True:
+        buf = buf.lstrip(" \t\r\n,")
+        if not started and buf:
+            if buf[0] != "[":
+                raise ValueError("JSON dump must be an array of card objects")
+            buf = buf[1:]
+            started = True
+            continue
+        if buf.startswith("]"):
+            return
+        if buf:
+            try:
+                obj, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                buf = buf[end:]
+                continue
+        if eof:
+            if started:
+                raise ValueError("JSON dump ended before the closing ]")
+            return
+        chunk = fh.read(chunk_size)
+        eof = not chunk
+        buf += chunk
+
+
+def read_dump(path: Path, fmt: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8", newline="") as fh:
+        if fmt == "csv":
+            yield from csv.DictReader(fh)
+        elif fmt == "ndjson":
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(fh)
+
+
+def guess_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".ndjson", ".jsonl"):
+        return "ndjson"
+    return "json"
+
+
+def content_hash(card_name: str, rarity: str, card_type: str) -> str:
+    # (set_id, card_number) is the key; the hash covers everything else
+    return hashlib.sha1(json.dumps([card_name, rarity, card_type]).encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Sync
+# -----------------------------
+def sync(path: Path, fmt: str, batch_size: int, prune: bool, dry_run: bool) -> Dict[str, Any]:
+    cards_repo = CardRepository()
+    set_ids = {r["set_code"]: r["set_id"] for r in SetRepository().get_all()}
+
+    # (set_id, card_number) -> (card_id, hash); rows never synced are hashed from the table
+    existing: Dict[tuple, tuple] = {}
+    unhashed: Dict[int, str] = {}
+    for r in cards_repo.get_catalog_state():
+        h = r["content_hash"]
+        if h is None:
+            h = unhashed[r["card_id"]] = content_hash(r["card_name"], r["rarity"], r["card_type"])
+        existing[(r["set_id"], r["card_number"])] = (r["card_id"], h)
+
+    report: Dict[str, Any] = {"rows": 0, "added": 0, "changed": 0, "unchanged": 0, "removed": 0,
+                              "kept_in_inventory": 0, "invalid": 0, "duplicates": 0, "errors": []}
+    unknown_sets = set()
+    seen = set()   # keys of valid rows already handled; later duplicates are skipped
+    named = set()  # keys the dump lists, valid rows or not
+    unnamed = 0    # rows without a set_code / card_number
+    batch: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        if batch and not dry_run:
+            cards_repo.upsert_batch(batch)
+        batch.clear()
+
+    for n, raw in enumerate(read_dump(path, fmt), 1):
+        report["rows"] += 1
+        row = {f: (str(raw.get(f) or "").strip()) for f in FIELDS}
+        if row["set_code"] in set_ids and row["card_number"]:
+            named.add((set_ids[row["set_code"]], row["card_number"]))
+        elif not row["set_code"] or not row["card_number"]:
+            unnamed += 1
+        problem = None
+        if not all(row.values()):
+            problem = "missing field(s): " + ", ".join(f for f in FIELDS if not row[f])
+        elif row["set_code"] not in set_ids:
+            unknown_sets.add(row["set_code"])
+            problem = f"unknown set_code {row['set_code']}"
+        elif row["rarity"] not in RARITIES:
+            problem = f"bad rarity {row['rarity']!r}"
+        elif row["card_type"] not in CARD_TYPES:
+            problem = f"bad card_type {row['card_type']!r}"
+        if problem:
+            report["invalid"] += 1
+            if len(report["errors"]) < 20:
+                report["errors"].append(f"row {n}: {problem}")
+            continue
+
+        key = (set_ids[row["set_code"]], row["card_number"])
+        if key in seen:
+            report["duplicates"] += 1  # first occurrence wins
+            continue
+        seen.add(key)
+
+        h = content_hash(row["card_name"], row["rarity"], row["card_type"])
+        card_id, old_hash = existing.get(key, (None, None))
+        if card_id is not None and h == old_hash:
+            report["unchanged"] += 1
+            continue
+        report["added" if card_id is None else "changed"] += 1
+        unhashed.pop(card_id, None)
+        batch.append({"card_id": card_id, "set_id": key[0], "card_number": key[1], "card_name": row["card_name"],
+                      "rarity": row["rarity"], "card_type": row["card_type"], "content_hash": h})
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if unhashed and not dry_run:
+        # seeded/hand-edited cards that matched the dump: remember their hash for next time
+        cards_repo.store_hashes(list(unhashed.items()))
+
+    if prune and unnamed:
+        report["prune_skipped"] = f"{unnamed} row(s) without set_code/card_number; fix the dump to prune"
+    elif prune:
+        held = _cards_with_inventory()
+        for key, (card_id, _) in existing.items():
+            if key in named:
+                continue
+            if card_id in held:
+                report["kept_in_inventory"] += 1
+                continue
+            report["removed"] += 1
+            if not dry_run:
+                cards_repo.delete(card_id)
+    if not prune or unnamed:
+        report["not_in_dump"] = sum(1 for key in existing if key not in named)
+
+    report["unknown_sets"] = sorted(unknown_sets)
+    return report
+
+
+def _cards_with_inventory() -> set:
+    # tenant shards have no foreign key to the catalog, so nothing else would stop the delete
+    sql = "SELECT DISTINCT card_id FROM inventory_item;"
+    with get_conn() as conn:
+        held = {r["card_id"] for r in conn.execute(sql)}
+    for tenant_id in tenant_ids():
+        with use_tenant(tenant_id), get_conn() as conn:
+            held.update(r["card_id"] for r in conn.execute(sql))
+    return held
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync the card catalog from a JSON/NDJSON/CSV dump.")
+    parser.add_argument("dump", type=Path)
+    parser.add_argument("--format", choices=("json", "ndjson", "csv"), default=None, help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--prune", action="store_true", help="delete cards that are not in the dump (unless in inventory)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    if args.batch_size < 1:
+        parser.error("--batch-size must be >= 1")
+    if not args.dump.is_file():
+        parser.error(f"{args.dump} not found")
+
+    start = time.perf_counter()
+    report = sync(args.dump, args.format or guess_format(args.dump), args.batch_size, args.prune, args.dry_run)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'dry run: ' if args.dry_run else ''}{report['rows']} rows in {elapsed:.2f}s")
+    print(f"  added {report['added']}, changed {report['changed']}, unchanged {report['unchanged']}, "
+          f"removed {report['removed']}")
+    if report.get("prune_skipped"):
+        print(f"  not pruned: {report['prune_skipped']}", file=sys.stderr)
+    if report.get("not_in_dump"):
+        print(f"  {report['not_in_dump']} card(s) not in the dump were left alone (use --prune to delete)")
+    if report["kept_in_inventory"]:
+        print(f"  {report['kept_in_inventory']} card(s) not in the dump kept because they are in inventory")
+    if report["duplicates"]:
+        print(f"  {report['duplicates']} duplicate row(s) skipped")
+    if report["invalid"]:
+        print(f"  {report['invalid']} invalid row(s) skipped", file=sys.stderr)
+        for err in report["errors"]:
+            print(f"    {err}", file=sys.stderr)
+    if report["unknown_sets"]:
+        print(f"  unknown set codes: {', '.join(report['unknown_sets'])}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+# client.py
+"""
+Python client for the Pokemon Card Tracker API, sync and asyncio.
+
+    from client import PokemonClient, AsyncPokemonClient
+
+    with PokemonClient("http://127.0.0.1:8000") as api:
+        card = api.get_card(1)
+        cards = api.get_cards(ids=[1, 2, 3])                 # one IN query on the server
+        for item in api.iter_inventory(page_size=500):       # keyset pages, not one huge list
+            ...
+        api.adjust_many([(12, -1), (13, -2)])                # all or nothing, one request
+        card, set_ = api.batch(["/cards/1", "/sets/1"])      # one round trip, one snapshot
+
+    async with AsyncPokemonClient(BASE, tenant="acme") as api:
+        await api.update_items([(12, {"notes": "x"}), ...], concurrency=16)
+
+Both clients keep a pool of keep-alive connections (httpx) instead of
+opening a TCP connection per call. Requests that were shed or rate
+limited (429/503) and connection failures are retried with exponential
+backoff, honouring Retry-After; 502/504 and transport errors after the
+request went out (read timeouts, dropped connections) are retried for
+idempotent calls only, since a POST may already have been applied. List endpoints are cached locally by ETag: a repeat GET sends
+If-None-Match and reuses the cached body on 304. Errors raise APIError;
+a change feed cursor the server no longer serves (410, or a resync event
+on the stream) raises ResyncRequired: reload the lists and continue from
+latest_change().
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+DEFAULT_BASE = "http://127.0.0.1:8000"
+MAX_IDS = 500      # ?ids= limit per request (api.MAX_IDS)
+MAX_BATCH = 50     # default POST /batch limit (POKEMON_BATCH_MAX)
+RETRY_ALWAYS = (429, 503)  # rejected before the request ran
+RETRY_IDEMPOTENT = (502, 504)
+IDEMPOTENT = ("GET", "HEAD", "PUT", "DELETE")
+NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)  # the server never saw the request
+
+
+class APIError(Exception):
+    def __init__(self, status: int, detail: Any, method: str = "", path: str = ""):
+        super().__init__(f"{method} {path} -> {status}: {detail}")
+        self.status = status
+        self.path = path
+        self.detail = detail
+
+
+class ResyncRequired(APIError):
+    """The change feed was pruned or rewound past the cursor."""
+
+
+class ETagCache:
+    """LRU of (ETag, decoded body) per GET url."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self.hits = 0
+
+    def etag(self, url: str) -> Optional[str]:
+        entry = self._entries.get(url)
+        return entry[0] if entry else None
+
+    def hit(self, url: str) -> Any:
+        self._entries.move_to_end(url)
+        self.hits += 1
+        return self._entries[url][1]
+
+    def put(self, url: str, etag: str, body: Any) -> None:
+        self._entries[url] = (etag, body)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# -----------------------------
+# Shared request plumbing
+# -----------------------------
+class _Base:
+    def __init__(self, base_url: str, tenant: Optional[str], api_key: Optional[str], retries: int,
+                 backoff_s: float, etag_entries: int):
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.etags = ETagCache(etag_entries) if etag_entries > 0 else None
+        self.headers = {"Accept": "application/json"}
+        if tenant:
+            self.headers["X-Tenant-Id"] = tenant
+        if api_key:
+            self.headers["X-Api-Key"] = api_key
+
+    @staticmethod
+    def _query(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {k: v for k, v in (params or {}).items() if v is not None}
+
+    def _cache_key(self, method: str, path: str, params: Dict[str, Any]) -> Optional[str]:
+        if method != "GET" or self.etags is None:
+            return None
+        return str(httpx.URL(path, params=params))
+
+    def _prepare(self, method: str, path: str, params: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, str]]:
+        key = self._cache_key(method, path, params)
+        etag = self.etags.etag(key) if key else None
+        return key, ({"If-None-Match": etag} if etag else {})
+
+    def _retry_delay(self, method: str, attempt: int, response: Optional[httpx.Response],
+                     error: Optional[httpx.TransportError] = None) -> Optional[float]:
+        """Seconds to wait before another attempt, or None to give up."""
+        if attempt >= self.retries:
+            return None
+        if error is not None and method not in IDEMPOTENT and not isinstance(error, NOT_SENT):
+            return None  # e.g. a read timeout: the POST may have been committed already
+        if response is not None:
+            if response.status_code not in RETRY_ALWAYS and not (
+                response.status_code in RETRY_IDEMPOTENT and method in IDEMPOTENT
+            ):
+                return None
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff_s * (2 ** attempt) * (0.5 + random.random())  # jitter spreads retries out
+
+    def _result(self, method: str, path: str, response: httpx.Response, key: Optional[str]) -> Any:
+        if response.status_code == 304 and key:
+            return self.etags.hit(key)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail")
+            except (ValueError, AttributeError):
+                detail = response.text
+            error = ResyncRequired if response.status_code == 410 else APIError
+            raise error(response.status_code, detail, method, path)
+        if not response.content:
+            return None
+        body = response.json()
+        etag = response.headers.get("etag")
+        if key and etag:
+            self.etags.put(key, etag, body)
+        return body
+
+    # one request each; these work for both clients (the async one returns awaitables)
+    def get_sets(self, set_code: Optional[str] = None, era: Optional[str] = None):
+        return self.request("GET", "/sets", params={"set_code": set_code, "era": era})
+
+    def get_set(self, set_id: int):
+        return self.request("GET", f"/sets/{set_id}")
+
+    def get_card(self, card_id: int):
+        return self.request("GET", f"/cards/{card_id}")
+
+    def get_conditions(self):
+        return self.request("GET", "/conditions")
+
+    def get_item(self, item_id: int):
+        return self.request("GET", f"/inventory/{item_id}")
+
+    def create_item(self, merge: Optional[bool] = None, **fields: Any):
+        return self.request("POST", "/inventory", params={"merge": merge}, json=fields)
+
+    def update_item(self, item_id: int, ack: str = "durable", **fields: Any):
+        return self.request("PUT", f"/inventory/{item_id}", params={"ack": ack}, json=fields)
+
+    def delete_item(self, item_id: int):
+        return self.request("DELETE", f"/inventory/{item_id}")
+
+    def adjust(self, item_id: int, delta: int, zero_policy: Optional[str] = None):
+        return self.request("POST", f"/inventory/{item_id}/adjust", json={"delta": delta, "zero_policy": zero_policy})
+
+    def adjust_many(self, adjustments: Iterable[Tuple[int, int]], zero_policy: Optional[str] = None):
+        """Several quantity changes in one transaction: all apply or none do."""
+        items = [{"item_id": item_id, "delta": delta} for item_id, delta in adjustments]
+        return self.request("POST", "/inventory/adjust", json={"items": items, "zero_policy": zero_policy})
+
+    def changes(self, since: int = 0, limit: int = 500, table: Optional[str] = None):
+        return self.request("GET", "/changes", params={"since": since, "limit": limit, "table": table})
+
+    def latest_change(self):
+        return self.request("GET", "/changes/latest")
+
+
+def _batch_requests(paths: Sequence[str]) -> List[Dict[str, Any]]:
+    return [{"id": str(i), "method": "GET", "path": p} for i, p in enumerate(paths)]
+
+
+def _batch_result(paths: Sequence[str], response: Dict[str, Any], raise_errors: bool) -> List[Any]:
+    out = []
+    for path, r in zip(paths, response["responses"]):
+        if r["status"] >= 400 and raise_errors:
+            detail = r["body"].get("detail") if isinstance(r["body"], dict) else r["body"]
+            raise APIError(r["status"], detail, "GET", path)
+        out.append(r["body"])
+    return out
+
+
+def _no_batch_endpoint(e: APIError) -> bool:
+    # servers from before POST /batch answer 404 (no route) or 405 (read-only replica)
+    return e.status in (404, 405) and e.path == "/batch"
+
+
+def _chunks(seq: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for i in range(0, len(seq), size):
+        yield seq[i : i + size]
+
+
+class _SSEParser:
+    """Feed text/event-stream lines one at a time; returns (id, change) when an event is complete."""
+
+    def __init__(self):
+        self.event_id: Optional[str] = None
+        self.event: Optional[str] = None
+        self.data: List[str] = []
+
+    def feed(self, line: str) -> Optional[Tuple[Optional[str], Dict[str, Any]]]:
+        if line.startswith("id:"):
+            self.event_id = line[3:].strip()
+        elif line.startswith("event:"):
+            self.event = line[6:].strip()
+        elif line.startswith("data:"):
+            self.data.append(line[5:].strip())
+        elif line == "" and self.data:  # blank line ends the event; retry: and comments carry no data
+            event, data = self.event, json.loads("\n".join(self.data))
+            result = (self.event_id, data)
+            self.event_id, self.event, self.data = None, None, []
+            if event == "resync":
+                raise ResyncRequired(410, data.get("detail"), "GET", "/changes/stream")
+            return result
+        return None
+
+
+# -----------------------------
+# Sync client
+# -----------------------------
+class PokemonClient(_Base):
+    def __init__(self, base_url: str = DEFAULT_BASE, *, tenant: Optional[str] = None, api_key: Optional[str] = None,
+                 timeout_s: float = 30.0, retries: int = 3, backoff_s: float = 0.2, max_connections: int = 20,
+                 etag_entries: int = 256, transport: Optional[httpx.BaseTransport] = None):
+        super().__init__(base_url, tenant, api_key, retries, backoff_s, etag_entries)
+        self.http = httpx.Client(
+            base_url=self.base_url, headers=self.headers, timeout=timeout_s, transport=transport,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def __enter__(self) -> "PokemonClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.http.close()
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, json: Any = None) -> Any:
+        params = self._query(params)
+        key, headers = self._prepare(method, path, params)
+        attempt = 0
+        while True:
+            try:
+                response = self.http.request(method, path, params=params, json=json, headers=headers)
+            except httpx.TransportError as e:
+                delay = self._retry_delay(method, attempt, None, e)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(method, attempt, response) if response.status_code >= 400 else None
+                if delay is None:
+                    return self._result(method, path, response, key)
+            time.sleep(delay)
+            attempt += 1
+
+    def get_cards(self, set_id: Optional[int] = None, rarity: Optional[str] = None,
+                  ids: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        if ids is None:
+            return self.request("GET", "/cards", params={"set_id": set_id, "rarity": rarity})
+        ids = list(ids)
+        out: List[Dict[str, Any]] = []
+        for chunk in _chunks(ids, MAX_IDS):
+            out += self.request("GET", "/cards", params={"ids": ",".join(map(str, chunk)), "rarity": rarity})
+        return out
+
+    def get_items(self, ids: Sequence[int]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        for chunk in _chunks(list(ids), MAX_IDS):
+            out += self.request("GET", "/inventory", params={"ids": ",".join(map(str, chunk))})
+        return out
+
+    def batch(self, paths: Sequence[str], raise_errors: bool = True) -> List[Any]:
+        """
+        Bodies of several GETs, in order, from POST /batch (one snapshot per
+        chunk of MAX_BATCH). Falls back to one GET each on servers without it.
+        """
+        out: List[Any] = []
+        for chunk in _chunks(list(paths), MAX_BATCH):
+            try:
+                out += _batch_result(chunk, self.request("POST", "/batch", json={"requests": _batch_requests(chunk)}),
+                                     raise_errors)
+            except APIError as e:
+                if not _no_batch_endpoint(e):
+                    raise
+                out += [self._get_one(p, raise_errors) for p in chunk]
+        return out
+
+    def _get_one(self, path: str, raise_errors: bool) -> Any:
+        try:
+            return self.request("GET", path)
+        except APIError as e:
+            if raise_errors:
+                raise
+            return {"detail": e.detail}
+
+    def update_items(self, updates: Iterable[Tuple[int, Dict[str, Any]]], ack: str = "durable") -> List[Any]:
+        """PUT each (item_id, fields) over the pooled keep-alive connection."""
+        return [self.update_item(item_id, ack=ack, **fields) for item_id, fields in updates]
+
+    def iter_inventory(self, page_size: int = 500, set_id: Optional[int] = None,
+                       is_graded: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        after_id = 0
+        while True:
+            page = self.request("GET", "/inventory", params={"after_id": after_id, "limit": page_size,
+                                                             "set_id": set_id, "is_graded": is_graded})
+            yield from page
+            if len(page) < page_size:
+                return
+            after_id = page[-1]["item_id"]
+
+    def iter_changes(self, since: int = 0, table: Optional[str] = None, limit: int = 500) -> Iterator[Dict[str, Any]]:
+        """Every change after `since`, paging through GET /changes until caught up."""
+        while True:
+            page = self.changes(since, limit, table)
+            yield from page["changes"]
+            if not page["has_more"]:
+                return
+            since = page["last_seq"]
+
+    def stream_changes(self, since: Optional[int] = None, table: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Follow GET /changes/stream forever, resuming from the last seen id after a disconnect."""
+        last_id = None if since is None else str(since)
+        attempt = 0
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if last_id is not None:
+                headers["Last-Event-ID"] = last_id
+            try:
+                with self.http.stream("GET", "/changes/stream", params=self._query({"table": table}),
+                                      headers=headers, timeout=httpx.Timeout(None, connect=10.0)) as response:
+                    if response.status_code >= 400:
+                        response.read()
+                        self._result("GET", "/changes/stream", response, None)
+                    attempt = 0
+                    parser = _SSEParser()
+                    for line in response.iter_lines():
+                        event = parser.feed(line)
+                        if event:
+                            last_id = event[0] or last_id
+                            yield event[1]
+            except httpx.TransportError:
+                delay = self._retry_delay("GET", attempt, None)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+
+# -----------------------------
+# Async client
+# -----------------------------
+class AsyncPokemonClient(_Base):
+    def __init__(self, base_url: str = DEFAULT_BASE, *, tenant: Optional[str] = None, api_key: Optional[str] = None,
+                 timeout_s: float = 30.0, retries: int = 3, backoff_s: float = 0.2, max_connections: int = 20,
+                 etag_entries: int = 256, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(base_url, tenant, api_key, retries, backoff_s, etag_entries)
+        self.max_connections = max_connections
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url, headers=self.headers, timeout=timeout_s, transport=transport,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def __aenter__(self) -> "AsyncPokemonClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, json: Any = None) -> Any:
+        params = self._query(params)
+        key, headers = self._prepare(method, path, params)
+        attempt = 0
+        while True:
+            try:
+                response = await self.http.request(method, path, params=params, json=json, headers=headers)
+            except httpx.TransportError as e:
+                delay = self._retry_delay(method, attempt, None, e)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(method, attempt, response) if response.status_code >= 400 else None
+                if delay is None:
+                    return self._result(method, path, response, key)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _gather(self, calls, concurrency: Optional[int]) -> List[Any]:
+        sem = asyncio.Semaphore(concurrency or self.max_connections)
+
+        async def one(call):
+            async with sem:
+                return await call
+
+        return list(await asyncio.gather(*(one(c) for c in calls)))
+
+    async def get_cards(self, set_id: Optional[int] = None, rarity: Optional[str] = None,
+                        ids: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        if ids is None:
+            return await self.request("GET", "/cards", params={"set_id": set_id, "rarity": rarity})
+        pages = await self._gather(
+            [self.request("GET", "/cards", params={"ids": ",".join(map(str, chunk)), "rarity": rarity})
+             for chunk in _chunks(list(ids), MAX_IDS)], None)
+        return [row for page in pages for row in page]
+
+    async def get_items(self, ids: Sequence[int]) -> List[Dict[str, Any]]:
+        pages = await self._gather(
+            [self.request("GET", "/inventory", params={"ids": ",".join(map(str, chunk))})
+             for chunk in _chunks(list(ids), MAX_IDS)], None)
+        return [row for page in pages for row in page]
+
+    async def batch(self, paths: Sequence[str], raise_errors: bool = True) -> List[Any]:
+        chunks = list(_chunks(list(paths), MAX_BATCH))
+        try:
+            responses = await self._gather(
+                [self.request("POST", "/batch", json={"requests": _batch_requests(chunk)}) for chunk in chunks], None)
+        except APIError as e:
+            if not _no_batch_endpoint(e):
+                raise
+            return await self._gather([self._get_one(p, raise_errors) for p in paths], None)
+        return [body for chunk, r in zip(chunks, responses) for body in _batch_result(chunk, r, raise_errors)]
+
+    async def _get_one(self, path: str, raise_errors: bool) -> Any:
+        try:
+            return await self.request("GET", path)
+        except APIError as e:
+            if raise_errors:
+                raise
+            return {"detail": e.detail}
+
+    async def update_items(self, updates: Iterable[Tuple[int, Dict[str, Any]]], ack: str = "durable",
+                           concurrency: Optional[int] = None) -> List[Any]:
+        """PUT each (item_id, fields), up to `concurrency` in flight (default: the pool size)."""
+        return await self._gather([self.update_item(item_id, ack=ack, **fields) for item_id, fields in updates],
+                                  concurrency)
+
+    async def iter_inventory(self, page_size: int = 500, set_id: Optional[int] = None, is_graded: Optional[int] = None):
+        after_id = 0
+        while True:
+            page = await self.request("GET", "/inventory", params={"after_id": after_id, "limit": page_size,
+                                                                   "set_id": set_id, "is_graded": is_graded})
+            for row in page:
+                yield row
+            if len(page) < page_size:
+                return
+            after_id = page[-1]["item_id"]
+
+    async def iter_changes(self, since: int = 0, table: Optional[str] = None, limit: int = 500):
+        while True:
+            page = await self.changes(since, limit, table)
+            for change in page["changes"]:
+                yield change
+            if not page["has_more"]:
+                return
+            since = page["last_seq"]
+
+    async def stream_changes(self, since: Optional[int] = None, table: Optional[str] = None):
+        last_id = None if since is None else str(since)
+        attempt = 0
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if last_id is not None:
+                headers["Last-Event-ID"] = last_id
+            try:
+                async with self.http.stream("GET", "/changes/stream", params=self._query({"table": table}),
+                                            headers=headers, timeout=httpx.Timeout(None, connect=10.0)) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        self._result("GET", "/changes/stream", response, None)
+                    attempt = 0
+                    parser = _SSEParser()
+                    async for line in response.aiter_lines():
+                        event = parser.feed(line)
+                        if event:
+                            last_id = event[0] or last_id
+                            yield event[1]
+            except httpx.TransportError:
+                delay = self._retry_delay("GET", attempt, None)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
@@ -1,13 +1,14 @@
 # client_console.py
-import requests
 import json
 
+from client import APIError, PokemonClient
+
 BASE = "http://127.0.0.1:8000"
 
 def pretty(obj):
     print(json.dumps(obj, indent=2))
 
-def demo_inventory_crud():
+def demo_inventory_crud(api: PokemonClient):
     print("\n--- INVENTORY CRUD via Service ---")
 
     # CREATE
@@ -24,52 +25,44 @@ def demo_inventory_crud():
         "notes": "Created via API"
     }
 
-    r = requests.post(f"{BASE}/inventory", json=create_payload)
-
-    print("POST /inventory status:", r.status_code)
-    print("POST /inventory body:", r.text)
-
-    r.raise_for_status()
+    created = api.create_item(**create_payload)
+    print("POST /inventory body:", created)
 
-    item_id = r.json()["item_id"]
+    item_id = created["item_id"]
     print("Created item_id =", item_id)
 
     # GET
-    r = requests.get(f"{BASE}/inventory/{item_id}")
-    r.raise_for_status()
     print("GET after create:")
-    pretty(r.json())
+    pretty(api.get_item(item_id))
 
-    # UPDATE (PATCH)
-    patch_payload = {
+    # UPDATE (PUT; only the fields sent are changed)
+    update_payload = {
         "quantity": 2,
         "notes": "Updated via API"
     }
 
-    r = requests.patch(f"{BASE}/inventory/{item_id}", json=patch_payload)
-    r.raise_for_status()
-    print("PATCH result:", r.json())
+    print("PUT result:", api.update_item(item_id, **update_payload))
 
     # GET AGAIN
-    r = requests.get(f"{BASE}/inventory/{item_id}")
-    r.raise_for_status()
     print("GET after update:")
-    pretty(r.json())
+    pretty(api.get_item(item_id))
 
     # DELETE
-    r = requests.delete(f"{BASE}/inventory/{item_id}")
-    r.raise_for_status()
-    print("DELETE result:", r.json())
+    print("DELETE result:", api.delete_item(item_id))
 
     # GET AFTER DELETE (expect 404)
-    r = requests.get(f"{BASE}/inventory/{item_id}")
-    print("GET after delete status:", r.status_code)
-    print("Response:", r.text)
+    try:
+        api.get_item(item_id)
+    except APIError as e:
+        print("GET after delete status:", e.status)
+        print("Response:", e.detail)
 
 def main():
     print("Make sure API is running:")
     print("  uvicorn api:app --reload")
-    demo_inventory_crud()
+    # one client = one pool of keep-alive connections for every call below
+    with PokemonClient(BASE) as api:
+        demo_inventory_crud(api)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,58 @@
+# consolidation.py
+"""
+Background lot consolidation.
+
+Runs PokemonCardBusiness.consolidate_lots() every interval_s seconds on a
+daemon thread: inventory rows with the same card, condition, foil and
+grade are merged into one lot (see InventoryRepository.merge_lot). Every
+merge is recorded in lot_merge_log and can be undone from the admin API.
+
+Enable with POKEMON_CONSOLIDATE_SECS=<seconds> (see api.py); the same pass
+can always be run by hand with POST /admin/lots/consolidate.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class LotConsolidator:
+    def __init__(self, run: Callable[[], Dict[str, Any]], interval_s: float = 300.0):
+        if interval_s <= 0:
+            raise ValueError("interval_s must be positive")
+        self.run = run
+        self.interval_s = interval_s
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_run_at: Optional[float] = None
+        self.stats = {"runs": 0, "merges": 0, "rows_removed": 0, "errors": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="lot-consolidator", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                report = self.run()
+            except Exception as e:  # keep the thread alive; next interval retries
+                self.stats["errors"] += 1
+                self.last_report = {"error": str(e)}
+                continue
+            self.stats["runs"] += 1
+            self.stats["merges"] += len(report["merge_ids"])
+            self.stats["rows_removed"] += report["rows_removed"]
+            self.last_report = report
+            self.last_run_at = time.time()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval_s": self.interval_s,
+            "last_run_at": self.last_run_at,
+            "last_report": self.last_report,
+            **self.stats,
+        }
@@ -1,8 +1,70 @@
 # db.py
+"""
+Connection layer. Repositories only use:
+
+    with get_conn() as conn:      # reads
+    with write_conn() as conn:    # one write transaction
+    conn.execute(sql_with_?_placeholders, params)
+
+and rows that support row["column"], row.column and dict(row) (compact
+records, see models.py). The backend behind those calls is SQLite
+(default) or PostgreSQL when POKEMON_DB_URL is a postgresql:// URL. The
+SQLite file is POKEMON_DB_PATH, else RUNTIME_DB (data/pokemon_cards.db,
+not tracked by git); nothing is opened until the first call. startup.py
+creates a missing RUNTIME_DB as a copy of the database shipped with the
+project (the first existing CANDIDATES entry, which is only ever read),
+any other missing file from the SQL scripts, and warms it up.
+
+In-memory databases (tests, benchmarks): POKEMON_DB_PATH=:memory: runs on
+a MemoryBackend built from the SQL scripts at startup. DatabaseTemplate
+builds a database once and clone()s fresh copies of it with the backup
+API; memory_clone() does that with a shared, seeded template. Swap one in
+with use_backend() / `with using_backend(...)`.
+
+Multi-tenant mode (SQLite only): each tenant's collection lives in its own
+shard file under POKEMON_TENANT_DIR, with the shared catalog ATTACHed
+read-only. Inside `with use_tenant(tenant_id):` the same calls above go to
+that tenant's shard.
+
+Read replicas: a replica is a read-only copy of the main database kept
+fresh by replication.py. POKEMON_REPLICA_DB=<file> runs a whole API
+instance read-only on one; POKEMON_READ_REPLICAS=<file>,<file> lets the
+primary send reads to them inside `with allow_stale(seconds):`.
+
+Pinned snapshots: inside `with use_snapshot(snapshot):` every get_conn()
+read goes to one shared read transaction (see pinned_snapshot()), so a
+batch of reads sees a single consistent state of the database.
+"""
+import itertools
+import os
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from models import pg_row, sqlite_row
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+try:
+    import psycopg
+    from psycopg_pool import ConnectionPool
+except ImportError:  # PostgreSQL support is optional
+    psycopg = None
 
 ROOT = Path(__file__).resolve().parent
+SQL_DIR = ROOT / "SQL"
+PG_SQL_DIR = SQL_DIR / "postgres"
+TENANT_SQL_DIR = SQL_DIR / "tenant"
 
 CANDIDATES = [
     ROOT / "SQL" / "pokemon_cards.db",
@@ -13,18 +75,853 @@ CANDIDATES = [
     ROOT / "pokemon_cards",
 ]
 
-def pick_db() -> Path:
+# The live database. The CANDIDATES files are tracked by git; they seed this
+# copy on first start and are never opened for writing (migrations included).
+DATA_DIR = Path(os.environ.get("POKEMON_DATA_DIR", ROOT / "data"))
+RUNTIME_DB = DATA_DIR / "pokemon_cards.db"
+
+# Idempotent schema additions (CREATE ... IF NOT EXISTS) applied on top of an
+# existing database the first time a connection is opened.
+MIGRATIONS = [
+    "05_change_log.sql",
+    "06_inventory_archive.sql",
+    "07_sales.sql",
+    "08_want_lists.sql",
+    "09_set_completion.sql",
+    "10_catalog_sync.sql",
+    "11_lot_merge.sql",
+    "12_maintenance.sql",
+    "13_change_feed.sql",
+]
+
+# Migrations that also run inside a tenant shard (after SQL/tenant/*.sql).
+# 09 and 10 reference the catalog tables, which a shard only sees read-only.
+TENANT_MIGRATIONS = [
+    "05_change_log.sql",
+    "06_inventory_archive.sql",
+    "07_sales.sql",
+    "08_want_lists.sql",
+    "11_lot_merge.sql",
+    "13_change_feed.sql",
+]
+
+# Seed scripts shared by both backends (PRAGMA lines are skipped on PostgreSQL).
+SEED_SCRIPTS = ["02_seed_data.sql", "03_seed_cards.sql", "04_seed_inventory.sql"]
+
+DB_URL = os.environ.get("POKEMON_DB_URL", "")
+DB_PATH_ENV = os.environ.get("POKEMON_DB_PATH", "")
+
+# How long a connection waits on SQLITE_BUSY before giving up (ms).
+BUSY_TIMEOUT_MS = 5000
+
+TENANT_DIR = Path(os.environ.get("POKEMON_TENANT_DIR", ROOT / "tenants"))
+# Open shard handles kept around (least recently used are dropped first).
+TENANT_CACHE_SIZE = int(os.environ.get("POKEMON_TENANT_CACHE", "64"))
+TENANT_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+REPLICA_DB = os.environ.get("POKEMON_REPLICA_DB", "")
+READ_REPLICAS = [p for p in os.environ.get("POKEMON_READ_REPLICAS", "").split(",") if p.strip()]
+
+DB_ERRORS: tuple = (sqlite3.Error,) + ((psycopg.Error,) if psycopg is not None else ())
+INTEGRITY_ERRORS: tuple = (sqlite3.IntegrityError,) + ((psycopg.IntegrityError,) if psycopg is not None else ())
+
+_SQLITE_VIOLATIONS = (
+    ("CHECK constraint failed: ", "check"),
+    ("UNIQUE constraint failed: ", "unique"),
+    ("NOT NULL constraint failed: ", "not_null"),
+    ("FOREIGN KEY constraint failed", "foreign_key"),
+)
+_PG_VIOLATIONS = {"23514": "check", "23505": "unique", "23502": "not_null", "23503": "foreign_key"}
+
+
+def violated_constraint(exc: Exception) -> Tuple[str, Optional[str]]:
+    """
+    (kind, name) for an INTEGRITY_ERRORS exception; kind is check, unique,
+    not_null, foreign_key or other. name is the constraint name (ck_quantity,
+    or PostgreSQL's generated names such as inventory_item_card_id_fkey),
+    "table.column[, table.column]" where SQLite reports columns instead, and
+    None for a SQLite foreign key: SQLite doesn't say which one failed.
+    """
+    diag = getattr(exc, "diag", None)
+    if diag is not None:  # psycopg
+        kind = _PG_VIOLATIONS.get(getattr(exc, "sqlstate", None), "other")
+        if kind == "not_null":
+            return kind, f"{diag.table_name}.{diag.column_name}"
+        return kind, diag.constraint_name
+    message = str(exc)
+    for prefix, kind in _SQLITE_VIOLATIONS:
+        if message.startswith(prefix):
+            return kind, message[len(prefix):] or None
+    return "other", None
+
+
+def is_transient(exc: Exception) -> bool:
+    """True for errors where the same transaction can succeed if tried again (lock/busy timeouts, lost connections)."""
+    if isinstance(exc, sqlite3.OperationalError):
+        message = str(exc).lower()
+        return "locked" in message or "busy" in message
+    return psycopg is not None and isinstance(exc, psycopg.OperationalError)
+
+
+def db_path() -> Path:
+    """Where the SQLite database is, or will be created: POKEMON_DB_PATH, else RUNTIME_DB."""
+    return Path(DB_PATH_ENV) if DB_PATH_ENV else RUNTIME_DB
+
+
+def seed_db() -> Optional[Path]:
+    """The database shipped with the project (first existing CANDIDATES file), or None."""
     for p in CANDIDATES:
-        if p.exists() and p.is_file():
+        if p.is_file():
             return p
-    raise FileNotFoundError(
-        "Could not find pokemon_cards db. Looked for:\n" + "\n".join(str(p) for p in CANDIDATES)
-    )
+    return None
+
+
+def pick_db() -> Path:
+    p = db_path()
+    if not p.is_file():
+        raise FileNotFoundError(f"{p} does not exist; python startup.py creates it")
+    return p
+
+
+# -----------------------
+# SQLite
+# -----------------------
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.write_lock_path = self.path.with_name(self.path.name + ".write.lock")
+        self._thread_write_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        if not self._schema_ready and not self.path.is_file():
+            # sqlite3.connect would create an empty file and the migrations a half schema
+            raise FileNotFoundError(f"{self.path} does not exist; python startup.py creates it from {SQL_DIR}")
+        conn = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=check_same_thread)
+        conn.row_factory = sqlite_row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        if self._schema_ready:
+            return
+        for name in MIGRATIONS:
+            conn.executescript((SQL_DIR / name).read_text(encoding="utf-8"))
+        self._schema_ready = True
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.connect()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # SQLite allows one writer at a time. With several worker processes,
+    # writers queue on an OS file lock (and a thread lock inside each
+    # process) instead of spinning on SQLITE_BUSY, so all writes are funneled
+    # through one writer slot while reads run in parallel under WAL.
+    @contextmanager
+    def _write_lock(self):
+        with self._thread_write_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.write_lock_path, "a+") as fh:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def write_connection(self) -> Iterator[sqlite3.Connection]:
+        with self._write_lock():
+            with self.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE;")
+                yield conn
+
+    @contextmanager
+    def snapshot_connection(self) -> Iterator[sqlite3.Connection]:
+        """One read transaction that any thread may use (callers serialize access)."""
+        conn = self.connect(check_same_thread=False)
+        try:
+            conn.execute("BEGIN;")
+            # a WAL read snapshot starts at the first read of each database, attached ones included
+            for schema in conn.execute("PRAGMA database_list;").fetchall():
+                conn.execute(f'SELECT 1 FROM "{schema["name"]}".sqlite_master LIMIT 1;').fetchall()
+            yield conn
+        finally:
+            conn.rollback()
+            conn.close()
+
+    def iter_query(self, sql: str, params: Sequence[Any] = (), size: int = 1000) -> Iterator[Any]:
+        with self.connection() as conn:
+            cur = conn.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(size)
+                if not rows:
+                    return
+                yield from rows
+
+    def bulk_insert(self, conn, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+        marks = ",".join("?" for _ in columns)
+        conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks});", rows)
+
+    def startup_check(self, require_wal: bool) -> str:
+        with self.connection() as conn:
+            mode = str(conn.execute("PRAGMA journal_mode = WAL;").fetchone()[0]).lower()
+        if require_wal and mode != "wal":
+            raise RuntimeError(
+                f"{self.path} is in journal_mode={mode}; WAL is required so readers in other "
+                "worker processes are not blocked by the writer"
+            )
+        return mode
+
+
+class TenantShardBackend(SQLiteBackend):
+    """One tenant's shard file, with the catalog database ATTACHed read-only as `catalog`."""
+
+    def __init__(self, path: Path, catalog_path: Path):
+        super().__init__(path)
+        self.catalog_path = Path(catalog_path)
+
+    def connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        # mode=rw: a shard must already exist (create_tenant makes it)
+        conn = sqlite3.connect(self.path.resolve().as_uri() + "?mode=rw", uri=True,
+                               timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=check_same_thread)
+        conn.row_factory = sqlite_row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("ATTACH DATABASE ? AS catalog;", (self.catalog_path.resolve().as_uri() + "?mode=ro",))
+        self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        if self._schema_ready:
+            return
+        for path in sorted(TENANT_SQL_DIR.glob("*.sql")):
+            conn.executescript(path.read_text(encoding="utf-8"))
+        # shards created before set_completion recorded the catalog version it was built from
+        if "catalog_seq" not in {r["name"] for r in conn.execute("PRAGMA table_info(set_completion);")}:
+            conn.execute("ALTER TABLE set_completion ADD COLUMN catalog_seq INTEGER NOT NULL DEFAULT 0;")
+        for name in TENANT_MIGRATIONS:
+            conn.executescript((SQL_DIR / name).read_text(encoding="utf-8"))
+        self._schema_ready = True
+
+
+class ShardCache:
+    """LRU of open tenant shard backends, so hot tenants skip re-checking their schema."""
+
+    def __init__(self, catalog: SQLiteBackend, tenant_dir: Path, max_open: int = 64):
+        self.catalog = catalog
+        self.tenant_dir = Path(tenant_dir)
+        self.max_open = max(1, max_open)
+        self._open: "OrderedDict[str, TenantShardBackend]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def shard_path(self, tenant_id: str) -> Path:
+        if not TENANT_ID_RE.match(tenant_id or ""):
+            raise ValueError("tenant_id must be 1-63 chars of a-z, 0-9, '_' or '-', starting with a letter or digit")
+        return self.tenant_dir / f"{tenant_id}.db"
+
+    def exists(self, tenant_id: str) -> bool:
+        return self.shard_path(tenant_id).is_file()
+
+    def get(self, tenant_id: str) -> TenantShardBackend:
+        with self._lock:
+            backend = self._open.get(tenant_id)
+            if backend is not None:
+                self._open.move_to_end(tenant_id)
+                self.stats["hits"] += 1
+                return backend
+        path = self.shard_path(tenant_id)
+        if not path.is_file():
+            raise LookupError(f"unknown tenant {tenant_id}")
+        backend = TenantShardBackend(path, self.catalog.path)
+        with self._lock:
+            self.stats["misses"] += 1
+            backend = self._open.setdefault(tenant_id, backend)
+            self._open.move_to_end(tenant_id)
+            while len(self._open) > self.max_open:
+                # nothing to close: connections are per call, the handle just forgets its schema check
+                self._open.popitem(last=False)
+                self.stats["evictions"] += 1
+        return backend
+
+    def create(self, tenant_id: str) -> bool:
+        """Create the shard file and its schema; False if the tenant already exists."""
+        path = self.shard_path(tenant_id)
+        if path.is_file():
+            return False
+        self.tenant_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path))
+        try:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")  # before the first table exists
+            conn.execute("PRAGMA journal_mode = WAL;")
+        finally:
+            conn.close()
+        with self.get(tenant_id).connection():
+            pass  # applies the shard schema
+        return True
+
+    def tenants(self) -> List[str]:
+        if not self.tenant_dir.is_dir():
+            return []
+        return sorted(p.stem for p in self.tenant_dir.glob("*.db") if TENANT_ID_RE.match(p.stem))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"max_open": self.max_open, "open": len(self._open), **self.stats}
+
+
+class ReadOnlyReplicaError(RuntimeError):
+    """A write was attempted on a read replica."""
+
+
+class ReplicaBackend(SQLiteBackend):
+    """
+    Read-only copy of the main database shipped by replication.py. The
+    shipper swaps in a new file atomically, and every connection is opened
+    per call, so each read sees one whole snapshot. replica_info (inside
+    the file) and <file>.heartbeat (written when nothing changed) say how
+    old that snapshot is.
+    """
+
+    read_only = True
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.heartbeat_path = self.path.with_name(self.path.name + ".heartbeat")
+        self._info_key = None
+        self._info: Dict[str, Any] = {}
+
+    def connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path.resolve().as_uri() + "?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=check_same_thread)
+        conn.row_factory = sqlite_row
+        return conn  # the primary already migrated the schema it shipped
+
+    @contextmanager
+    def write_connection(self) -> Iterator[sqlite3.Connection]:
+        raise ReadOnlyReplicaError(f"{self.path.name} is a read-only replica; send writes to the primary")
+        yield  # pragma: no cover
+
+    def _snapshot_info(self) -> Dict[str, Any]:
+        st = self.path.stat()
+        key = (st.st_ino, st.st_mtime_ns)
+        if key != self._info_key:
+            with self.connection() as conn:
+                row = conn.execute("SELECT seq, shipped_at FROM replica_info WHERE id = 1;").fetchone()
+            self._info = {"seq": row["seq"], "shipped_at": row["shipped_at"]}
+            self._info_key = key
+        return self._info
+
+    def state(self) -> Dict[str, Any]:
+        """{"seq", "as_of", "lag_s"}: change_log head of the copy and how long ago it was current."""
+        info = self._snapshot_info()
+        as_of = info["shipped_at"]
+        try:
+            seq, checked_at = self.heartbeat_path.read_text(encoding="utf-8").split()
+            if int(seq) == info["seq"]:
+                as_of = max(as_of, float(checked_at))  # primary was checked and had nothing newer
+        except (OSError, ValueError):
+            pass
+        return {"seq": info["seq"], "as_of": as_of, "lag_s": round(max(0.0, time.time() - as_of), 3)}
+
+    def startup_check(self, require_wal: bool) -> str:
+        self._snapshot_info()  # fails fast if the file was never shipped
+        return "replica"
+
+
+# -----------------------
+# In-memory databases (tests, benchmarks)
+# -----------------------
+# memdb: every connection to the same name shares one database with normal
+# file locking (busy timeout included). Older SQLite falls back to a
+# shared-cache database, where a reader that meets a writer fails at once
+# ("database table is locked") instead of waiting.
+MEMDB = sqlite3.sqlite_version_info >= (3, 36, 0)
+_memory_ids = itertools.count(1)
+
+
+def bootstrap_scripts() -> List[Path]:
+    """Every numbered script in SQL/: tables, seeds, then the migrations."""
+    return sorted(SQL_DIR.glob("[0-9][0-9]_*.sql"))
+
+
+def build_database(conn: sqlite3.Connection, scripts: Optional[Sequence[Path]] = None) -> None:
+    """Run the SQL scripts on an empty database in one transaction (PRAGMA lines first, outside it)."""
+    pragmas: List[str] = []
+    body: List[str] = []
+    for script in scripts if scripts is not None else bootstrap_scripts():
+        for line in script.read_text(encoding="utf-8").splitlines():
+            if line.strip().upper().startswith("PRAGMA"):
+                if line.strip() not in pragmas:
+                    pragmas.append(line.strip())  # not allowed (or ignored) inside a transaction
+            else:
+                body.append(line)
+    for pragma in pragmas:  # auto_vacuum must be set before the first table
+        conn.execute(pragma)
+    try:
+        conn.executescript("BEGIN;\n" + "\n".join(body) + "\nCOMMIT;")
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+class MemoryBackend(SQLiteBackend):
+    """
+    A database in this process's memory, shared by every connection the
+    backend opens. It lives while the backend holds its keeper connection;
+    close() frees it. There is no file, so file-level tools (backup.py,
+    replication.py, tenant shards, sales archives) don't apply.
+    """
+
+    path = None
+
+    def __init__(self, label: Optional[str] = None):
+        self.label = label or f"pokemon-{os.getpid()}-{next(_memory_ids)}"
+        if MEMDB:
+            self.uri = f"file:/{self.label}?vfs=memdb"
+        else:
+            self.uri = f"file:{self.label}?mode=memory&cache=shared"
+        self._thread_write_lock = threading.Lock()
+        self._schema_ready = False
+        self._closed = False
+        self._keeper = self._open(check_same_thread=False)
+
+    def _open(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError(f"in-memory database {self.label} is closed")
+        conn = sqlite3.connect(self.uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=check_same_thread)
+        conn.row_factory = sqlite_row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = self._open(check_same_thread)
+        self._ensure_schema(conn)
+        return conn
+
+    @contextmanager
+    def _write_lock(self):
+        with self._thread_write_lock:  # one process only: no file lock
+            yield
+
+    def is_empty(self) -> bool:
+        return self._keeper.execute("SELECT COUNT(*) FROM sqlite_master;").fetchone()[0] == 0
+
+    def load_scripts(self, scripts: Optional[Sequence[Path]] = None) -> bool:
+        """Build the database from the SQL scripts; False if it already has tables."""
+        with self._thread_write_lock:
+            if not self.is_empty():
+                return False
+            build_database(self._keeper, scripts)
+        return True
+
+    def load_file(self, path: Path) -> None:
+        """Replace the contents with a copy of a database file (backup API)."""
+        src = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+        try:
+            src.backup(self._keeper)
+        finally:
+            src.close()
+        self._schema_ready = False  # the file may predate some migrations
+
+    def startup_check(self, require_wal: bool) -> str:
+        if require_wal:
+            raise RuntimeError(f"{self.label} is an in-memory database; it can't be shared by several worker processes")
+        return str(self._keeper.execute("PRAGMA journal_mode;").fetchone()[0]).lower()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._keeper.close()
+
+
+class DatabaseTemplate:
+    """
+    A database built once, in memory, that hands out independent copies:
+
+        template = DatabaseTemplate()           # SQL scripts (or source=<file>)
+        backend = template.clone()              # fresh copy via the backup API
+        with using_backend(backend): ...
+
+    Building from the scripts or copying a file happens once; each clone is
+    a page copy in memory, which is much cheaper.
+    """
+
+    def __init__(self, source: Optional[Path] = None, scripts: Optional[Sequence[Path]] = None):
+        self.backend = MemoryBackend()
+        if source is not None:
+            self.backend.load_file(source)
+        else:
+            self.backend.load_scripts(scripts)
+        with self.backend.connection():
+            pass  # apply pending migrations once, so clones skip them
+        self._lock = threading.Lock()
+
+    def clone(self, label: Optional[str] = None) -> MemoryBackend:
+        backend = MemoryBackend(label)
+        with self._lock:  # the source connection is not shared between backups
+            self.backend._keeper.backup(backend._keeper)
+        backend._schema_ready = True
+        return backend
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+_template: Optional[DatabaseTemplate] = None
+_template_lock = threading.Lock()
+
+
+def memory_clone() -> MemoryBackend:
+    """A fresh in-memory copy of the seeded database; the template is built on first use."""
+    global _template
+    with _template_lock:
+        if _template is None:
+            _template = DatabaseTemplate()
+    return _template.clone()
+
+
+# -----------------------
+# PostgreSQL
+# -----------------------
+# a string literal, quoted identifier or comment (copied as is), or a ? placeholder
+_PG_TOKENS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\?", re.S)
+
+
+@lru_cache(maxsize=512)
+def _pg_sql(sql: str) -> str:
+    # repositories write sqlite-style ? placeholders; psycopg wants %s (and %% for a literal %)
+    return _PG_TOKENS.sub(lambda m: "%s" if m.group() == "?" else m.group(), sql.replace("%", "%%"))
+
+
+class _PgConnection:
+    """psycopg connection with the sqlite3-style execute() the repositories use."""
+
+    def __init__(self, conn):
+        self.raw = conn
+
+    def execute(self, sql: str, params: Sequence[Any] = ()):
+        return self.raw.execute(_pg_sql(sql), params)
+
+    def executemany(self, sql: str, seq: Iterable[Sequence[Any]]):
+        cur = self.raw.cursor()
+        cur.executemany(_pg_sql(sql), seq)
+        return cur
+
+    def cursor(self, *args, **kwargs):
+        return self.raw.cursor(*args, **kwargs)
+
+
+class PostgresBackend:
+    name = "postgres"
+
+    def __init__(self, url: str, min_size: int = 1, max_size: int = 10):
+        if psycopg is None:
+            raise RuntimeError(
+                "POKEMON_DB_URL points at PostgreSQL but psycopg is not installed "
+                "(pip install 'psycopg[binary]' psycopg_pool)"
+            )
+        self.url = url
+        self.pool = ConnectionPool(
+            url,
+            min_size=min_size,
+            max_size=max_size,
+            kwargs={"row_factory": pg_row},
+            open=False,
+        )
+        self._open_lock = threading.Lock()
+        self._opened = False
+
+    def _get_pool(self):
+        if not self._opened:
+            with self._open_lock:
+                if not self._opened:
+                    self.pool.open()
+                    self._opened = True
+        return self.pool
+
+    def open_pool(self, timeout_s: float = 30.0) -> int:
+        """Open the pool now and wait for its min_size connections; returns the pool size."""
+        pool = self._get_pool()
+        pool.wait(timeout=timeout_s)
+        return pool.get_stats()["pool_size"]
+
+    @contextmanager
+    def connection(self) -> Iterator[_PgConnection]:
+        # the pool commits on success and rolls back on error
+        with self._get_pool().connection() as conn:
+            yield _PgConnection(conn)
+
+    # row-level locking handles concurrent writers; no global writer slot needed
+    write_connection = connection
+
+    @contextmanager
+    def snapshot_connection(self) -> Iterator[_PgConnection]:
+        """One REPEATABLE READ transaction: every statement in it sees the same snapshot."""
+        with self._get_pool().connection() as conn:
+            conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+            yield _PgConnection(conn)
+
+    def iter_query(self, sql: str, params: Sequence[Any] = (), size: int = 1000) -> Iterator[Any]:
+        # named cursor = server-side cursor: rows arrive `size` at a time
+        with self._get_pool().connection() as conn:
+            with conn.cursor(name="pokemon_iter") as cur:
+                cur.itersize = size
+                cur.execute(_pg_sql(sql), params)
+                yield from cur
+
+    def bulk_insert(self, conn, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+        with conn.cursor() as cur:
+            with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+
+    def startup_check(self, require_wal: bool) -> str:
+        with self.connection() as conn:
+            conn.execute("SELECT 1;")
+        return "postgres"
+
+    def init_schema(self, seed: bool = False) -> None:
+        """(Re)create the schema from SQL/postgres, optionally loading the seed scripts."""
+        with self._get_pool().connection() as conn:
+            for path in sorted(PG_SQL_DIR.glob("*.sql")):
+                conn.execute(path.read_text(encoding="utf-8"))
+            if not seed:
+                return
+            for name in SEED_SCRIPTS:
+                text = (SQL_DIR / name).read_text(encoding="utf-8")
+                body = "\n".join(line for line in text.splitlines() if not line.strip().upper().startswith("PRAGMA"))
+                conn.execute(body)
+            # seeds insert explicit ids; move the identity sequences past them
+            for table, pk in (("card_set", "set_id"), ("card", "card_id"),
+                              ("card_condition", "condition_id"), ("inventory_item", "item_id")):
+                conn.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{pk}'), "
+                    f"COALESCE((SELECT MAX({pk}) FROM {table}), 0) + 1, false);"
+                )
+
+
+# -----------------------
+# Active backend
+# -----------------------
+def make_backend():
+    if DB_URL.startswith(("postgres://", "postgresql://")):
+        return PostgresBackend(DB_URL)
+    if DB_PATH_ENV == ":memory:":
+        return MemoryBackend()  # startup.prepare() loads the SQL scripts
+    if REPLICA_DB:
+        return ReplicaBackend(Path(REPLICA_DB))
+    return SQLiteBackend(db_path())
+
+
+_backend = make_backend()
+DB_PATH = getattr(_backend, "path", None)
+
+_tenant: ContextVar[Optional[str]] = ContextVar("pokemon_tenant", default=None)
+_shards: Optional[ShardCache] = None
+_shards_lock = threading.Lock()
+
+_replica: ContextVar[Optional[ReplicaBackend]] = ContextVar("pokemon_replica", default=None)
+_pinned: ContextVar[Optional["PinnedSnapshot"]] = ContextVar("pokemon_pinned", default=None)
+_read_replicas = [ReplicaBackend(Path(p.strip())) for p in READ_REPLICAS]
+
+
+def shards() -> ShardCache:
+    global _shards
+    if _backend.name != "sqlite" or getattr(_backend, "read_only", False) or _backend.path is None:
+        raise RuntimeError("multi-tenant shards are only supported on a writable SQLite file backend")
+    with _shards_lock:
+        if _shards is None or _shards.catalog is not _backend:
+            _shards = ShardCache(_backend, TENANT_DIR, TENANT_CACHE_SIZE)
+        return _shards
+
+
+def current_tenant() -> Optional[str]:
+    return _tenant.get()
+
+
+def tenant_ids() -> List[str]:
+    """Every tenant that has a shard; [] on a backend that can't have tenants."""
+    try:
+        return shards().tenants()
+    except RuntimeError:
+        return []
+
+
+@contextmanager
+def use_tenant(tenant_id: Optional[str]):
+    """Route get_conn/write_conn/iter_query to tenant_id's shard (None = the main database)."""
+    if tenant_id is not None:
+        shards().get(tenant_id)  # LookupError for an unknown tenant
+    token = _tenant.set(tenant_id)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def read_replicas() -> List[ReplicaBackend]:
+    return list(_read_replicas)
+
+
+def pick_replica(max_staleness_s: float) -> Optional[ReplicaBackend]:
+    """The freshest configured replica no older than max_staleness_s, else None."""
+    best = None
+    for replica in _read_replicas:
+        try:
+            lag = replica.state()["lag_s"]
+        except (OSError, sqlite3.Error):
+            continue  # not shipped yet, or being replaced
+        if lag <= max_staleness_s and (best is None or lag < best[0]):
+            best = (lag, replica)
+    return best[1] if best else None
+
+
+@contextmanager
+def allow_stale(max_staleness_s: float):
+    """
+    Reads in this block may come from a read replica up to max_staleness_s
+    seconds behind the primary; yields the replica used (None = primary).
+    Tenant shards are not replicated, so tenant reads stay on the primary.
+    """
+    replica = pick_replica(max_staleness_s) if _tenant.get() is None else None
+    token = _replica.set(replica)
+    try:
+        yield replica
+    finally:
+        _replica.reset(token)
+
+
+def _primary():
+    tenant_id = _tenant.get()
+    return _backend if tenant_id is None else shards().get(tenant_id)
+
+
+def get_backend():
+    return _replica.get() or _primary()
+
+
+def use_backend(backend):
+    """Swap the active backend (benchmarks, tests); returns the previous one."""
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+
+@contextmanager
+def using_backend(backend):
+    """`with using_backend(memory_clone()):` runs the block on that backend, then swaps back."""
+    previous = use_backend(backend)
+    try:
+        yield backend
+    finally:
+        use_backend(previous)
+
+
+def get_conn():
+    """Connection for reads: `with get_conn() as conn:`."""
+    pinned = _pinned.get()
+    if pinned is not None:
+        return nullcontext(pinned)
+    return get_backend().connection()
+
+
+def write_conn():
+    """Connection for one write transaction; commits on success, rolls back on error."""
+    return _primary().write_connection()  # never a read replica, even inside allow_stale()
+
+
+def iter_query(sql: str, params: Sequence[Any] = (), size: int = 1000) -> Iterator[Any]:
+    """Stream a large result in batches of `size` rows without loading it all."""
+    pinned = _pinned.get()
+    if pinned is not None:
+        return iter(pinned.execute(sql, params).fetchall())
+    return get_backend().iter_query(sql, params, size)
+
+
+# -----------------------
+# Pinned read snapshots (POST /batch)
+# -----------------------
+class _BufferedCursor:
+    def __init__(self, rows: List[Any]):
+        self._rows = rows
+        self._pos = 0
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchmany(self, size: int = 1):
+        rows = self._rows[self._pos : self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._pos :]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class PinnedSnapshot:
+    """
+    One snapshot connection shared by concurrent reads. Statements take
+    turns on it and their rows are fetched before the next one runs, so
+    callers on different threads never interleave on one cursor.
+    """
+
+    def __init__(self, conn):
+        self.raw = conn
+        self._lock = threading.Lock()
+        self.statements = 0
+
+    def execute(self, sql: str, params: Sequence[Any] = ()):
+        with self._lock:
+            self.statements += 1
+            cur = self.raw.execute(sql, params)
+            return _BufferedCursor(cur.fetchall() if cur.description else [])
+
+
+@contextmanager
+def pinned_snapshot() -> Iterator[PinnedSnapshot]:
+    """Open one read snapshot on the current backend (tenant / replica routing applies)."""
+    with get_backend().snapshot_connection() as conn:
+        yield PinnedSnapshot(conn)
+
+
+@contextmanager
+def use_snapshot(snapshot: PinnedSnapshot):
+    """
+    Reads in this block, and in tasks and threadpool calls started from it,
+    go to `snapshot` instead of a fresh connection. Writes are unaffected.
+    """
+    token = _pinned.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _pinned.reset(token)
 
-DB_PATH = pick_db()
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
\ No newline at end of file
+# -----------------------
+# Startup checks
+# -----------------------
+def check_wal(required: bool = True) -> str:
+    """Enable WAL (SQLite); raise if it did not take and WAL is required (multi-worker serving)."""
+    return _backend.startup_check(required)
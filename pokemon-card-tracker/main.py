@@ -1,29 +1,42 @@
 # main.py
+"""
+Console for the card tracker, straight on the repositories.
+
+    python main.py                                   # interactive menu
+    python main.py inventory list --format csv > inventory.csv
+    python main.py cards list --set-id 3
+    python main.py inventory add --card-id 4 --condition-id 1 --quantity 2
+    python main.py inventory update 12 --quantity 3 --notes "recounted"
+    python main.py inventory import items.ndjson     # or - for stdin; csv works too
+    python main.py inventory update-many changes.ndjson
+    python main.py inventory delete-many ids.txt
+
+With arguments it runs one command and exits, for scripts and nightly
+jobs. Listings stream from the repository cursors as NDJSON (default) or
+CSV, and bulk input is read and written in batches, so memory use stays
+flat however many rows go through. Exit status is 1 if any row failed.
+"""
 from __future__ import annotations
 
-import inspect
-from typing import Any, Dict, Optional
+import argparse
+import csv
+import json
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from repositories import SetRepository, CardRepository, InventoryRepository, ConditionRepository
+from db import DB_ERRORS
+from repositories import INVENTORY_FIELDS, SetRepository, CardRepository, InventoryRepository, ConditionRepository
+from startup import prepare
 
 sets_repo = SetRepository()
 cards_repo = CardRepository()
 inv_repo = InventoryRepository()
-
-# ConditionRepository might exist in your repo; if it doesn't, we won't crash.
-try:
-    cond_repo = ConditionRepository()
-except Exception:
-    cond_repo = None
+cond_repo = ConditionRepository()
 
 
 # -----------------------------
 # Helpers
 # -----------------------------
-def to_dict(row):
-    return dict(row) if row is not None else None
-
-
 def prompt_int(label: str, allow_blank: bool = False) -> Optional[int]:
     while True:
         raw = input(label).strip()
@@ -53,50 +66,6 @@ def prompt_str(label: str, allow_blank: bool = False) -> Optional[str]:
     return raw
 
 
-def repo_supports_kwargs(method) -> bool:
-    """True if the method accepts **kwargs (VAR_KEYWORD)."""
-    sig = inspect.signature(method)
-    return any(p.kind == inspect.Parameter.VAR_KEYWORD for p in sig.parameters.values())
-
-
-def call_update(repo, method_name: str, obj_id: int, fields: Dict[str, Any]) -> None:
-    """
-    Calls repo.update in a way that works for either:
-      update(id, **fields)
-    OR
-      update(id, field1, field2, ...)
-    """
-    method = getattr(repo, method_name)
-
-    if repo_supports_kwargs(method):
-        method(obj_id, **fields)
-        return
-
-    sig = inspect.signature(method)
-    param_names = list(sig.parameters.keys())
-    field_params = param_names[1:]  # skip the id
-    args = [fields.get(name) for name in field_params]
-    method(obj_id, *args)
-
-
-def call_create(repo, method_name: str, fields: Dict[str, Any]) -> int:
-    """
-    Calls repo.create in a way that works for either:
-      create(**fields)
-    OR
-      create(field1, field2, ...)
-    """
-    method = getattr(repo, method_name)
-
-    if repo_supports_kwargs(method):
-        return method(**fields)
-
-    sig = inspect.signature(method)
-    param_names = list(sig.parameters.keys())
-    args = [fields.get(name) for name in param_names]
-    return method(*args)
-
-
 # -----------------------------
 # Menu
 # -----------------------------
@@ -130,8 +99,7 @@ def list_sets():
         print("(no sets)")
         return
     for r in rows:
-        r = dict(r)
-        print(f"{r['set_id']:>3} | {r['set_code']:<8} | {r['set_name']:<28} | {r['release_date']} | {r['era']}")
+        print(f"{r.set_id:>3} | {r.set_code:<8} | {r.set_name:<28} | {r.release_date} | {r.era}")
 
 
 def list_cards_in_set():
@@ -141,17 +109,17 @@ def list_cards_in_set():
         print("(no cards found for that set_id)")
         return
     for r in rows:
-        r = dict(r)
         print(
-            f"{r['card_id']:>4} | set={r['set_id']:<3} | #{r['card_number']:<10} | "
-            f"{r['card_name']:<28} | {r['rarity']:<12} | {r['card_type']}"
+            f"{r.card_id:>4} | set={r.set_id:<3} | #{r.card_number:<10} | "
+            f"{r.card_name:<28} | {r.rarity:<12} | {r.card_type}"
         )
 
 
 def list_inventory():
-    print("\nSelect a set to filter your inventory:")
-    list_sets()
-    raw = input("Enter set_id (or press Enter to show all owned cards): ").strip()
+    raw = input("Enter set_id (Enter = all owned cards, ? = list sets first): ").strip()
+    if raw == "?":
+        list_sets()
+        raw = input("Enter set_id (or press Enter to show all owned cards): ").strip()
 
     if raw == "":
         rows = inv_repo.get_all()
@@ -166,36 +134,24 @@ def list_inventory():
         print("(no owned cards found for that set)")
         return
 
-    for r in rows:
-        r = dict(r)  # sqlite3.Row -> dict (so .get works)
-
-        set_code = r.get("set_code", "")
-        card_number = r.get("card_number", "")
-        card_name = r.get("card_name", "")
-        rarity = r.get("rarity", "")
-        cond_code = r.get("condition_code", r.get("condition_id", ""))
-
+    for r in rows:  # InventoryListing records
         graded = ""
-        if r.get("is_graded", 0) == 1:
-            graded = f" | {r.get('graded_company')} {r.get('grade')}"
+        if r.is_graded == 1:
+            graded = f" | {r.graded_company} {r.grade}"
 
         print(
-            f"Item {r['item_id']:>3} | {set_code} {card_number:<10} {card_name:<24}"
-            f"| {rarity:<12} | cond={cond_code} | qty={r['quantity']} | paid=${float(r['purchase_price']):.2f}{graded}"
+            f"Item {r.item_id:>3} | {r.set_code} {r.card_number:<10} {r.card_name:<24}"
+            f"| {r.rarity:<12} | cond={r.condition_code} | qty={r.quantity} | paid=${float(r.purchase_price):.2f}{graded}"
         )
 
 
 def list_conditions():
-    if cond_repo is None:
-        print("(ConditionRepository not available in your repositories.py)")
-        return
     rows = list(cond_repo.get_all())
     if len(rows) == 0:
         print("(no conditions)")
         return
     for r in rows:
-        r = dict(r)
-        print(f"{r['condition_id']:>2} | {r['condition_code']:<4} | {r['description']}")
+        print(f"{r.condition_id:>2} | {r.condition_code:<4} | {r.description}")
 
 
 # -----------------------------
@@ -209,15 +165,15 @@ def add_set():
         "release_date": prompt_str("release_date (YYYY-MM-DD): "),
         "era": prompt_str("era: "),
     }
-    new_id = call_create(sets_repo, "create", fields)
+    new_id = sets_repo.create(**fields)
     print(f"Created set_id = {new_id}")
 
 
 def update_set():
     print("\n--- Update Set ---")
     set_id = prompt_int("set_id to update: ")
-    current = sets_repo.get_by_id(set_id) if hasattr(sets_repo, "get_by_id") else None
-    cur = to_dict(current) if current else {}
+    current = sets_repo.get_by_id(set_id)
+    cur = current or {}
 
     print("Press Enter to keep current value.")
     fields = {
@@ -226,7 +182,7 @@ def update_set():
         "release_date": prompt_str(f"release_date [{cur.get('release_date','')}]: ", allow_blank=True) or cur.get("release_date"),
         "era": prompt_str(f"era [{cur.get('era','')}]: ", allow_blank=True) or cur.get("era"),
     }
-    call_update(sets_repo, "update", set_id, fields)
+    sets_repo.update(set_id, **fields)
     print("Updated set.")
 
 
@@ -280,15 +236,15 @@ def add_card():
         "card_type": ctype_norm,
     }
 
-    new_id = call_create(cards_repo, "create", fields)
+    new_id = cards_repo.create(**fields)
     print(f"Created card_id = {new_id}")
 
 
 def update_card():
     print("\n--- Update Card ---")
     card_id = prompt_int("card_id to update: ")
-    current = cards_repo.get_by_id(card_id) if hasattr(cards_repo, "get_by_id") else None
-    cur = to_dict(current) if current else {}
+    current = cards_repo.get_by_id(card_id)
+    cur = current or {}
 
     print("Press Enter to keep current value.")
     fields = {
@@ -298,7 +254,7 @@ def update_card():
         "rarity": prompt_str(f"rarity [{cur.get('rarity','')}]: ", allow_blank=True) or cur.get("rarity"),
         "card_type": prompt_str(f"card_type [{cur.get('card_type','')}]: ", allow_blank=True) or cur.get("card_type"),
     }
-    call_update(cards_repo, "update", card_id, fields)
+    cards_repo.update(card_id, **fields)
     print("Updated card.")
 
 
@@ -334,15 +290,15 @@ def add_inventory_item():
         fields["graded_company"] = prompt_str("graded_company (PSA/BGS/CGC): ")
         fields["grade"] = prompt_float("grade (1.0 - 10.0): ")
 
-    new_id = call_create(inv_repo, "create", fields)
+    new_id = inv_repo.create(**fields)
     print(f"Created item_id = {new_id}")
 
 
 def update_inventory_item():
     print("\n--- Update Inventory Item ---")
     item_id = prompt_int("item_id to update: ")
-    current = inv_repo.get_by_id(item_id) if hasattr(inv_repo, "get_by_id") else None
-    cur = to_dict(current) if current else {}
+    current = inv_repo.get_by_id(item_id)
+    cur = current or {}
 
     print("Press Enter to keep current value.")
     fields = {
@@ -370,7 +326,7 @@ def update_inventory_item():
         fields["graded_company"] = None
         fields["grade"] = None
 
-    call_update(inv_repo, "update", item_id, fields)
+    inv_repo.update(item_id, **fields)
     print("Updated inventory item.")
 
 
@@ -381,6 +337,297 @@ def delete_inventory_item():
     print("Deleted (if it existed).")
 
 
+# -----------------------------
+# Headless mode (python main.py <entity> <command> ...)
+# -----------------------------
+# entity -> (repository, id column, writable fields)
+ENTITIES = {
+    "sets": (sets_repo, "set_id", ("set_code", "set_name", "release_date", "era")),
+    "cards": (cards_repo, "card_id", ("set_id", "card_number", "card_name", "rarity", "card_type")),
+    "conditions": (cond_repo, "condition_id", ("condition_code", "description")),
+    "inventory": (inv_repo, "item_id", INVENTORY_FIELDS),
+}
+INT_FIELDS = {"set_id", "card_id", "condition_id", "item_id", "is_foil", "is_graded", "quantity"}
+FLOAT_FIELDS = {"grade", "purchase_price"}
+REQUIRED = {"inventory": ("card_id", "condition_id")}
+
+
+def convert(field: str, value: Any) -> Any:
+    """CSV / command-line text -> the column's type; "" means NULL."""
+    if value is None or value == "":
+        return None
+    if field in INT_FIELDS:
+        return int(value)
+    if field in FLOAT_FIELDS:
+        return float(value)
+    return value
+
+
+def write_rows(rows: Iterable[Any], fmt: str, out=None) -> int:
+    """Stream rows to stdout as NDJSON or CSV, one at a time; returns the row count."""
+    out = out or sys.stdout
+    writer = None
+    n = 0
+    for r in rows:
+        d = r._asdict()
+        if fmt == "csv":
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(d), lineterminator="\n")
+                writer.writeheader()
+            writer.writerow(d)
+        else:
+            out.write(json.dumps(d, ensure_ascii=False, default=str) + "\n")
+        n += 1
+    return n
+
+
+def read_records(path: str, fmt: Optional[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(line number, record) from an NDJSON or CSV file, or stdin for "-"."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    fh = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            for n, row in enumerate(csv.DictReader(fh), 2):  # line 1 is the header
+                yield n, row
+        else:
+            for n, line in enumerate(fh, 1):
+                if line.strip():
+                    yield n, json.loads(line)
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def read_ids(path: str) -> Iterator[Tuple[int, int]]:
+    """(line number, id) from a file with one id per line (or stdin for "-")."""
+    fh = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for n, line in enumerate(fh, 1):
+            if line.strip():
+                yield n, int(line)
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BulkReport:
+    def __init__(self):
+        self.rows = 0
+        self.ok = 0
+        self.failed = 0
+        self.errors: List[Tuple[int, str]] = []
+
+    def fail(self, line: int, problem: Any) -> None:
+        self.failed += 1
+        if len(self.errors) < 20:
+            self.errors.append((line, str(problem)))
+
+    def print(self, verb: str) -> None:
+        print(f"{self.rows} rows, {self.ok} {verb}, {self.failed} failed", file=sys.stderr)
+        for line, problem in sorted(self.errors):
+            print(f"  line {line}: {problem}", file=sys.stderr)
+
+
+def _clean(entity: str, line: int, rec: Dict[str, Any], fields, report: BulkReport) -> Optional[Dict[str, Any]]:
+    try:
+        out = {f: convert(f, rec[f]) for f in fields if f in rec}
+    except (TypeError, ValueError) as e:
+        report.fail(line, e)
+        return None
+    missing = [f for f in REQUIRED.get(entity, ()) if out.get(f) is None]
+    if missing:
+        report.fail(line, "missing " + ", ".join(missing))
+        return None
+    return out
+
+
+def import_inventory(records: Iterable[Tuple[int, Dict[str, Any]]], batch_size: int) -> BulkReport:
+    """
+    Insert in batches with one bulk insert each. A batch the database
+    rejects is replayed row by row (one savepoint each) so only the bad
+    rows fail and are reported.
+    """
+    report = BulkReport()
+
+    def cleaned():
+        for line, rec in records:
+            report.rows += 1
+            item = _clean("inventory", line, rec, INVENTORY_FIELDS, report)
+            if item is not None:
+                yield line, item
+
+    for batch in batched(cleaned(), batch_size):
+        try:
+            report.ok += inv_repo.bulk_create(item for _, item in batch)
+            continue
+        except DB_ERRORS:
+            pass
+        results = inv_repo.apply_batch([item for _, item in batch], [])
+        for (line, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                report.fail(line, result)
+            else:
+                report.ok += 1
+    return report
+
+
+def update_many_inventory(records: Iterable[Tuple[int, Dict[str, Any]]], batch_size: int) -> BulkReport:
+    """Each record is {"item_id": ..., field: value, ...}; one transaction per batch."""
+    report = BulkReport()
+
+    def cleaned():
+        for line, rec in records:
+            report.rows += 1
+            try:
+                item_id = int(rec["item_id"])
+            except (KeyError, TypeError, ValueError):
+                report.fail(line, "item_id is required")
+                continue
+            fields = _clean("update-many", line, rec, INVENTORY_FIELDS, report)
+            if fields is not None:
+                yield line, item_id, fields
+
+    for batch in batched(cleaned(), batch_size):
+        results = inv_repo.apply_batch([], [(item_id, fields) for _, item_id, fields in batch])
+        for (line, item_id, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                report.fail(line, result)
+            elif result:
+                report.ok += 1
+            else:
+                report.fail(line, f"item_id {item_id} not found (or nothing to update)")
+    return report
+
+
+def delete_many_inventory(ids: Iterable[Tuple[int, int]], batch_size: int) -> BulkReport:
+    report = BulkReport()
+    for batch in batched(ids, batch_size):
+        report.rows += len(batch)
+        report.ok += inv_repo.delete_many([item_id for _, item_id in batch])
+    report.failed = report.rows - report.ok  # ids that did not exist
+    return report
+
+
+def _stream(entity: str, args) -> Iterable[Any]:
+    repo = ENTITIES[entity][0]
+    if entity in ("cards", "inventory"):
+        return repo.iter_all(args.batch_size, set_id=args.set_id)
+    return repo.get_all()  # sets and conditions are small lookup tables
+
+
+def run_command(args) -> int:
+    entity, command = args.entity, args.command
+    repo, id_col, fields = ENTITIES[entity]
+
+    if command == "list":
+        write_rows(_stream(entity, args), args.format)
+        return 0
+
+    if command == "get":
+        row = repo.get_by_id(args.id)
+        if row is None:
+            print(f"{id_col} {args.id} not found", file=sys.stderr)
+            return 1
+        write_rows([row], args.format)
+        return 0
+
+    if command in ("add", "update", "delete"):
+        if command != "add" and repo.get_by_id(args.id) is None:
+            print(f"{id_col} {args.id} not found", file=sys.stderr)
+            return 1
+        values = {f: getattr(args, f) for f in fields if getattr(args, f, None) is not None}
+        try:
+            if command == "add":
+                missing = [f for f in REQUIRED.get(entity, fields) if f not in values]
+                if missing:
+                    print("missing: " + ", ".join("--" + f.replace("_", "-") for f in missing), file=sys.stderr)
+                    return 2
+                print(json.dumps({id_col: repo.create(**values)}))
+            elif command == "update":
+                repo.update(args.id, **values)
+            else:
+                repo.delete(args.id)
+        except DB_ERRORS as e:
+            print(f"{command} failed: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    if command == "import":
+        report = import_inventory(read_records(args.file, args.input_format), args.batch_size)
+        report.print("imported")
+    elif command == "update-many":
+        report = update_many_inventory(read_records(args.file, args.input_format), args.batch_size)
+        report.print("updated")
+    else:  # delete-many
+        report = delete_many_inventory(read_ids(args.file), args.batch_size)
+        report.print("deleted")
+    return 1 if report.failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Pokemon card tracker console. Run without arguments for the menu.")
+    entities = parser.add_subparsers(dest="entity", required=True)
+    for entity, (_, id_col, fields) in ENTITIES.items():
+        ep = entities.add_parser(entity, help=f"{entity} commands")
+        commands = ep.add_subparsers(dest="command", required=True)
+
+        p = commands.add_parser("list", help="stream every row")
+        p.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+        p.add_argument("--batch-size", type=int, default=1000, help="rows fetched from the cursor at a time")
+        if entity in ("cards", "inventory"):
+            p.add_argument("--set-id", type=int)
+
+        p = commands.add_parser("get", help=f"one row by {id_col}")
+        p.add_argument("id", type=int)
+        p.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+
+        for command in ("add", "update"):
+            p = commands.add_parser(command, help="create a row" if command == "add" else "change the given fields")
+            if command == "update":
+                p.add_argument("id", type=int)
+            for f in fields:
+                kind = int if f in INT_FIELDS else float if f in FLOAT_FIELDS else str
+                p.add_argument("--" + f.replace("_", "-"), dest=f, type=kind)
+
+        p = commands.add_parser("delete", help=f"delete one row by {id_col}")
+        p.add_argument("id", type=int)
+
+        if entity != "inventory":
+            continue
+        for command, what in (("import", "NDJSON/CSV rows to insert"),
+                              ("update-many", "NDJSON/CSV rows with item_id and the fields to change"),
+                              ("delete-many", "item_ids, one per line")):
+            p = commands.add_parser(command, help=f"bulk: {what}")
+            p.add_argument("file", nargs="?", default="-", help="path, or - for stdin (default)")
+            p.add_argument("--batch-size", type=int, default=1000, help="rows per transaction")
+            if command != "delete-many":
+                p.add_argument("--input-format", choices=("ndjson", "csv"), help="default: from the file extension")
+    return parser
+
+
+def run_headless(argv: List[str]) -> int:
+    args = build_parser().parse_args(argv)
+    if getattr(args, "batch_size", 1) < 1:
+        print("--batch-size must be >= 1", file=sys.stderr)
+        return 2
+    try:
+        return run_command(args)
+    except BrokenPipeError:  # e.g. piped into head
+        sys.stderr.close()
+        return 0
+
+
 # -----------------------------
 # Main loop
 # -----------------------------
@@ -428,4 +675,7 @@ def main():
 
 
 if __name__ == "__main__":
+    prepare()  # a fresh checkout gets data/pokemon_cards.db, copied from the shipped one
+    if len(sys.argv) > 1:
+        sys.exit(run_headless(sys.argv[1:]))
     main()
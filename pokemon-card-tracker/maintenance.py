@@ -0,0 +1,430 @@
+# maintenance.py
+"""
+Scheduled SQLite maintenance.
+
+    python maintenance.py status
+    python maintenance.py run optimize|vacuum|quick_check|prune_changes
+    python maintenance.py enable-incremental-vacuum
+
+Four tasks, each time-boxed so it never holds the writer slot for long:
+
+- optimize: ANALYZE (bounded by PRAGMA analysis_limit) once at least
+  analyze_writes changes have been logged since the last run, so the
+  query planner's statistics follow inventory churn.
+- vacuum: PRAGMA incremental_vacuum in chunks of vacuum_pages, each in
+  its own short write transaction, while the database has been idle
+  (no new change_log entries) for idle_s seconds. Needs
+  auto_vacuum=INCREMENTAL. New databases get it from
+  01_create_tables.sql. An existing file needs one full VACUUM, which is
+  what enable-incremental-vacuum runs.
+- quick_check: PRAGMA quick_check every check_every_s seconds on a read
+  connection (under WAL it does not block writers), stopped at
+  check_budget_ms if it has not finished.
+- prune_changes: keeps change_log from growing without bound, once
+  compact_writes changes have been logged since the last run (or every
+  prune_every_s). Entries older than retention_days are deleted and the
+  feed floor (change_feed.floor_seq) moves past them, so a client whose
+  cursor is older gets 410 and reloads. Entries superseded by a newer one
+  for the same row are deleted too; a client catching up still ends in
+  the same state, it just skips the versions in between. Both work in
+  chunks of compact_chunk seqs, each its own short write transaction.
+
+Task state (last run, change_log position, result, freed pages) is kept
+in maintenance_run, so several worker processes share one schedule. The
+API runs MaintenanceScheduler.tick() every POKEMON_MAINT_SECS seconds
+(0 turns it off). GET /admin/maintenance shows the stats.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import db
+
+TASKS = ("optimize", "vacuum", "quick_check", "prune_changes")
+
+# entries in (?, ?] remove every older entry for the same row
+_COMPACT_SQL = """
+DELETE FROM change_log WHERE seq IN (
+  SELECT o.seq
+  FROM change_log n
+  JOIN change_log o ON o.table_name = n.table_name AND o.row_id = n.row_id AND o.seq < n.seq
+  WHERE n.seq > ? AND n.seq <= ?
+);
+"""
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class _Deadline:
+    """sqlite3 progress handler that interrupts the statement after budget_ms."""
+
+    def __init__(self, budget_ms: float):
+        self.until = time.perf_counter() + budget_ms / 1000
+        self.hit = False
+
+    def __call__(self) -> int:
+        if time.perf_counter() >= self.until:
+            self.hit = True
+            return 1
+        return 0
+
+
+class Maintenance:
+    def __init__(self, analyze_writes: int = 1000, analysis_limit: int = 400, idle_s: float = 60.0,
+                 vacuum_pages: int = 256, check_every_s: float = 6 * 3600, budget_ms: float = 250.0,
+                 check_budget_ms: float = 5000.0, retention_days: float = 30.0, compact_writes: int = 1000,
+                 compact_chunk: int = 2000, prune_every_s: float = 3600.0):
+        self.analyze_writes = analyze_writes
+        self.analysis_limit = analysis_limit
+        self.idle_s = idle_s
+        self.vacuum_pages = vacuum_pages
+        self.check_every_s = check_every_s
+        self.budget_ms = budget_ms
+        self.check_budget_ms = check_budget_ms
+        self.retention_days = retention_days  # 0 keeps every entry (compaction still runs)
+        self.compact_writes = compact_writes
+        self.compact_chunk = compact_chunk
+        self.prune_every_s = prune_every_s
+        # idle detection: when this process last saw the change_log head move
+        self._last_head: Optional[int] = None
+        self._head_moved_at = time.monotonic()
+
+    # -----------------------
+    # state
+    # -----------------------
+    @staticmethod
+    def _check_backend() -> None:
+        backend = db.get_backend()
+        if backend.name != "sqlite" or getattr(backend, "read_only", False):
+            raise RuntimeError("maintenance runs on a writable SQLite database")
+
+    @staticmethod
+    def _head(conn) -> int:
+        return max(*Maintenance._feed(conn))
+
+    @staticmethod
+    def _feed(conn) -> Tuple[int, int]:
+        """(change_log head, feed floor)"""
+        row = conn.execute(
+            "SELECT (SELECT COALESCE(MAX(seq), 0) FROM change_log) AS head, "
+            "(SELECT floor_seq FROM change_feed WHERE id = 1) AS floor_seq;"
+        ).fetchone()
+        return int(row["head"]), int(row["floor_seq"])
+
+    @staticmethod
+    def _row(conn, task: str) -> Dict[str, Any]:
+        row = conn.execute("SELECT * FROM maintenance_run WHERE task = ?;", (task,)).fetchone()
+        return dict(row) if row else {"task": task, "last_run_at": None, "last_seq": 0, "runs": 0, "freed_pages": 0}
+
+    @staticmethod
+    def _record(conn, task: str, head: int, elapsed_ms: float, result: str, freed: int = 0) -> None:
+        conn.execute(
+            "INSERT INTO maintenance_run (task, last_run_at, last_seq, last_ms, last_result, runs, freed_pages) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT(task) DO UPDATE SET last_run_at = excluded.last_run_at, last_seq = excluded.last_seq, "
+            "last_ms = excluded.last_ms, last_result = excluded.last_result, "
+            "runs = maintenance_run.runs + 1, freed_pages = maintenance_run.freed_pages + excluded.freed_pages;",
+            (task, _now(), head, round(elapsed_ms, 1), result, freed),
+        )
+
+    def _observe_head(self, head: int) -> float:
+        """Seconds since the change_log head last moved (as seen by this process)."""
+        if head != self._last_head:
+            self._last_head = head
+            self._head_moved_at = time.monotonic()
+        return time.monotonic() - self._head_moved_at
+
+    def status(self) -> Dict[str, Any]:
+        self._check_backend()
+        with db.get_conn() as conn:
+            head, floor = self._feed(conn)
+            head = max(head, floor)
+            tasks = {t: self._row(conn, t) for t in TASKS}
+            pragmas = {p: conn.execute(f"PRAGMA {p};").fetchone()[0]
+                       for p in ("page_count", "freelist_count", "page_size", "auto_vacuum")}
+        pragmas["auto_vacuum"] = AUTO_VACUUM_MODES.get(pragmas["auto_vacuum"], pragmas["auto_vacuum"])
+        return {
+            **pragmas,
+            "change_log_head": head,
+            "change_feed_floor": floor,
+            "writes_since_optimize": head - tasks["optimize"]["last_seq"],
+            "idle_s": round(self._observe_head(head), 1),
+            "tasks": tasks,
+        }
+
+    # -----------------------
+    # tasks
+    # -----------------------
+    def run(self, task: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Run one task if it is due (or force); None when it was not due."""
+        if task not in TASKS:
+            raise ValueError(f"task must be one of: {', '.join(TASKS)}")
+        self._check_backend()
+        return getattr(self, f"_{task}")(force)
+
+    def tick(self) -> Dict[str, Any]:
+        """Run whatever is due; {task: result} for the tasks that ran."""
+        ran = {}
+        for task in TASKS:
+            result = self.run(task)
+            if result is not None:
+                ran[task] = result
+        return ran
+
+    def _optimize(self, force: bool) -> Optional[Dict[str, Any]]:
+        start = time.perf_counter()
+        with db.write_conn() as conn:
+            # due-check under the writer slot so two workers don't both run it
+            head = self._head(conn)
+            if not force and head - self._row(conn, "optimize")["last_seq"] < self.analyze_writes:
+                return None
+            deadline = _Deadline(self.budget_ms)
+            conn.execute(f"PRAGMA analysis_limit = {int(self.analysis_limit)};")
+            conn.execute("SAVEPOINT analyze_stats;")
+            conn.set_progress_handler(deadline, 1000)
+            try:
+                conn.execute("ANALYZE;")
+                conn.execute("RELEASE analyze_stats;")
+                result = "ok"
+            except sqlite3.OperationalError:
+                if not deadline.hit:
+                    raise
+                if conn.in_transaction:  # SQLite may already have rolled the whole transaction back
+                    conn.execute("ROLLBACK TO analyze_stats;")
+                    conn.execute("RELEASE analyze_stats;")
+                result = "interrupted (time budget)"
+            finally:
+                conn.set_progress_handler(None, 0)
+            elapsed = (time.perf_counter() - start) * 1000
+            self._record(conn, "optimize", head, elapsed, result)
+        return {"result": result, "elapsed_ms": round(elapsed, 1)}
+
+    def _vacuum(self, force: bool) -> Optional[Dict[str, Any]]:
+        with db.get_conn() as conn:
+            head = self._head(conn)
+            mode = conn.execute("PRAGMA auto_vacuum;").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+        idle = self._observe_head(head)
+        if not force and (free == 0 or idle < self.idle_s):
+            return None
+        start = time.perf_counter()
+        if AUTO_VACUUM_MODES.get(mode) != "incremental":
+            result, freed = "skipped: auto_vacuum is not incremental (run enable-incremental-vacuum once)", 0
+        else:
+            freed = 0
+            chunks = 0
+            while True:
+                before, after = self._vacuum_chunk()
+                freed += before - after
+                chunks += 1
+                if after == 0 or before == after:
+                    result = "ok"
+                    break
+                if (time.perf_counter() - start) * 1000 >= self.budget_ms:
+                    result = f"paused with {after} free page(s) left (time budget)"
+                    break
+            result += f" ({chunks} chunk(s))"
+        elapsed = (time.perf_counter() - start) * 1000
+        with db.write_conn() as conn:
+            self._record(conn, "vacuum", head, elapsed, result, freed)
+        return {"result": result, "freed_pages": freed, "elapsed_ms": round(elapsed, 1)}
+
+    def _vacuum_chunk(self):
+        """Free up to vacuum_pages pages in one short write transaction; (free before, free after)."""
+        backend = db.get_backend()
+        with backend._write_lock():  # writers get the slot back between chunks
+            conn = backend.connect()
+            try:
+                conn.isolation_level = None
+                before = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+                # execute() steps the pragma once (one page); executescript runs it to completion
+                conn.executescript(f"BEGIN IMMEDIATE; PRAGMA incremental_vacuum({int(self.vacuum_pages)}); COMMIT;")
+                after = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+            finally:
+                conn.close()
+        return before, after
+
+    def _quick_check(self, force: bool) -> Optional[Dict[str, Any]]:
+        with db.write_conn() as conn:
+            # claim the run (short write) so other workers skip it, then check on a read connection
+            row = self._row(conn, "quick_check")
+            last = row["last_run_at"]
+            if not force and last is not None:
+                age = datetime.now(timezone.utc) - datetime.fromisoformat(last)
+                if age.total_seconds() < self.check_every_s:
+                    return None
+            head = self._head(conn)
+            self._record(conn, "quick_check", head, 0.0, "running")
+        start = time.perf_counter()
+        deadline = _Deadline(self.check_budget_ms)
+        with db.get_conn() as conn:
+            conn.set_progress_handler(deadline, 1000)
+            try:
+                rows = [r[0] for r in conn.execute("PRAGMA quick_check(20);").fetchall()]
+                result = "ok" if rows == ["ok"] else "; ".join(rows)
+            except sqlite3.OperationalError:
+                if not deadline.hit:
+                    raise
+                result = "incomplete (time budget)"
+            finally:
+                conn.set_progress_handler(None, 0)
+        elapsed = (time.perf_counter() - start) * 1000
+        with db.write_conn() as conn:
+            conn.execute(
+                "UPDATE maintenance_run SET last_ms = ?, last_result = ? WHERE task = 'quick_check';",
+                (round(elapsed, 1), result),
+            )
+        return {"result": result, "elapsed_ms": round(elapsed, 1)}
+
+    def _prune_changes(self, force: bool) -> Optional[Dict[str, Any]]:
+        with db.get_conn() as conn:
+            head, floor = self._feed(conn)
+            row = self._row(conn, "prune_changes")
+        last = row["last_seq"]
+        if not force and head - last < self.compact_writes:
+            ran = row["last_run_at"]
+            if ran is not None and (datetime.now(timezone.utc) - datetime.fromisoformat(ran)).total_seconds() < self.prune_every_s:
+                return None
+        start = time.perf_counter()
+        until = start + self.budget_ms / 1000
+        expired = 0
+        if self.retention_days > 0:
+            expired, floor = self._drop_expired(floor, head, until)
+
+        compacted = 0
+        pos = max(last, floor)
+        while pos < head and time.perf_counter() < until:
+            end = min(pos + self.compact_chunk, head)
+            with db.write_conn() as conn:
+                compacted += conn.execute(_COMPACT_SQL, (pos, end)).rowcount
+            pos = end
+        result = "ok" if pos >= head else f"paused at seq {pos} of {head} (time budget)"
+        result += f" ({expired} expired, {compacted} superseded entries removed; floor {floor})"
+        elapsed = (time.perf_counter() - start) * 1000
+        with db.write_conn() as conn:
+            self._record(conn, "prune_changes", pos, elapsed, result)
+        return {"result": result, "expired": expired, "compacted": compacted, "floor_seq": floor,
+                "elapsed_ms": round(elapsed, 1)}
+
+    def _drop_expired(self, floor: int, head: int, until: float) -> Tuple[int, int]:
+        """Delete entries older than retention_days, moving the floor with each chunk; (deleted, new floor)."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        cutoff_text = cutoff.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"  # change_log.changed_at format
+        with db.get_conn() as conn:
+            # seq order is commit order, so this only walks the entries that are about to go
+            row = conn.execute(
+                "SELECT seq FROM change_log WHERE changed_at >= ? ORDER BY seq LIMIT 1;", (cutoff_text,)
+            ).fetchone()
+        upto = row["seq"] - 1 if row else head
+        deleted = 0
+        while floor < upto and time.perf_counter() < until:
+            end = min(floor + self.compact_chunk, upto)
+            with db.write_conn() as conn:
+                deleted += conn.execute("DELETE FROM change_log WHERE seq <= ?;", (end,)).rowcount
+                conn.execute("UPDATE change_feed SET floor_seq = ?, updated_at = ? WHERE id = 1;", (end, _now()))
+            floor = end
+        return deleted, floor
+
+    def enable_incremental_vacuum(self) -> Dict[str, Any]:
+        """One-time full VACUUM that switches an existing file to auto_vacuum=INCREMENTAL."""
+        self._check_backend()
+        backend = db.get_backend()
+        start = time.perf_counter()
+        with backend._write_lock():
+            # VACUUM can't run inside a transaction: plain connection, autocommit
+            conn = sqlite3.connect(str(backend.path), timeout=db.BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            try:
+                before = conn.execute("PRAGMA page_count;").fetchone()[0]
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+                conn.execute("VACUUM;")
+                after = conn.execute("PRAGMA page_count;").fetchone()[0]
+                mode = conn.execute("PRAGMA auto_vacuum;").fetchone()[0]
+            finally:
+                conn.close()
+        return {"auto_vacuum": AUTO_VACUUM_MODES.get(mode, mode), "pages_before": before, "pages_after": after,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+class MaintenanceScheduler:
+    """Calls tick() every interval_s seconds on a daemon thread (same shape as LotConsolidator)."""
+
+    def __init__(self, tick: Callable[[], Dict[str, Any]], interval_s: float = 60.0):
+        if interval_s <= 0:
+            raise ValueError("interval_s must be positive")
+        self.tick = tick
+        self.interval_s = interval_s
+        self.last_ran: Dict[str, Any] = {}
+        self.last_error: Optional[str] = None
+        self.stats = {"ticks": 0, "tasks_run": 0, "errors": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                ran = self.tick()
+            except Exception as e:  # keep the thread alive; next tick retries
+                self.stats["errors"] += 1
+                self.last_error = str(e)
+                continue
+            self.stats["ticks"] += 1
+            self.stats["tasks_run"] += len(ran)
+            if ran:
+                self.last_ran = ran
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"interval_s": self.interval_s, "last_ran": self.last_ran, "last_error": self.last_error, **self.stats}
+
+
+def maintenance_from_env() -> Maintenance:
+    return Maintenance(
+        analyze_writes=int(os.environ.get("POKEMON_MAINT_ANALYZE_WRITES", "1000")),
+        idle_s=float(os.environ.get("POKEMON_MAINT_IDLE_SECS", "60")),
+        check_every_s=float(os.environ.get("POKEMON_MAINT_CHECK_SECS", str(6 * 3600))),
+        budget_ms=float(os.environ.get("POKEMON_MAINT_BUDGET_MS", "250")),
+        retention_days=float(os.environ.get("POKEMON_CHANGE_RETENTION_DAYS", "30")),
+        compact_writes=int(os.environ.get("POKEMON_MAINT_COMPACT_WRITES", "1000")),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite maintenance for the Pokemon Card Tracker database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="page counts and last run of every task")
+    p = sub.add_parser("run", help="run one task now, due or not")
+    p.add_argument("task", choices=TASKS)
+    sub.add_parser("enable-incremental-vacuum", help="one-time full VACUUM to allow incremental vacuum")
+    args = parser.parse_args()
+
+    maint = maintenance_from_env()
+    try:
+        if args.command == "status":
+            out = maint.status()
+        elif args.command == "run":
+            out = maint.run(args.task, force=True)
+        else:
+            out = maint.enable_incremental_vacuum()
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
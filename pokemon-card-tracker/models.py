@@ -0,0 +1,192 @@
+# models.py
+"""
+Compact, typed row records.
+
+Every connection hands out rows as records: tuple subclasses with named
+fields and no per-row dict or description pointer (__slots__ = ()). The
+main shapes have declared classes:
+
+    CardSet, Card, Condition, InventoryItem     SELECT * FROM <table>
+    CardListing                                 card + set_code, set_name
+    InventoryListing                            inventory list (INVENTORY_LIST_SQL)
+
+Any other result shape (joins, aggregates, PRAGMAs) gets a record class
+made on first use and cached per column list. Records keep the access
+the code already used on sqlite3.Row / psycopg dict rows (row["col"],
+row[0], dict(row)), and add row.col, row.get("col") and row._asdict().
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import namedtuple
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+
+class Record(tuple):
+    """Mixin for the record classes: mapping-style access on top of the tuple."""
+
+    __slots__ = ()
+    _columns: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            try:
+                return tuple.__getitem__(self, self._index[key])
+            except KeyError:
+                return tuple.__getitem__(self, self._index[key.lower()])  # sqlite3.Row matched names case-insensitively
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._columns
+
+    def _asdict(self) -> Dict[str, Any]:
+        return dict(zip(self._columns, self))
+
+
+def _finish(cls, columns: Sequence[str]):
+    cls._columns = tuple(columns)
+    index: Dict[str, int] = {}
+    for i, name in enumerate(columns):
+        index.setdefault(name, i)  # duplicate names: the first wins, as with sqlite3.Row
+    for name, i in list(index.items()):
+        index.setdefault(name.lower(), i)
+    cls._index = index
+    return cls
+
+
+def record_class(nt) -> type:
+    """Typed NamedTuple -> record class with the same fields."""
+    return _finish(type(nt.__name__, (Record, nt), {"__slots__": (), "__doc__": nt.__doc__}), nt._fields)
+
+
+# -----------------------
+# Declared records
+# -----------------------
+class _CardSet(NamedTuple):
+    """One card_set row."""
+    set_id: int
+    set_code: str
+    set_name: str
+    release_date: str
+    era: str
+
+
+class _Card(NamedTuple):
+    """One card row."""
+    card_id: int
+    set_id: int
+    card_number: str
+    card_name: str
+    rarity: str
+    card_type: str
+
+
+class _CardListing(NamedTuple):
+    """A card with its set, as GET /cards lists it."""
+    card_id: int
+    set_id: int
+    card_number: str
+    card_name: str
+    rarity: str
+    card_type: str
+    set_code: str
+    set_name: str
+
+
+class _Condition(NamedTuple):
+    """One card_condition row."""
+    condition_id: int
+    condition_code: str
+    description: str
+
+
+class _InventoryItem(NamedTuple):
+    """One inventory_item row."""
+    item_id: int
+    card_id: int
+    condition_id: int
+    is_foil: int
+    is_graded: int
+    graded_company: Optional[str]
+    grade: Optional[float]
+    quantity: int
+    purchase_price: float
+    purchase_date: Optional[str]
+    notes: Optional[str]
+
+
+class _InventoryListing(NamedTuple):
+    """An inventory item with its card, set and condition, as GET /inventory lists it."""
+    item_id: int
+    card_id: int
+    condition_id: int
+    is_foil: int
+    is_graded: int
+    graded_company: Optional[str]
+    grade: Optional[float]
+    quantity: int
+    purchase_price: float
+    purchase_date: Optional[str]
+    notes: Optional[str]
+    card_name: str
+    card_number: str
+    rarity: str
+    set_code: str
+    set_name: str
+    condition_code: str
+
+
+CardSet = record_class(_CardSet)
+Card = record_class(_Card)
+CardListing = record_class(_CardListing)
+Condition = record_class(_Condition)
+InventoryItem = record_class(_InventoryItem)
+InventoryListing = record_class(_InventoryListing)
+
+# column list -> record class; starts with the declared shapes
+_classes: Dict[Tuple[str, ...], type] = {
+    cls._columns: cls for cls in (CardSet, Card, CardListing, Condition, InventoryItem, InventoryListing)
+}
+_classes_lock = threading.Lock()
+
+
+def class_for(columns: Tuple[str, ...]) -> type:
+    cls = _classes.get(columns)
+    if cls is None:
+        with _classes_lock:
+            cls = _classes.get(columns)
+            if cls is None:
+                nt = namedtuple("Row", columns, rename=True)  # rename: "COUNT(*)" etc. are not identifiers
+                cls = _classes[columns] = _finish(type("Row", (Record, nt), {"__slots__": ()}), columns)
+    return cls
+
+
+# -----------------------
+# Row factories
+# -----------------------
+_last_sqlite: Tuple[Any, type] = (None, Record)  # (cursor.description, class) of the latest result
+
+
+def sqlite_row(cursor, row: tuple):
+    """sqlite3 row_factory: each row becomes a record without copying its values."""
+    global _last_sqlite
+    description, cls = _last_sqlite
+    if cursor.description is not description:  # once per result set, not per row
+        description = cursor.description
+        cls = class_for(tuple(d[0] for d in description))
+        _last_sqlite = (description, cls)
+    return tuple.__new__(cls, row)
+
+
+def pg_row(cursor):
+    """psycopg row_factory: same records for PostgreSQL results."""
+    if cursor.description is None:
+        return tuple
+    cls = class_for(tuple(c.name for c in cursor.description))
+    return lambda values: tuple.__new__(cls, values)
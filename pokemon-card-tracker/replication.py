@@ -0,0 +1,257 @@
+# replication.py
+"""
+Read replicas for reporting: the primary ships snapshots of its SQLite
+database to one or more replica files, and read-only API instances (or
+stale-tolerant reads on the primary) are served from them.
+
+    python replication.py ship replicas/r1.db replicas/r2.db --interval 2
+    python replication.py status replicas/r1.db
+
+    POKEMON_REPLICA_DB=replicas/r1.db uvicorn api:app --port 8001    # read-only replica API
+    POKEMON_READ_REPLICAS=replicas/r1.db uvicorn api:app --port 8000 # primary that may use it
+
+Shipping: every interval the shipper checks whether the primary changed
+(the main file or its -wal, which every commit touches). If so, it copies
+the database once with the backup API, using one read snapshot so writers
+are not blocked, and switches the copy to rollback-journal mode so it can
+be opened read-only without a -shm file. It stamps the copy with
+replica_info (change_log head, time), then atomically renames it over each
+replica. Readers open a connection per call, so each read sees one whole
+snapshot. When nothing changed, a <replica>.heartbeat file records that the
+replica was still current, so its lag does not grow while the primary is
+idle.
+
+HTTP: a replica instance answers reads only (writes get 405; POST /batch,
+which only runs GETs, is a read) and adds
+X-Replication-Lag (seconds) and X-Replication-Seq to every response. On
+the primary, a GET (or POST /batch) with X-Max-Staleness: <seconds> is served from the
+freshest replica within that bound (or from the primary if none is), and
+says which in X-Replica / X-Replication-Lag.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi.responses import JSONResponse
+
+import db
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+READ_POSTS = ("/batch",)  # POSTs that only read
+STALENESS_HEADER = b"x-max-staleness"
+
+REPLICA_INFO_SQL = """
+CREATE TABLE replica_info (
+  id          INTEGER PRIMARY KEY CHECK (id = 1),
+  seq         INTEGER NOT NULL,   -- change_log head of this copy
+  shipped_at  REAL NOT NULL,      -- unix time; the copy is at least this fresh
+  source      TEXT NOT NULL
+);
+"""
+
+
+# -----------------------------
+# Shipping
+# -----------------------------
+class ReplicaShipper:
+    def __init__(self, targets: List[Path], backend=None):
+        if not targets:
+            raise ValueError("at least one replica path is needed")
+        self.targets = [Path(t) for t in targets]
+        self.backend = backend or db.get_backend()
+        if self.backend.name != "sqlite" or getattr(self.backend, "read_only", False):
+            raise RuntimeError("replication ships a writable SQLite primary")
+        with self.backend.connection():
+            pass  # apply pending migrations so replicas get the full schema
+        self._last_state = None
+        self._stop = threading.Event()
+        self.stats = {"checks": 0, "ships": 0, "heartbeats": 0, "errors": 0, "last_ship_ms": None, "last_seq": None}
+
+    def _primary_state(self):
+        path = self.backend.path
+        wal = path.with_name(path.name + "-wal")
+        state = []
+        for p in (path, wal):
+            try:
+                st = p.stat()
+                state.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def ship_once(self, force: bool = False) -> bool:
+        """Ship if the primary changed (or force); True if new copies went out."""
+        self.stats["checks"] += 1
+        state = self._primary_state()
+        missing = [t for t in self.targets if not t.is_file()]
+        if not force and not missing and state == self._last_state:
+            now = time.time()
+            for target in self.targets:
+                _write_heartbeat(target, self.stats["last_seq"], now)
+            self.stats["heartbeats"] += 1
+            return False
+
+        start = time.perf_counter()
+        shipped_at = time.time()  # taken before the copy starts: the copy is at least this fresh
+        staging = self.targets[0].with_name(self.targets[0].name + ".staging")
+        staging.parent.mkdir(parents=True, exist_ok=True)
+        staging.unlink(missing_ok=True)
+        try:
+            src = sqlite3.connect(str(self.backend.path), timeout=db.BUSY_TIMEOUT_MS / 1000)
+            dst = sqlite3.connect(str(staging))
+            try:
+                src.backup(dst)  # one step = one consistent read snapshot
+                seq = dst.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log;").fetchone()[0]
+                dst.execute("PRAGMA journal_mode = DELETE;")
+                dst.executescript(REPLICA_INFO_SQL)
+                dst.execute("INSERT INTO replica_info (id, seq, shipped_at, source) VALUES (1, ?, ?, ?);",
+                            (seq, shipped_at, str(self.backend.path)))
+                dst.commit()
+            finally:
+                src.close()
+                dst.close()
+
+            for target in self.targets:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp = target.with_name(target.name + ".tmp")
+                shutil.copyfile(staging, tmp)
+                os.replace(tmp, target)
+                _write_heartbeat(target, seq, shipped_at)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            staging.unlink(missing_ok=True)
+
+        self._last_state = state
+        self.stats["ships"] += 1
+        self.stats["last_seq"] = seq
+        self.stats["last_ship_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return True
+
+    def run(self, interval_s: float) -> None:
+        """Ship every interval_s seconds until stop(); errors are counted and retried."""
+        while True:
+            try:
+                self.ship_once()
+            except (OSError, sqlite3.Error) as e:
+                print(f"ship failed: {e}", file=sys.stderr)
+            if self._stop.wait(interval_s):
+                return
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _write_heartbeat(target: Path, seq: Optional[int], checked_at: float) -> None:
+    if seq is None:
+        return
+    hb = target.with_name(target.name + ".heartbeat")
+    tmp = hb.with_name(hb.name + ".tmp")
+    tmp.write_text(f"{seq} {checked_at:.3f}\n", encoding="utf-8")
+    os.replace(tmp, hb)
+
+
+# -----------------------------
+# HTTP
+# -----------------------------
+def _lag_headers(replica: Optional[db.ReplicaBackend]) -> List[tuple]:
+    if replica is None:
+        return [(b"x-replication-lag", b"0")]
+    state = replica.state()
+    return [
+        (b"x-replica", replica.path.name.encode("latin-1")),
+        (b"x-replication-lag", str(state["lag_s"]).encode("latin-1")),
+        (b"x-replication-seq", str(state["seq"]).encode("latin-1")),
+    ]
+
+
+class ReplicationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        backend = db.get_backend()
+        if getattr(backend, "read_only", False):
+            # this whole instance serves a replica
+            if scope["method"] not in READ_METHODS and scope["path"] not in READ_POSTS:
+                response = JSONResponse({"detail": "read-only replica; send writes to the primary"}, status_code=405)
+                return await response(scope, receive, send)
+            return await self.app(scope, receive, _with_headers(send, _lag_headers(backend)))
+
+        raw = dict(scope["headers"]).get(STALENESS_HEADER)
+        if raw is None or (scope["method"] != "GET" and scope["path"] not in READ_POSTS) or not db.read_replicas():
+            return await self.app(scope, receive, send)
+        try:
+            max_staleness = float(raw.decode("latin-1"))
+        except ValueError:
+            return await JSONResponse({"detail": "X-Max-Staleness must be a number of seconds"},
+                                      status_code=400)(scope, receive, send)
+        with db.allow_stale(max_staleness) as replica:
+            await self.app(scope, receive, _with_headers(send, _lag_headers(replica)))
+
+
+def _with_headers(send, headers: List[tuple]):
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": list(message.get("headers", [])) + headers}
+        await send(message)
+    return wrapped
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ship the SQLite database to read replica files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ship", help="copy the primary to the replica files, once or every --interval seconds")
+    p.add_argument("replicas", nargs="+", type=Path)
+    p.add_argument("--interval", type=float, default=2.0)
+    p.add_argument("--once", action="store_true")
+    p = sub.add_parser("status", help="show how far behind a replica file is")
+    p.add_argument("replicas", nargs="+", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for path in args.replicas:
+            try:
+                state = db.ReplicaBackend(path).state()
+            except (OSError, sqlite3.Error) as e:
+                print(f"{path}: not a shipped replica ({e})")
+                continue
+            print(f"{path}: seq {state['seq']}, lag {state['lag_s']}s")
+        return
+
+    if args.interval <= 0:
+        parser.error("--interval must be positive")
+    try:
+        shipper = ReplicaShipper(args.replicas)
+    except (ValueError, RuntimeError) as e:
+        sys.exit(str(e))
+    if args.once:
+        shipper.ship_once(force=True)
+        print(f"shipped seq {shipper.stats['last_seq']} to {len(args.replicas)} replica(s) "
+              f"in {shipper.stats['last_ship_ms']} ms")
+        return
+    print(f"shipping to {', '.join(map(str, args.replicas))} every {args.interval}s (Ctrl+C to stop)")
+    try:
+        shipper.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,175 @@
-from typing import Any, Optional
-from db import get_conn
+import json
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from db import DB_ERRORS, current_tenant, get_backend, get_conn, iter_query, write_conn
+from models import sqlite_row
+
+# Row shapes recorded in change_log. They match what the list endpoints return
+# so a client can apply a change straight onto its cached list.
+_CHANGE_ROW_SQL = {
+    "card_set": "SELECT * FROM card_set WHERE set_id = ?;",
+    "card": """
+        SELECT c.*, s.set_code, s.set_name
+        FROM card c
+        JOIN card_set s ON s.set_id = c.set_id
+        WHERE c.card_id = ?;
+    """,
+    "card_condition": "SELECT * FROM card_condition WHERE condition_id = ?;",
+    "inventory_item": """
+        SELECT i.*, c.card_name, c.card_number, c.rarity, s.set_code, s.set_name, cc.condition_code
+        FROM inventory_item i
+        JOIN card c ON c.card_id = i.card_id
+        JOIN card_set s ON s.set_id = c.set_id
+        JOIN card_condition cc ON cc.condition_id = i.condition_id
+        WHERE i.item_id = ?;
+    """,
+}
+
+
+def log_change(conn, table_name: str, row_id: int, op: str) -> None:
+    """Append one change_log row on the caller's connection (same transaction)."""
+    row_json = None
+    if op != "delete":
+        row = conn.execute(_CHANGE_ROW_SQL[table_name], (row_id,)).fetchone()
+        row_json = json.dumps(dict(row)) if row is not None else None
+    conn.execute(
+        "INSERT INTO change_log(table_name, row_id, op, row_json) VALUES (?,?,?,?);",
+        (table_name, row_id, op, row_json),
+    )
+
+
+def log_changes(conn, table_name: str, row_ids: Iterable[int], op: str) -> None:
+    for row_id in row_ids:
+        log_change(conn, table_name, row_id, op)
+
+
+def _ids(conn, sql: str, params) -> list:
+    # sql selects a single column aliased AS id
+    return [r["id"] for r in conn.execute(sql, params).fetchall()]
+
+
+_IN_CHUNK = 500
+
+
+def _chunks(ids: List[int]):
+    for i in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[i : i + _IN_CHUNK]
+        yield chunk, ",".join("?" * len(chunk))
+
+
+# -----------------------
+# set completion bitmaps (kept current inside the writing transaction)
+# -----------------------
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def bitmap_has(bitmap: bytes, position: int) -> bool:
+    return bool(bitmap[position // 8] >> (position % 8) & 1)
+
+
+def _catalog_card_head(conn) -> int:
+    # a tenant shard's bitmaps are as current as the attached catalog's card changes at build time
+    row = conn.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM catalog.change_log WHERE table_name = 'card';").fetchone()
+    return max(int(row["seq"]), ChangeLogRepository._floor(conn, "catalog."))
+
+
+def completion_build(conn, set_id: int) -> None:
+    """(Re)number a set's cards by card_number and recompute its bitmap from inventory."""
+    cards = conn.execute(
+        """
+        SELECT c.card_id,
+               EXISTS (SELECT 1 FROM inventory_item i WHERE i.card_id = c.card_id AND i.quantity > 0) AS owned
+        FROM card c
+        WHERE c.set_id = ?
+        ORDER BY c.card_number, c.card_id;
+        """,
+        (set_id,),
+    ).fetchall()
+    bitmap = bytearray((len(cards) + 7) // 8)
+    for position, card in enumerate(cards):
+        if card["owned"]:
+            bitmap[position // 8] |= 1 << (position % 8)
+
+    conn.execute("DELETE FROM set_card_position WHERE set_id = ?;", (set_id,))
+    conn.executemany(
+        "INSERT INTO set_card_position (card_id, set_id, position) VALUES (?, ?, ?);",
+        [(card["card_id"], set_id, position) for position, card in enumerate(cards)],
+    )
+    row = (set_id, len(cards), sum(1 for c in cards if c["owned"]), bytes(bitmap), _now())
+    if current_tenant() is not None:
+        conn.execute(
+            """
+            INSERT INTO set_completion (set_id, total, owned, bitmap, updated_at, catalog_seq) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (set_id) DO UPDATE SET
+              total = excluded.total, owned = excluded.owned, bitmap = excluded.bitmap, updated_at = excluded.updated_at,
+              catalog_seq = excluded.catalog_seq;
+            """,
+            row + (_catalog_card_head(conn),),
+        )
+        return
+    conn.execute(
+        """
+        INSERT INTO set_completion (set_id, total, owned, bitmap, updated_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (set_id) DO UPDATE SET
+          total = excluded.total, owned = excluded.owned, bitmap = excluded.bitmap, updated_at = excluded.updated_at;
+        """,
+        row,
+    )
+
+
+def completion_refresh_sets(conn, set_ids: Iterable[Optional[int]]) -> None:
+    """After card writes (positions may shift): rebuild the sets that are already tracked."""
+    for set_id in {s for s in set_ids if s is not None}:
+        if conn.execute("SELECT 1 FROM set_completion WHERE set_id = ?;", (set_id,)).fetchone():
+            completion_build(conn, set_id)
+
+
+def completion_touch_cards(conn, card_ids: Iterable[Optional[int]]) -> None:
+    """After inventory writes: flip each card's owned bit if it changed. Untracked sets are skipped."""
+    for card_id in {c for c in card_ids if c is not None}:
+        pos = conn.execute(
+            """
+            SELECT p.set_id, p.position, sc.bitmap
+            FROM set_card_position p
+            JOIN set_completion sc ON sc.set_id = p.set_id
+            WHERE p.card_id = ?;
+            """,
+            (card_id,),
+        ).fetchone()
+        if pos is None:
+            continue
+        owned = bool(conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM inventory_item WHERE card_id = ? AND quantity > 0) AS owned;", (card_id,)
+        ).fetchone()["owned"])
+        bitmap = bytearray(pos["bitmap"])
+        if bitmap_has(bitmap, pos["position"]) == owned:
+            continue
+        bitmap[pos["position"] // 8] ^= 1 << (pos["position"] % 8)
+        conn.execute(
+            "UPDATE set_completion SET bitmap = ?, owned = owned + ?, updated_at = ? WHERE set_id = ?;",
+            (bytes(bitmap), 1 if owned else -1, _now(), pos["set_id"]),
+        )
 
 # -----------------------
 # card_set CRUD
 # -----------------------
 class SetRepository:
     def create(self, set_code: str, set_name: str, release_date: str, era: str) -> int:
-        with get_conn() as conn:
+        with write_conn() as conn:
             cur = conn.execute(
                 """
                 INSERT INTO card_set(set_code, set_name, release_date, era)
                 VALUES (?,?,?,?)
+                RETURNING set_id
                 """,
                 (set_code, set_name, release_date, era),
             )
-            return int(cur.lastrowid)
+            set_id = int(cur.fetchone()["set_id"])
+            log_change(conn, "card_set", set_id, "insert")
+            return set_id
 
     def get_all(self):
         with get_conn() as conn:
@@ -31,12 +186,30 @@ class SetRepository:
             return
         set_clause = ", ".join([f"{k} = ?" for k, _ in updates])
         params = [v for _, v in updates] + [set_id]
-        with get_conn() as conn:
-            conn.execute(f"UPDATE card_set SET {set_clause} WHERE set_id = ?;", params)
+        with write_conn() as conn:
+            cur = conn.execute(f"UPDATE card_set SET {set_clause} WHERE set_id = ?;", params)
+            if cur.rowcount == 0:
+                return
+            log_change(conn, "card_set", set_id, "update")
+            # cards and inventory rows carry set_code/set_name in their list shape
+            if any(k in ("set_code", "set_name", "release_date") for k, _ in updates):
+                log_changes(conn, "card", _ids(conn, "SELECT card_id AS id FROM card WHERE set_id = ?;", (set_id,)), "update")
+                log_changes(
+                    conn,
+                    "inventory_item",
+                    _ids(
+                        conn,
+                        "SELECT i.item_id AS id FROM inventory_item i JOIN card c ON c.card_id = i.card_id WHERE c.set_id = ?;",
+                        (set_id,),
+                    ),
+                    "update",
+                )
 
     def delete(self, set_id: int) -> None:
-        with get_conn() as conn:
-            conn.execute("DELETE FROM card_set WHERE set_id = ?;", (set_id,))
+        with write_conn() as conn:
+            cur = conn.execute("DELETE FROM card_set WHERE set_id = ?;", (set_id,))
+            if cur.rowcount:
+                log_change(conn, "card_set", set_id, "delete")
 
 
 # -----------------------
@@ -44,15 +217,19 @@ class SetRepository:
 # -----------------------
 class CardRepository:
     def create(self, set_id: int, card_number: str, card_name: str, rarity: str, card_type: str) -> int:
-        with get_conn() as conn:
+        with write_conn() as conn:
             cur = conn.execute(
                 """
                 INSERT INTO card(set_id, card_number, card_name, rarity, card_type)
                 VALUES (?,?,?,?,?)
+                RETURNING card_id
                 """,
                 (set_id, card_number, card_name, rarity, card_type),
             )
-            return int(cur.lastrowid)
+            card_id = int(cur.fetchone()["card_id"])
+            log_change(conn, "card", card_id, "insert")
+            completion_refresh_sets(conn, [set_id])
+            return card_id
 
     def get_all(self):
         with get_conn() as conn:
@@ -69,6 +246,23 @@ class CardRepository:
         with get_conn() as conn:
             return conn.execute("SELECT * FROM card WHERE card_id = ?;", (card_id,)).fetchone()
 
+    def get_by_ids(self, card_ids: List[int]):
+        """Cards in the list shape (with set_code/set_name), one IN query per 500 ids, by card_id."""
+        rows = []
+        with get_conn() as conn:
+            for chunk, marks in _chunks(card_ids):
+                rows += conn.execute(
+                    f"""
+                    SELECT c.*, s.set_code, s.set_name
+                    FROM card c
+                    JOIN card_set s ON s.set_id = c.set_id
+                    WHERE c.card_id IN ({marks})
+                    ORDER BY c.card_id;
+                    """,
+                    chunk,
+                ).fetchall()
+        return rows
+
     def get_by_set(self, set_id: int):
         with get_conn() as conn:
             return conn.execute(
@@ -76,6 +270,21 @@ class CardRepository:
                 (set_id,),
             ).fetchall()
 
+    def iter_all(self, batch_size: int = 1000, set_id: Optional[int] = None):
+        """get_all() / get_by_set() rows streamed from the cursor in batches (constant memory)."""
+        if set_id is not None:
+            return iter_query("SELECT * FROM card WHERE set_id = ? ORDER BY card_number;", (set_id,), batch_size)
+        return iter_query(
+            """
+            SELECT c.*, s.set_code, s.set_name
+            FROM card c
+            JOIN card_set s ON s.set_id = c.set_id
+            ORDER BY s.release_date, c.card_number;
+            """,
+            (),
+            batch_size,
+        )
+
     def update(self, card_id: int, **fields: Any) -> None:
         allowed = {"set_id", "card_number", "card_name", "rarity", "card_type"}
         updates = [(k, v) for k, v in fields.items() if k in allowed]
@@ -83,12 +292,97 @@ class CardRepository:
             return
         set_clause = ", ".join([f"{k} = ?" for k, _ in updates])
         params = [v for _, v in updates] + [card_id]
+        with write_conn() as conn:
+            old_set = _ids(conn, "SELECT set_id AS id FROM card WHERE card_id = ?;", (card_id,))
+            cur = conn.execute(f"UPDATE card SET {set_clause} WHERE card_id = ?;", params)
+            if cur.rowcount == 0:
+                return
+            log_change(conn, "card", card_id, "update")
+            log_changes(
+                conn,
+                "inventory_item",
+                _ids(conn, "SELECT item_id AS id FROM inventory_item WHERE card_id = ?;", (card_id,)),
+                "update",
+            )
+            # edited by hand: the next catalog sync should compare against the row itself
+            conn.execute("DELETE FROM card_content_hash WHERE card_id = ?;", (card_id,))
+            if {"set_id", "card_number"} & {k for k, _ in updates}:
+                completion_refresh_sets(conn, old_set + _ids(conn, "SELECT set_id AS id FROM card WHERE card_id = ?;", (card_id,)))
+
+    def get_catalog_state(self):
+        """Every card with its stored content hash (NULL if never synced or edited since)."""
         with get_conn() as conn:
-            conn.execute(f"UPDATE card SET {set_clause} WHERE card_id = ?;", params)
+            return conn.execute(
+                """
+                SELECT c.card_id, c.set_id, c.card_number, c.card_name, c.rarity, c.card_type, h.content_hash
+                FROM card c
+                LEFT JOIN card_content_hash h ON h.card_id = c.card_id;
+                """
+            ).fetchall()
+
+    def upsert_batch(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Catalog sync: write a batch of cards in one transaction with
+        INSERT ... ON CONFLICT (set_id, card_number) DO UPDATE, store each
+        row's content_hash and log the changes like create/update do.
+        Rows carry card_id=None when they are new to the catalog.
+        """
+        synced_at = _now()
+        with write_conn() as conn:
+            for r in rows:
+                card_id = int(conn.execute(
+                    """
+                    INSERT INTO card (set_id, card_number, card_name, rarity, card_type)
+                    VALUES (?,?,?,?,?)
+                    ON CONFLICT (set_id, card_number) DO UPDATE SET
+                      card_name = excluded.card_name, rarity = excluded.rarity, card_type = excluded.card_type
+                    RETURNING card_id;
+                    """,
+                    (r["set_id"], r["card_number"], r["card_name"], r["rarity"], r["card_type"]),
+                ).fetchone()["card_id"])
+                conn.execute(
+                    """
+                    INSERT INTO card_content_hash (card_id, content_hash, synced_at) VALUES (?,?,?)
+                    ON CONFLICT (card_id) DO UPDATE SET content_hash = excluded.content_hash, synced_at = excluded.synced_at;
+                    """,
+                    (card_id, r["content_hash"], synced_at),
+                )
+                if r.get("card_id") is None:
+                    log_change(conn, "card", card_id, "insert")
+                else:
+                    log_change(conn, "card", card_id, "update")
+                    log_changes(
+                        conn,
+                        "inventory_item",
+                        _ids(conn, "SELECT item_id AS id FROM inventory_item WHERE card_id = ?;", (card_id,)),
+                        "update",
+                    )
+            # new cards shift positions; renames don't, but a rebuild per touched set is cheap
+            completion_refresh_sets(conn, {r["set_id"] for r in rows if r.get("card_id") is None})
+        return len(rows)
+
+    def store_hashes(self, hashes: List[Tuple[int, str]]) -> None:
+        """Record hashes for unchanged cards that had none yet (first sync over seeded rows)."""
+        synced_at = _now()
+        with write_conn() as conn:
+            conn.executemany(
+                """
+                INSERT INTO card_content_hash (card_id, content_hash, synced_at) VALUES (?,?,?)
+                ON CONFLICT (card_id) DO UPDATE SET content_hash = excluded.content_hash, synced_at = excluded.synced_at;
+                """,
+                [(card_id, h, synced_at) for card_id, h in hashes],
+            )
 
     def delete(self, card_id: int) -> None:
-        with get_conn() as conn:
-            conn.execute("DELETE FROM card WHERE card_id = ?;", (card_id,))
+        with write_conn() as conn:
+            # inventory_item rows go with the card (ON DELETE CASCADE); log them too
+            item_ids = _ids(conn, "SELECT item_id AS id FROM inventory_item WHERE card_id = ?;", (card_id,))
+            set_ids = _ids(conn, "SELECT set_id AS id FROM card WHERE card_id = ?;", (card_id,))
+            cur = conn.execute("DELETE FROM card WHERE card_id = ?;", (card_id,))
+            if cur.rowcount:
+                log_changes(conn, "inventory_item", item_ids, "delete")
+                log_change(conn, "card", card_id, "delete")
+                completion_refresh_sets(conn, set_ids)
 
 
 # -----------------------
@@ -96,20 +390,27 @@ class CardRepository:
 # -----------------------
 class ConditionRepository:
     def create(self, condition_code: str, description: str) -> int:
-        with get_conn() as conn:
+        with write_conn() as conn:
             cur = conn.execute(
                 """
                 INSERT INTO card_condition(condition_code, description)
                 VALUES (?,?)
+                RETURNING condition_id
                 """,
                 (condition_code, description),
             )
-            return int(cur.lastrowid)
+            condition_id = int(cur.fetchone()["condition_id"])
+            log_change(conn, "card_condition", condition_id, "insert")
+            return condition_id
 
     def get_all(self):
         with get_conn() as conn:
             return conn.execute("SELECT * FROM card_condition ORDER BY condition_id;").fetchall()
 
+    def get_by_id(self, condition_id: int):
+        with get_conn() as conn:
+            return conn.execute("SELECT * FROM card_condition WHERE condition_id = ?;", (condition_id,)).fetchone()
+
     def update(self, condition_id: int, **fields: Any) -> None:
         allowed = {"condition_code", "description"}
         updates = [(k, v) for k, v in fields.items() if k in allowed]
@@ -117,17 +418,71 @@ class ConditionRepository:
             return
         set_clause = ", ".join([f"{k} = ?" for k, _ in updates])
         params = [v for _, v in updates] + [condition_id]
-        with get_conn() as conn:
-            conn.execute(f"UPDATE card_condition SET {set_clause} WHERE condition_id = ?;", params)
+        with write_conn() as conn:
+            cur = conn.execute(f"UPDATE card_condition SET {set_clause} WHERE condition_id = ?;", params)
+            if cur.rowcount == 0:
+                return
+            log_change(conn, "card_condition", condition_id, "update")
+            if any(k == "condition_code" for k, _ in updates):
+                log_changes(
+                    conn,
+                    "inventory_item",
+                    _ids(conn, "SELECT item_id AS id FROM inventory_item WHERE condition_id = ?;", (condition_id,)),
+                    "update",
+                )
 
     def delete(self, condition_id: int) -> None:
-        with get_conn() as conn:
-            conn.execute("DELETE FROM card_condition WHERE condition_id = ?;", (condition_id,))
+        with write_conn() as conn:
+            cur = conn.execute("DELETE FROM card_condition WHERE condition_id = ?;", (condition_id,))
+            if cur.rowcount:
+                log_change(conn, "card_condition", condition_id, "delete")
 
 
 # -----------------------
 # inventory_item CRUD
 # -----------------------
+INVENTORY_LIST_SQL = """
+    SELECT i.*, c.card_name, c.card_number, c.rarity, s.set_code, s.set_name, cc.condition_code
+    FROM inventory_item i
+    JOIN card c ON c.card_id = i.card_id
+    JOIN card_set s ON s.set_id = c.set_id
+    JOIN card_condition cc ON cc.condition_id = i.condition_id
+"""
+
+ZERO_QTY_POLICIES = ("delete", "archive", "keep")
+
+
+class AdjustmentRejected(Exception):
+    """An adjust would take item_id below zero (quantity is None when the item does not exist)."""
+
+    def __init__(self, item_id: int, quantity: Optional[int]):
+        super().__init__(item_id, quantity)
+        self.item_id = item_id
+        self.quantity = quantity
+
+
+INVENTORY_FIELDS = (
+    "card_id", "condition_id", "is_foil", "is_graded", "graded_company", "grade",
+    "quantity", "purchase_price", "purchase_date", "notes",
+)
+
+
+# rows with the same lot key are the same stock and can be merged (idx_inventory_lot_qty)
+LOT_KEY = ("card_id", "condition_id", "is_foil", "is_graded", "graded_company", "grade")
+# NULL-safe equality on every lot column; params are each value twice
+_LOT_MATCH_SQL = " AND ".join(f"({c} = ? OR ({c} IS NULL AND ? IS NULL))" for c in LOT_KEY)
+# i.<lot key> = k.<lot key>; plain equality on the NOT NULL prefix keeps idx_inventory_lot_qty usable
+_LOT_JOIN_SQL = " AND ".join(
+    f"i.{c} = k.{c}" if c in ("card_id", "condition_id", "is_foil", "is_graded")
+    else f"(i.{c} = k.{c} OR (i.{c} IS NULL AND k.{c} IS NULL))"
+    for c in LOT_KEY
+)
+
+
+def _lot_params(key: Dict[str, Any]) -> List[Any]:
+    return [v for c in LOT_KEY for v in (key.get(c), key.get(c))]
+
+
 class InventoryRepository:
     def create(
         self,
@@ -142,31 +497,61 @@ class InventoryRepository:
         purchase_date: Optional[str] = None,
         notes: Optional[str] = None,
     ) -> int:
-        with get_conn() as conn:
-            cur = conn.execute(
-                """
-                INSERT INTO inventory_item
-                (card_id, condition_id, is_foil, is_graded, graded_company, grade,
-                 quantity, purchase_price, purchase_date, notes)
-                VALUES (?,?,?,?,?,?,?,?,?,?)
-                """,
-                (card_id, condition_id, is_foil, is_graded, graded_company, grade,
-                 quantity, purchase_price, purchase_date, notes),
+        with write_conn() as conn:
+            return self._insert(
+                conn,
+                card_id=card_id, condition_id=condition_id, is_foil=is_foil, is_graded=is_graded,
+                graded_company=graded_company, grade=grade, quantity=quantity,
+                purchase_price=purchase_price, purchase_date=purchase_date, notes=notes,
             )
-            return int(cur.lastrowid)
+
+    def _insert(self, conn, **fields: Any) -> int:
+        values = (
+            fields["card_id"], fields["condition_id"], fields.get("is_foil", 0), fields.get("is_graded", 0),
+            fields.get("graded_company"), fields.get("grade"), fields.get("quantity", 1),
+            fields.get("purchase_price", 0.0), fields.get("purchase_date"), fields.get("notes"),
+        )
+        cur = conn.execute(
+            """
+            INSERT INTO inventory_item
+            (card_id, condition_id, is_foil, is_graded, graded_company, grade,
+             quantity, purchase_price, purchase_date, notes)
+            VALUES (?,?,?,?,?,?,?,?,?,?)
+            RETURNING item_id
+            """,
+            values,
+        )
+        item_id = int(cur.fetchone()["item_id"])
+        log_change(conn, "inventory_item", item_id, "insert")
+        completion_touch_cards(conn, [fields["card_id"]])
+        return item_id
 
     def get_all(self):
         with get_conn() as conn:
-            return conn.execute(
-                """
-                SELECT i.*, c.card_name, c.card_number, c.rarity, s.set_code, s.set_name, cc.condition_code
-                FROM inventory_item i
-                JOIN card c ON c.card_id = i.card_id
-                JOIN card_set s ON s.set_id = c.set_id
-                JOIN card_condition cc ON cc.condition_id = i.condition_id
-                ORDER BY s.release_date, c.card_number;
-                """
-            ).fetchall()
+            return conn.execute(INVENTORY_LIST_SQL + " ORDER BY s.release_date, c.card_number;").fetchall()
+
+    def iter_all(self, batch_size: int = 1000, set_id: Optional[int] = None):
+        """Same rows as get_all() / get_by_set(), streamed from the cursor in batches (constant memory)."""
+        if set_id is not None:
+            return iter_query(INVENTORY_LIST_SQL + " WHERE c.set_id = ? ORDER BY c.card_number;", (set_id,), batch_size)
+        return iter_query(INVENTORY_LIST_SQL + " ORDER BY s.release_date, c.card_number;", (), batch_size)
+
+    def bulk_create(self, items: Iterable[Dict[str, Any]]) -> int:
+        """
+        Bulk load in one transaction (executemany on SQLite, COPY on PostgreSQL).
+        Callers validate rows first; change_log gets one insert per new row.
+        """
+        defaults = {"is_foil": 0, "is_graded": 0, "quantity": 1, "purchase_price": 0.0}
+        rows = (tuple(item.get(f, defaults.get(f)) for f in INVENTORY_FIELDS) for item in items)
+        with write_conn() as conn:
+            before = conn.execute("SELECT COALESCE(MAX(item_id), 0) AS id FROM inventory_item;").fetchone()["id"]
+            get_backend().bulk_insert(conn, "inventory_item", INVENTORY_FIELDS, rows)
+            new_ids = _ids(conn, "SELECT item_id AS id FROM inventory_item WHERE item_id > ? ORDER BY item_id;", (before,))
+            log_changes(conn, "inventory_item", new_ids, "insert")
+            completion_touch_cards(
+                conn, _ids(conn, "SELECT DISTINCT card_id AS id FROM inventory_item WHERE item_id > ?;", (before,))
+            )
+            return len(new_ids)
 
     def get_by_set(self, set_id: int):
         with get_conn() as conn:
@@ -188,19 +573,846 @@ class InventoryRepository:
         with get_conn() as conn:
             return conn.execute("SELECT * FROM inventory_item WHERE item_id = ?;", (item_id,)).fetchone()
 
-    def update(self, item_id: int, **fields: Any) -> None:
-        allowed = {
-            "card_id", "condition_id", "is_foil", "is_graded", "graded_company", "grade",
-            "quantity", "purchase_price", "purchase_date", "notes"
-        }
-        updates = [(k, v) for k, v in fields.items() if k in allowed]
+    def get_page(self, after_id: int, limit: int, set_id: Optional[int] = None, is_graded: Optional[int] = None):
+        """Keyset page in item_id order: up to `limit` items with item_id > after_id."""
+        where, params = ["i.item_id > ?"], [after_id]
+        if set_id is not None:
+            where.append("c.set_id = ?")
+            params.append(set_id)
+        if is_graded is not None:
+            where.append("i.is_graded = ?")
+            params.append(int(is_graded))
+        with get_conn() as conn:
+            return conn.execute(
+                INVENTORY_LIST_SQL + f" WHERE {' AND '.join(where)} ORDER BY i.item_id LIMIT ?;", params + [limit]
+            ).fetchall()
+
+    def get_by_ids(self, item_ids: List[int]):
+        """Items in the list shape, one IN query per 500 ids, by item_id."""
+        rows = []
+        with get_conn() as conn:
+            for chunk, marks in _chunks(item_ids):
+                rows += conn.execute(
+                    INVENTORY_LIST_SQL + f" WHERE i.item_id IN ({marks}) ORDER BY i.item_id;", chunk
+                ).fetchall()
+        return rows
+
+    def update(self, item_id: int, **fields: Any) -> bool:
+        """False if there is no such item, or nothing to update."""
+        if not any(k in INVENTORY_FIELDS for k in fields):
+            return False
+        with write_conn() as conn:
+            return self._update(conn, item_id, **fields)
+
+    def _update(self, conn, item_id: int, **fields: Any) -> bool:
+        updates = [(k, v) for k, v in fields.items() if k in INVENTORY_FIELDS]
         if not updates:
-            return
+            return False
         set_clause = ", ".join([f"{k} = ?" for k, _ in updates])
         params = [v for _, v in updates] + [item_id]
+        card_sql = "SELECT card_id AS id FROM inventory_item WHERE item_id = ?;"
+        keys = {k for k, _ in updates}
+        old_card = _ids(conn, card_sql, (item_id,)) if "card_id" in keys else []
+        cur = conn.execute(f"UPDATE inventory_item SET {set_clause} WHERE item_id = ?;", params)
+        if cur.rowcount:
+            log_change(conn, "inventory_item", item_id, "update")
+            if keys & {"card_id", "quantity"}:
+                completion_touch_cards(conn, old_card + _ids(conn, card_sql, (item_id,)))
+        return cur.rowcount > 0
+
+    def apply_batch(self, creates: List[Dict[str, Any]], updates: List[Tuple[int, Dict[str, Any]]]) -> List[Any]:
+        """
+        Group commit: apply many creates/updates in ONE write transaction.
+        Each op runs under its own savepoint so a bad row fails alone.
+        Returns one result per op (creates first, then updates): the new
+        item_id / True-False for an update, or the exception it raised.
+        """
+        results: List[Any] = []
+        with write_conn() as conn:
+            ops = [(self._insert, (), f) for f in creates] + [(self._update, (i,), f) for i, f in updates]
+            for fn, args, fields in ops:
+                conn.execute("SAVEPOINT write_behind_op;")
+                try:
+                    results.append(fn(conn, *args, **fields))
+                except DB_ERRORS as e:
+                    conn.execute("ROLLBACK TO write_behind_op;")
+                    results.append(e)
+                conn.execute("RELEASE write_behind_op;")
+        return results
+
+    def adjust(self, item_id: int, delta: int, zero_policy: str = "delete") -> Tuple[int, bool]:
+        """
+        Atomically add delta to quantity; see _adjust. Returns (new_quantity, removed).
+        Raises AdjustmentRejected if the item is missing or would go negative.
+        """
+        with write_conn() as conn:
+            return self._adjust(conn, item_id, delta, zero_policy)
+
+    def adjust_many(self, adjustments: List[Tuple[int, int]], zero_policy: str = "delete") -> List[Tuple[int, bool]]:
+        """All-or-nothing: every (item_id, delta) applies in one transaction or none do."""
+        with write_conn() as conn:
+            return [self._adjust(conn, item_id, delta, zero_policy) for item_id, delta in adjustments]
+
+    def _adjust(self, conn, item_id: int, delta: int, zero_policy: str) -> Tuple[int, bool]:
+        # one conditional UPDATE: no read-modify-write, so concurrent sales can't lose updates
+        row = conn.execute(
+            "UPDATE inventory_item SET quantity = quantity + ? WHERE item_id = ? AND quantity + ? >= 0 RETURNING quantity, card_id;",
+            (delta, item_id, delta),
+        ).fetchone()
+        if row is None:
+            current = conn.execute("SELECT quantity FROM inventory_item WHERE item_id = ?;", (item_id,)).fetchone()
+            raise AdjustmentRejected(item_id, current["quantity"] if current else None)
+
+        quantity = int(row["quantity"])
+        if quantity == 0 or quantity == delta:
+            # crossed zero in either direction: the card's owned bit may change
+            completion_touch_cards(conn, [row["card_id"]])
+        if quantity == 0 and zero_policy != "keep":
+            if zero_policy == "archive":
+                cols = "item_id, " + ", ".join(f for f in INVENTORY_FIELDS if f != "quantity")
+                conn.execute(
+                    f"INSERT INTO inventory_archive ({cols}) SELECT {cols} FROM inventory_item WHERE item_id = ?;",
+                    (item_id,),
+                )
+            conn.execute("DELETE FROM inventory_item WHERE item_id = ?;", (item_id,))
+            log_change(conn, "inventory_item", item_id, "delete")
+            return quantity, True
+        log_change(conn, "inventory_item", item_id, "update")
+        return quantity, False
+
+    # -----------------------
+    # lot consolidation
+    # -----------------------
+    def add_to_lot(self, fields: Dict[str, Any]) -> Optional[int]:
+        """
+        On-insert merge: fold a new purchase into the oldest existing row with
+        the same lot key (quantity added, purchase_price weighted by quantity).
+        Returns that item_id, or None if there is no such lot.
+        """
+        key = {c: fields.get(c, 0 if c in ("is_foil", "is_graded") else None) for c in LOT_KEY}
+        quantity, price = fields.get("quantity", 1), fields.get("purchase_price", 0.0)
+        with write_conn() as conn:
+            row = conn.execute(
+                f"SELECT item_id, quantity, purchase_price FROM inventory_item WHERE {_LOT_MATCH_SQL} ORDER BY item_id LIMIT 1;",
+                _lot_params(key),
+            ).fetchone()
+            if row is None:
+                return None
+            item_id, total = row["item_id"], row["quantity"] + quantity
+            new_price = row["purchase_price"]
+            if total:
+                new_price = round((row["purchase_price"] * row["quantity"] + price * quantity) / total, 2)
+            conn.execute(
+                "UPDATE inventory_item SET quantity = ?, purchase_price = ? WHERE item_id = ?;",
+                (total, new_price, item_id),
+            )
+            log_change(conn, "inventory_item", item_id, "update")
+            completion_touch_cards(conn, [key["card_id"]])
+            return item_id
+
+    def find_duplicate_lots(self, limit: int = 500, full: bool = False):
+        """
+        Lot keys held by more than one row, in lot key order. Only the keys of
+        rows inserted or updated since the last complete pass (lot_scan_state,
+        a change_log seq) are probed in idx_inventory_lot_qty. full=True, a
+        first pass, or a mark the change feed has pruned past reads the whole
+        covering index instead (in key order: no row lookups, no sort).
+        """
+        cols = ", ".join(LOT_KEY)
+        with get_conn() as conn:
+            since = conn.execute("SELECT last_seq FROM lot_scan_state WHERE id = 1;").fetchone()["last_seq"]
+            if full or since is None or since < ChangeLogRepository._floor(conn):
+                return conn.execute(
+                    f"""
+                    SELECT {cols}, COUNT(*) AS row_count, SUM(quantity) AS quantity
+                    FROM inventory_item
+                    GROUP BY {cols}
+                    HAVING COUNT(*) > 1
+                    ORDER BY {cols}
+                    LIMIT ?;
+                    """,
+                    (limit,),
+                ).fetchall()
+            return conn.execute(
+                f"""
+                WITH k AS (
+                    SELECT DISTINCT {", ".join("n." + c for c in LOT_KEY)}
+                    FROM change_log l
+                    JOIN inventory_item n ON n.item_id = l.row_id
+                    WHERE l.table_name = 'inventory_item' AND l.seq > ?
+                )
+                SELECT {", ".join("i." + c for c in LOT_KEY)}, COUNT(*) AS row_count, SUM(i.quantity) AS quantity
+                FROM k
+                JOIN inventory_item i ON {_LOT_JOIN_SQL}
+                GROUP BY {", ".join("i." + c for c in LOT_KEY)}
+                HAVING COUNT(*) > 1
+                ORDER BY {", ".join("i." + c for c in LOT_KEY)}
+                LIMIT ?;
+                """,
+                (since, limit),
+            ).fetchall()
+
+    def mark_lots_scanned(self, seq: int) -> None:
+        """Every lot changed up to change_log seq has been consolidated; the next pass starts after it."""
+        with write_conn() as conn:
+            conn.execute(
+                "UPDATE lot_scan_state SET last_seq = CASE WHEN last_seq >= ? THEN last_seq ELSE ? END WHERE id = 1;",
+                (seq, seq),
+            )
+
+    def merge_lot(self, key: Dict[str, Any]) -> Optional[int]:
+        """
+        Merge every row with this lot key into the oldest one: quantities summed,
+        purchase_price weighted by quantity, earliest purchase_date, notes joined.
+        Returns the lot_merge_log merge_id (None if fewer than two rows remain).
+        """
+        with write_conn() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM inventory_item WHERE {_LOT_MATCH_SQL} ORDER BY item_id;", _lot_params(key)
+            ).fetchall()
+            if len(rows) < 2:
+                return None
+            kept, merged = dict(rows[0]), [dict(r) for r in rows[1:]]
+            everything = [kept] + merged
+
+            quantity = sum(r["quantity"] for r in everything)
+            price = kept["purchase_price"]
+            if quantity:
+                price = round(sum(r["purchase_price"] * r["quantity"] for r in everything) / quantity, 2)
+            dates = [r["purchase_date"] for r in everything if r["purchase_date"]]
+            notes = []
+            for r in everything:
+                if r["notes"] and r["notes"] not in notes:
+                    notes.append(r["notes"])
+
+            conn.execute(
+                "UPDATE inventory_item SET quantity = ?, purchase_price = ?, purchase_date = ?, notes = ? WHERE item_id = ?;",
+                (quantity, price, min(dates) if dates else None, "; ".join(notes) or None, kept["item_id"]),
+            )
+            for chunk, marks in _chunks([r["item_id"] for r in merged]):
+                conn.execute(f"DELETE FROM inventory_item WHERE item_id IN ({marks});", chunk)
+            log_changes(conn, "inventory_item", [r["item_id"] for r in merged], "delete")
+            log_change(conn, "inventory_item", kept["item_id"], "update")
+
+            after = dict(conn.execute("SELECT * FROM inventory_item WHERE item_id = ?;", (kept["item_id"],)).fetchone())
+            return int(conn.execute(
+                """
+                INSERT INTO lot_merge_log (kept_item_id, merged_count, kept_before, kept_after, merged_rows, merged_at)
+                VALUES (?,?,?,?,?,?)
+                RETURNING merge_id;
+                """,
+                (kept["item_id"], len(merged), json.dumps(kept), json.dumps(after), json.dumps(merged), _now()),
+            ).fetchone()["merge_id"])
+
+    def get_merges(self, limit: int = 100):
         with get_conn() as conn:
-            conn.execute(f"UPDATE inventory_item SET {set_clause} WHERE item_id = ?;", params)
+            return conn.execute(
+                """
+                SELECT merge_id, kept_item_id, merged_count, kept_before, kept_after, merged_rows, merged_at, undone_at
+                FROM lot_merge_log
+                ORDER BY merge_id DESC
+                LIMIT ?;
+                """,
+                (limit,),
+            ).fetchall()
+
+    def undo_merge(self, merge_id: int) -> Dict[str, Any]:
+        """
+        Split a merged lot back into its original rows (same item_ids).
+        Raises LookupError for an unknown merge_id and ValueError if it was
+        already undone or the kept row changed since (e.g. a sale).
+        """
+        with write_conn() as conn:
+            m = conn.execute("SELECT * FROM lot_merge_log WHERE merge_id = ?;", (merge_id,)).fetchone()
+            if m is None:
+                raise LookupError(merge_id)
+            if m["undone_at"]:
+                raise ValueError(f"merge {merge_id} was already undone")
+            current = conn.execute("SELECT * FROM inventory_item WHERE item_id = ?;", (m["kept_item_id"],)).fetchone()
+            if current is None or dict(current) != json.loads(m["kept_after"]):
+                raise ValueError(f"item_id {m['kept_item_id']} changed since merge {merge_id}; cannot undo")
+            merged = json.loads(m["merged_rows"])
+            ids = [r["item_id"] for r in merged]
+            for chunk, marks in _chunks(ids):
+                taken = _ids(conn, f"SELECT item_id AS id FROM inventory_item WHERE item_id IN ({marks});", chunk)
+                if taken:
+                    raise ValueError(f"item_id(s) {taken} were reused since merge {merge_id}; cannot undo")
+
+            before = json.loads(m["kept_before"])
+            set_clause = ", ".join(f"{f} = ?" for f in INVENTORY_FIELDS)
+            conn.execute(
+                f"UPDATE inventory_item SET {set_clause} WHERE item_id = ?;",
+                [before[f] for f in INVENTORY_FIELDS] + [before["item_id"]],
+            )
+            cols = ("item_id",) + INVENTORY_FIELDS
+            conn.executemany(
+                f"INSERT INTO inventory_item ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))});",
+                [tuple(r[c] for c in cols) for r in merged],
+            )
+            log_change(conn, "inventory_item", before["item_id"], "update")
+            log_changes(conn, "inventory_item", ids, "insert")
+            conn.execute("UPDATE lot_merge_log SET undone_at = ? WHERE merge_id = ?;", (_now(), merge_id))
+            return {"merge_id": merge_id, "kept_item_id": before["item_id"], "restored_item_ids": ids}
 
     def delete(self, item_id: int) -> None:
+        with write_conn() as conn:
+            row = conn.execute("DELETE FROM inventory_item WHERE item_id = ? RETURNING card_id;", (item_id,)).fetchone()
+            if row is not None:
+                log_change(conn, "inventory_item", item_id, "delete")
+                completion_touch_cards(conn, [row["card_id"]])
+
+    def delete_many(self, item_ids: List[int]) -> int:
+        """Delete many items in one transaction (one IN query per 500 ids); returns how many existed."""
+        deleted = []
+        with write_conn() as conn:
+            for chunk, marks in _chunks(item_ids):
+                deleted += conn.execute(
+                    f"DELETE FROM inventory_item WHERE item_id IN ({marks}) RETURNING item_id, card_id;", chunk
+                ).fetchall()
+            log_changes(conn, "inventory_item", [r["item_id"] for r in deleted], "delete")
+            completion_touch_cards(conn, sorted({r["card_id"] for r in deleted}))
+        return len(deleted)
+
+
+# -----------------------
+# set completion (read side)
+# -----------------------
+class CompletionRepository:
+    @staticmethod
+    def _to_build(conn, set_id: Optional[int]) -> List[int]:
+        sql = "SELECT s.set_id AS id FROM card_set s LEFT JOIN set_completion sc ON sc.set_id = s.set_id WHERE "
+        params: List[Any] = []
+        if current_tenant() is not None:
+            # catalog card writes only refresh the main database's bitmaps; a shard catches up here
+            sql += "(sc.set_id IS NULL OR sc.catalog_seq < ?)"
+            params.append(_catalog_card_head(conn))
+        else:
+            sql += "sc.set_id IS NULL"
+        if set_id is not None:
+            sql += " AND s.set_id = ?"
+            params.append(set_id)
+        return _ids(conn, sql + ";", params)
+
+    def build_missing(self, set_id: Optional[int] = None) -> int:
+        """
+        Build bitmaps for sets not tracked yet (all sets, or just set_id); in a
+        tenant shard, also rebuild those built against an older catalog.
+        Returns how many were built.
+        """
         with get_conn() as conn:
-            conn.execute("DELETE FROM inventory_item WHERE item_id = ?;", (item_id,))
+            if not self._to_build(conn, set_id):
+                return 0
+        with write_conn() as conn:
+            todo = self._to_build(conn, set_id)  # re-check under the writer lock
+            for sid in todo:
+                completion_build(conn, sid)
+            return len(todo)
+
+    def get(self, set_id: int):
+        with get_conn() as conn:
+            return conn.execute(
+                """
+                SELECT sc.*, s.set_code, s.set_name
+                FROM set_completion sc
+                JOIN card_set s ON s.set_id = sc.set_id
+                WHERE sc.set_id = ?;
+                """,
+                (set_id,),
+            ).fetchone()
+
+    def get_positions(self, set_id: int):
+        with get_conn() as conn:
+            return conn.execute(
+                """
+                SELECT p.position, c.card_id, c.card_number, c.card_name, c.rarity
+                FROM set_card_position p
+                JOIN card c ON c.card_id = p.card_id
+                WHERE p.set_id = ?
+                ORDER BY p.position;
+                """,
+                (set_id,),
+            ).fetchall()
+
+    def leaderboard(self, limit: int = 50):
+        with get_conn() as conn:
+            return conn.execute(
+                """
+                SELECT sc.set_id, s.set_code, s.set_name, sc.total, sc.owned,
+                       CASE WHEN sc.total = 0 THEN 0.0 ELSE ROUND(100.0 * sc.owned / sc.total, 1) END AS percent
+                FROM set_completion sc
+                JOIN card_set s ON s.set_id = sc.set_id
+                ORDER BY percent DESC, sc.owned DESC, s.release_date
+                LIMIT ?;
+                """,
+                (limit,),
+            ).fetchall()
+
+
+# -----------------------
+# sales ledger (one table per month)
+# -----------------------
+_SALE_PARTITION_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+      sale_id        {id_column},
+      sold_at        TEXT NOT NULL,
+      item_id        INTEGER NOT NULL,
+      quantity       INTEGER NOT NULL,
+      sale_price     REAL NOT NULL,
+      purchase_price REAL NOT NULL,
+      card_id        INTEGER NOT NULL,
+      card_name      TEXT NOT NULL,
+      card_number    TEXT NOT NULL,
+      rarity         TEXT,
+      set_code       TEXT NOT NULL,
+      set_name       TEXT NOT NULL,
+      condition_id   INTEGER NOT NULL,
+      condition_code TEXT NOT NULL,
+      is_foil        INTEGER NOT NULL,
+      is_graded      INTEGER NOT NULL,
+      graded_company TEXT,
+      grade          REAL,
+      notes          TEXT
+    );
+"""
+
+# card/item snapshot copied into the sale row (no foreign keys: it outlives the item)
+_SALE_SNAPSHOT_COLUMNS = (
+    "card_id", "card_name", "card_number", "rarity", "set_code", "set_name",
+    "condition_id", "condition_code", "is_foil", "is_graded", "graded_company", "grade",
+)
+
+_ROLLUP_UPSERT_SQL = """
+    INSERT INTO sale_rollup (period_type, period, sales_count, units, revenue, cost)
+    VALUES (?, ?, 1, ?, ?, ?)
+    ON CONFLICT (period_type, period) DO UPDATE SET
+      sales_count = sale_rollup.sales_count + 1,
+      units = sale_rollup.units + excluded.units,
+      revenue = sale_rollup.revenue + excluded.revenue,
+      cost = sale_rollup.cost + excluded.cost;
+"""
+
+
+def sale_table(month: str) -> str:
+    """'2026-10' -> 'sale_202610' (month must already be validated as YYYY-MM)."""
+    return "sale_" + month.replace("-", "")
+
+
+class SaleRepository:
+    def __init__(self, inv_repo: Optional["InventoryRepository"] = None):
+        self.inv_repo = inv_repo or InventoryRepository()
+
+    def _partition(self, conn, month: str) -> str:
+        row = conn.execute(
+            "SELECT table_name, archived_path FROM sale_partition WHERE month = ?;", (month,)
+        ).fetchone()
+        if row is not None:
+            if row["archived_path"]:
+                raise ValueError(f"sales for {month} are archived")
+            return row["table_name"]
+        table = sale_table(month)
+        id_column = "INTEGER PRIMARY KEY" if get_backend().name == "sqlite" else "INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY"
+        conn.execute(_SALE_PARTITION_DDL.format(table=table, id_column=id_column))
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_sold_at ON {table}(sold_at);")
+        conn.execute("INSERT INTO sale_partition(month, table_name) VALUES (?, ?);", (month, table))
+        return table
+
+    def record(
+        self, item_id: int, quantity: int, sale_price: float, sold_at: str, notes: Optional[str] = None,
+        zero_policy: str = "delete",
+    ) -> Dict[str, Any]:
+        """
+        One transaction: snapshot the item, decrement it (InventoryRepository._adjust,
+        raises AdjustmentRejected), append the sale to its month table and bump
+        the day + month rollups. sold_at is ISO 'YYYY-MM-DD[ HH:MM:SS]'.
+        """
+        month, day = sold_at[:7], sold_at[:10]
+        with write_conn() as conn:
+            item = conn.execute(INVENTORY_LIST_SQL + " WHERE i.item_id = ?;", (item_id,)).fetchone()
+            if item is None:
+                raise AdjustmentRejected(item_id, None)
+            self.inv_repo._adjust(conn, item_id, -quantity, zero_policy)
+
+            table = self._partition(conn, month)
+            cols = ("sold_at", "item_id", "quantity", "sale_price", "purchase_price", "notes") + _SALE_SNAPSHOT_COLUMNS
+            values = (sold_at, item_id, quantity, sale_price, item["purchase_price"], notes) + tuple(
+                item[c] for c in _SALE_SNAPSHOT_COLUMNS
+            )
+            row = conn.execute(
+                f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) RETURNING *;",
+                values,
+            ).fetchone()
+
+            revenue, cost = sale_price * quantity, item["purchase_price"] * quantity
+            for period_type, period in (("day", day), ("month", month)):
+                conn.execute(_ROLLUP_UPSERT_SQL, (period_type, period, quantity, revenue, cost))
+            return {"month": month, **dict(row)}
+
+    def summary(self, period_type: str, start: Optional[str] = None, end: Optional[str] = None):
+        """Rollup rows for period_type between start and end (inclusive, same format as period)."""
+        sql = "SELECT period, sales_count, units, revenue, cost, revenue - cost AS profit FROM sale_rollup WHERE period_type = ?"
+        params: List[Any] = [period_type]
+        if start:
+            sql += " AND period >= ?"
+            params.append(start)
+        if end:
+            sql += " AND period <= ?"
+            params.append(end)
+        with get_conn() as conn:
+            return conn.execute(sql + " ORDER BY period;", params).fetchall()
+
+    def partitions(self):
+        with get_conn() as conn:
+            return conn.execute(
+                """
+                SELECT p.month, p.table_name, p.archived_path, p.archived_at,
+                       r.sales_count, r.units, r.revenue
+                FROM sale_partition p
+                LEFT JOIN sale_rollup r ON r.period_type = 'month' AND r.period = p.month
+                ORDER BY p.month;
+                """
+            ).fetchall()
+
+    def get_month(self, month: str):
+        """
+        Every sale in a month, from the live table or its archive file.
+        Raises FileNotFoundError if the month's archive file is gone.
+        """
+        with get_conn() as conn:
+            part = conn.execute("SELECT * FROM sale_partition WHERE month = ?;", (month,)).fetchone()
+            if part is None:
+                return []
+            if not part["archived_path"]:
+                return conn.execute(f"SELECT * FROM {part['table_name']} ORDER BY sold_at, sale_id;").fetchall()
+        path = Path(part["archived_path"])
+        if not path.is_file():
+            raise FileNotFoundError(f"sales for {month} were archived to {path}, which is missing")
+        archive = sqlite3.connect(path.resolve().as_uri() + "?mode=ro", uri=True)
+        archive.row_factory = sqlite_row
+        try:
+            return archive.execute(f"SELECT * FROM {part['table_name']} ORDER BY sold_at, sale_id;").fetchall()
+        finally:
+            archive.close()
+
+    def archive_month(self, month: str, archive_dir: Path) -> str:
+        """
+        Compact a month into its own SQLite file (archive_dir/sale_YYYYMM.db) and
+        drop the live table. Rollups stay in the main database, so summaries
+        are unchanged. SQLite backend only.
+        """
+        backend = get_backend()
+        if backend.name != "sqlite":
+            raise RuntimeError("archiving sales months is only supported on the SQLite backend")
+        with get_conn() as conn:
+            part = conn.execute("SELECT * FROM sale_partition WHERE month = ?;", (month,)).fetchone()
+        if part is None:
+            raise LookupError(f"no sales recorded for {month}")
+        if part["archived_path"]:
+            return part["archived_path"]
+
+        table = part["table_name"]
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        target = archive_dir / f"{table}.db"
+        tmp = target.with_suffix(".db.tmp")
+        tmp.unlink(missing_ok=True)
+
+        # copy first (ATTACH can't run inside the write transaction), then verify + drop under the writer lock
+        out = sqlite3.connect(str(tmp))
+        try:
+            out.execute("ATTACH DATABASE ? AS live;", (str(backend.path),))
+            out.execute(f"CREATE TABLE {table} AS SELECT * FROM live.{table};")
+            copied = out.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+            out.commit()
+            out.execute("DETACH DATABASE live;")
+        finally:
+            out.close()
+
+        with write_conn() as conn:
+            live = conn.execute(f"SELECT COUNT(*) AS n FROM {table};").fetchone()["n"]
+            if live != copied:
+                tmp.unlink(missing_ok=True)
+                raise RuntimeError(f"{table} changed while archiving ({copied} copied, {live} now); retry")
+            tmp.replace(target)
+            conn.execute(
+                "UPDATE sale_partition SET archived_path = ?, archived_at = ? WHERE month = ?;",
+                (str(target), _now(), month),
+            )
+            conn.execute(f"DROP TABLE {table};")
+        return str(target)
+
+
+# -----------------------
+# want lists + matching
+# -----------------------
+CONDITION_ORDER = ("NM", "LP", "MP", "HP", "DMG")  # best -> worst (ck_condition_code)
+WANT_ENTRY_FIELDS = ("set_code", "card_number", "card_name", "quantity", "min_condition", "graded", "min_grade")
+REMATCH_FULL_THRESHOLD = 5000  # more changes than this since the last match: rematch everything
+MATCH_TABLES = ("card", "inventory_item")  # the only change_log tables that can change a match
+
+
+def _condition_rank(column: str) -> str:
+    return "CASE {0} ".format(column) + " ".join(
+        f"WHEN '{code}' THEN {rank}" for rank, code in enumerate(CONDITION_ORDER, 1)
+    ) + " END"
+
+
+# Resolve entries to card_ids: set_code + card_number through the card_set /
+# uq_card_per_set indexes, or card_name (any printing, or within set_code if
+# given) through idx_card_name_lower. {entry_filter} restricts which entries.
+_WANTED_CARDS_SQL = """
+    SELECT e.entry_id, e.want_list_id, c.card_id
+    FROM want_list_entry e
+    JOIN card_set s ON s.set_code = e.set_code
+    JOIN card c ON c.set_id = s.set_id AND c.card_number = e.card_number
+    WHERE e.card_number IS NOT NULL AND {entry_filter}
+    UNION
+    SELECT e.entry_id, e.want_list_id, c.card_id
+    FROM want_list_entry e
+    JOIN card c ON lower(c.card_name) = lower(e.card_name)
+    WHERE e.card_number IS NULL
+      AND (e.set_code IS NULL OR c.set_id = (SELECT set_id FROM card_set WHERE set_code = e.set_code))
+      AND {entry_filter}
+"""
+
+# One set-based pass: every wanted card joined to inventory that satisfies the
+# entry's condition floor and graded preference.
+_MATCH_INSERT_SQL = f"""
+    WITH wanted AS ({_WANTED_CARDS_SQL})
+    INSERT INTO want_list_match (entry_id, item_id, want_list_id, card_id)
+    SELECT w.entry_id, i.item_id, w.want_list_id, w.card_id
+    FROM wanted w
+    JOIN want_list_entry e ON e.entry_id = w.entry_id
+    JOIN inventory_item i ON i.card_id = w.card_id
+    JOIN card_condition cc ON cc.condition_id = i.condition_id
+    WHERE i.quantity > 0
+      AND {_condition_rank("cc.condition_code")} <= {_condition_rank("e.min_condition")}
+      AND (e.graded = 'any' OR (e.graded = 'graded') = (i.is_graded = 1))
+      AND (e.min_grade IS NULL OR (i.is_graded = 1 AND i.grade >= e.min_grade));
+"""
+
+
+class WantListRepository:
+    def create(self, customer: str, notes: Optional[str], entries: List[Dict[str, Any]]) -> int:
+        """Store a want list and match it against current inventory (one transaction)."""
+        cols = ", ".join(WANT_ENTRY_FIELDS)
+        with write_conn() as conn:
+            want_list_id = int(
+                conn.execute(
+                    "INSERT INTO want_list (customer, notes) VALUES (?, ?) RETURNING want_list_id;", (customer, notes)
+                ).fetchone()["want_list_id"]
+            )
+            for entry in entries:
+                conn.execute(
+                    f"INSERT INTO want_list_entry (want_list_id, {cols}) VALUES (?, {', '.join('?' * len(WANT_ENTRY_FIELDS))});",
+                    (want_list_id,) + tuple(entry.get(f) for f in WANT_ENTRY_FIELDS),
+                )
+            self._match(conn, "e.want_list_id = ?", [want_list_id])
+            return want_list_id
+
+    def get_all(self):
+        with get_conn() as conn:
+            return conn.execute(
+                """
+                SELECT w.*,
+                       (SELECT COUNT(*) FROM want_list_entry e WHERE e.want_list_id = w.want_list_id) AS entry_count,
+                       (SELECT COUNT(DISTINCT m.entry_id) FROM want_list_match m WHERE m.want_list_id = w.want_list_id) AS matched_entries
+                FROM want_list w
+                ORDER BY w.want_list_id;
+                """
+            ).fetchall()
+
+    def get_by_id(self, want_list_id: int):
+        with get_conn() as conn:
+            return conn.execute("SELECT * FROM want_list WHERE want_list_id = ?;", (want_list_id,)).fetchone()
+
+    def get_entries(self, want_list_id: int):
+        with get_conn() as conn:
+            return conn.execute(
+                "SELECT * FROM want_list_entry WHERE want_list_id = ? ORDER BY entry_id;", (want_list_id,)
+            ).fetchall()
+
+    def get_matches(self, want_list_id: int):
+        """Stored matches joined to live inventory (quantity/price as of now), best condition then cheapest first."""
+        with get_conn() as conn:
+            return conn.execute(
+                f"""
+                SELECT m.entry_id, i.item_id, i.quantity AS available, i.purchase_price AS price,
+                       cc.condition_code, i.is_foil, i.is_graded, i.graded_company, i.grade,
+                       c.card_id, c.card_name, c.card_number, s.set_code
+                FROM want_list_match m
+                JOIN inventory_item i ON i.item_id = m.item_id
+                JOIN card c ON c.card_id = i.card_id
+                JOIN card_set s ON s.set_id = c.set_id
+                JOIN card_condition cc ON cc.condition_id = i.condition_id
+                WHERE m.want_list_id = ?
+                ORDER BY m.entry_id, {_condition_rank("cc.condition_code")}, i.purchase_price;
+                """,
+                (want_list_id,),
+            ).fetchall()
+
+    def delete(self, want_list_id: int) -> None:
+        with write_conn() as conn:
+            conn.execute("DELETE FROM want_list_match WHERE want_list_id = ?;", (want_list_id,))
+            conn.execute("DELETE FROM want_list_entry WHERE want_list_id = ?;", (want_list_id,))
+            conn.execute("DELETE FROM want_list WHERE want_list_id = ?;", (want_list_id,))
+
+    def _match(self, conn, entry_filter: str, params: List[Any]) -> None:
+        conn.execute(_MATCH_INSERT_SQL.format(entry_filter=entry_filter), params + params)
+
+    @staticmethod
+    def _match_head(conn) -> int:
+        # one idx_change_log_table_seq lookup per table; never below the floor (a pruned or restored feed)
+        heads = " UNION ALL ".join(
+            "SELECT COALESCE(MAX(seq), 0) AS seq FROM change_log WHERE table_name = ?" for _ in MATCH_TABLES
+        )
+        row = conn.execute(f"SELECT MAX(seq) AS seq FROM ({heads});", MATCH_TABLES).fetchone()
+        return max(int(row["seq"]), ChangeLogRepository._floor(conn))
+
+    def match_state(self) -> Tuple[int, int, bool]:
+        """
+        (change_log seq the stored matches reflect, latest card / inventory_item
+        change, whether any want list entry exists). Read-only.
+        """
+        with get_conn() as conn:
+            last = conn.execute("SELECT last_seq FROM want_match_state WHERE id = 1;").fetchone()["last_seq"]
+            entries = conn.execute("SELECT EXISTS (SELECT 1 FROM want_list_entry) AS e;").fetchone()["e"]
+            return last, self._match_head(conn), bool(entries)
+
+    def rematch(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Bring stored matches up to date with change_log. Only entries whose
+        cards or matched items changed since the last run are re-matched,
+        unless full=True, more than REMATCH_FULL_THRESHOLD changes piled up, or
+        the changes since the last run were pruned from the feed.
+        """
+        with write_conn() as conn:
+            last = conn.execute("SELECT last_seq FROM want_match_state WHERE id = 1;").fetchone()["last_seq"]
+            head = self._match_head(conn)
+            full = full or last < ChangeLogRepository._floor(conn)
+            changes = []
+            if not full:
+                changes = conn.execute(
+                    """
+                    SELECT table_name, row_id, row_json FROM change_log
+                    WHERE seq > ? AND table_name IN ('card', 'inventory_item')
+                    ORDER BY seq;
+                    """,
+                    (last,),
+                ).fetchall()
+                full = len(changes) > REMATCH_FULL_THRESHOLD
+
+            if full:
+                conn.execute("DELETE FROM want_list_match;")
+                self._match(conn, "1 = 1", [])
+                rematched = conn.execute("SELECT COUNT(*) AS n FROM want_list_entry;").fetchone()["n"]
+            else:
+                entry_ids = self._affected_entries(conn, changes)
+                for chunk, marks in _chunks(sorted(entry_ids)):
+                    conn.execute(f"DELETE FROM want_list_match WHERE entry_id IN ({marks});", chunk)
+                    self._match(conn, f"e.entry_id IN ({marks})", chunk)
+                rematched = len(entry_ids)
+
+            conn.execute("UPDATE want_match_state SET last_seq = ? WHERE id = 1;", (head,))
+            return {"from_seq": last, "to_seq": head, "changes": len(changes), "full": full, "entries_rematched": rematched}
+
+    def _affected_entries(self, conn, changes) -> set:
+        card_ids, item_ids = set(), set()
+        for ch in changes:
+            if ch["table_name"] == "card":
+                card_ids.add(ch["row_id"])
+            else:
+                item_ids.add(ch["row_id"])
+                if ch["row_json"]:
+                    card_ids.add(json.loads(ch["row_json"])["card_id"])
+
+        entries = set()
+        for chunk, marks in _chunks(sorted(item_ids)):
+            entries.update(_ids(conn, f"SELECT entry_id AS id FROM want_list_match WHERE item_id IN ({marks});", chunk))
+        for chunk, marks in _chunks(sorted(card_ids)):
+            # entries matched through the card before the change (e.g. a renamed card) ...
+            entries.update(_ids(conn, f"SELECT entry_id AS id FROM want_list_match WHERE card_id IN ({marks});", chunk))
+            # ... and entries that resolve to it now, by number or by name
+            entries.update(_ids(
+                conn,
+                f"""
+                SELECT e.entry_id AS id
+                FROM card c
+                JOIN card_set s ON s.set_id = c.set_id
+                JOIN want_list_entry e ON e.set_code = s.set_code AND e.card_number = c.card_number
+                WHERE c.card_id IN ({marks})
+                UNION
+                SELECT e.entry_id AS id
+                FROM card c
+                JOIN want_list_entry e ON lower(e.card_name) = lower(c.card_name)
+                WHERE c.card_id IN ({marks}) AND e.card_number IS NULL;
+                """,
+                chunk + chunk,
+            ))
+        return entries
+
+
+# -----------------------
+# change_log (read side)
+# -----------------------
+CATALOG_TABLES = ("card_set", "card", "card_condition")
+
+
+class ChangeLogRepository:
+    def get_since(self, since: int, limit: int = 500, table_name: Optional[str] = None):
+        """Changes after `since`, oldest first; None when `since` is below the feed floor (see 13_change_feed.sql)."""
+        with get_conn() as conn:
+            if table_name:
+                rows = conn.execute(
+                    """
+                    SELECT * FROM change_log
+                    WHERE table_name = ? AND seq > ?
+                    ORDER BY seq
+                    LIMIT ?;
+                    """,
+                    (table_name, since, limit),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?;",
+                    (since, limit),
+                ).fetchall()
+            # read after the rows: a prune that removed any of them has moved the floor by now
+            if since < self._floor(conn):
+                return None
+            return rows
+
+    @staticmethod
+    def _floor(conn, schema: str = "") -> int:
+        return int(conn.execute(f"SELECT floor_seq FROM {schema}change_feed WHERE id = 1;").fetchone()["floor_seq"])
+
+    def floor_seq(self) -> int:
+        with get_conn() as conn:
+            return self._floor(conn)
+
+    def latest_seq(self) -> int:
+        """The change_log head, never below the floor, so a client starting there is not told to resync."""
+        with get_conn() as conn:
+            row = conn.execute("SELECT COALESCE(MAX(seq), 0) AS last_seq FROM change_log;").fetchone()
+            return max(int(row["last_seq"]), self._floor(conn))
+
+    def table_heads(self, table_names: Iterable[str]) -> Dict[str, int]:
+        """Latest seq per table (at least the floor); one indexed lookup per table."""
+        table_names = list(table_names)
+        # in a tenant shard the catalog tables are written (and logged) in the attached main database
+        tenant = current_tenant() is not None
+        parts = [
+            "SELECT ? AS table_name, COALESCE(MAX(seq), 0) AS head FROM {} WHERE table_name = ?".format(
+                "catalog.change_log" if tenant and t in CATALOG_TABLES else "change_log"
+            )
+            for t in table_names
+        ]
+        params = [p for t in table_names for p in (t, t)]
+        # pruned or restored tables must not fall back to a version an older state already had
+        parts.append("SELECT 'floor' AS table_name, floor_seq AS head FROM change_feed WHERE id = 1")
+        if tenant:
+            parts.append("SELECT 'catalog.floor' AS table_name, floor_seq AS head FROM catalog.change_feed WHERE id = 1")
+        with get_conn() as conn:
+            heads = {r["table_name"]: int(r["head"]) for r in conn.execute(" UNION ALL ".join(parts) + ";", params)}
+        return {
+            t: max(heads[t], heads["catalog.floor" if tenant and t in CATALOG_TABLES else "floor"])
+            for t in table_names
+        }
@@ -0,0 +1,53 @@
+# serve.py
+"""
+Multi-process serving mode.
+
+Starts N uvicorn worker processes on one port. Reads run in every worker in
+parallel (SQLite WAL lets readers proceed while a write is in progress);
+writes are funneled through db.write_conn(), which holds a single
+cross-process writer lock, so workers queue for the write slot instead of
+fighting over SQLite's database lock.
+
+    python serve.py --workers 4 --port 8000
+
+The same app also runs under gunicorn:
+
+    POKEMON_REQUIRE_WAL=1 gunicorn -k uvicorn.workers.UvicornWorker -w 4 api:app
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+import uvicorn
+
+from db import get_backend
+from startup import prepare
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the Pokemon Card Tracker API with N worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+
+    multi = args.workers > 1
+    # create / migrate the database once here, before the workers race to do it
+    report = prepare(require_wal=multi)
+    if multi:
+        # each worker re-checks on startup (see api.lifespan)
+        os.environ["POKEMON_REQUIRE_WAL"] = "1"
+
+    backend = get_backend()
+    print(f"DB: {backend.name} {getattr(backend, 'path', '')} ({report.phases['schema']['detail']}, "
+          f"{report.phases['bootstrap']['detail']}), workers: {args.workers}")
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# singleflight.py
+"""
+Request coalescing ("single-flight") for identical concurrent reads.
+
+The first caller for a key runs the function (the leader); callers that
+arrive with the same key while it is running wait for, and share, the
+leader's result or exception instead of running the same query again.
+Once the flight lands the key is forgotten, so later calls run fresh.
+
+Callers are threadpool code: do() blocks the calling thread while it waits.
+At most max_keys flights are tracked at once; beyond that calls run
+uncoalesced rather than growing the table without bound.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    def __init__(self, max_keys: int = 1024):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+        self.stats = {"leaders": 0, "followers": 0, "bypassed": 0, "errors": 0}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Return (future, is_leader); future is None when over the key bound."""
+        with self._lock:
+            fut = self._flights.get(key)
+            if fut is not None:
+                self.stats["followers"] += 1
+                return fut, False
+            if len(self._flights) >= self.max_keys:
+                self.stats["bypassed"] += 1
+                return None, False
+            fut = Future()
+            self._flights[key] = fut
+            self.stats["leaders"] += 1
+            return fut, True
+
+    def _land(self, key: Hashable, fut: Future, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+            if error is not None:
+                self.stats["errors"] += 1
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        fut, leader = self._join(key)
+        if fut is None:
+            return fn()
+        if not leader:
+            return fut.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._land(key, fut, error=e)
+            raise
+        self._land(key, fut, result=result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"max_keys": self.max_keys, "in_flight": self.in_flight(), **self.stats}
@@ -0,0 +1,266 @@
+# startup.py
+"""
+Startup: find or create the database, then warm it up before the API
+reports ready.
+
+    python startup.py                      # prepare + warm, print the phase timings
+    python startup.py --db /data/cards.db  # same, for another file
+    POKEMON_DB_PATH=/data/cards.db uvicorn api:app
+
+Phases, each timed:
+
+- resolve:   the database is POKEMON_DB_URL (PostgreSQL), else the SQLite
+             file POKEMON_DB_PATH, else db.RUNTIME_DB (data/, ignored by
+             git).
+- bootstrap: only for a database that does not exist yet. A missing
+             RUNTIME_DB is a copy of the database shipped with the project
+             (db.seed_db(), read-only: it stays as committed); any other
+             missing SQLite file, or RUNTIME_DB when nothing was shipped,
+             is built by running every SQL/NN_*.sql script (schema, seeds,
+             migrations) in one transaction. Either way the file is made
+             under a temporary name and hard-linked into place, so nobody
+             ever sees a half-built file and two workers starting at once
+             don't both install theirs. An empty PostgreSQL database gets
+             init_schema(seed=True), and POKEMON_DB_PATH=:memory: gets the
+             same scripts loaded in memory.
+- schema:    opens a connection, which applies pending migrations, and
+             switches SQLite to WAL.
+- pool:      PostgreSQL opens its connection pool and waits for min_size
+             connections. SQLite opens a connection per call, so there is
+             nothing to fill.
+- indexes:   SQLite reads every b-tree of the hot tables (the table and
+             each of its indexes) once, so the first requests find their
+             pages in the OS page cache.
+- caches:    the API builds its unfiltered reference lists (sets,
+             conditions, cards, inventory) into the response cache.
+
+The API runs resolve, bootstrap and schema before it accepts requests and
+the warm phases in a background thread. GET /ready answers 503 until they
+are done, then 200 with the timings. POKEMON_WARMUP=0 skips the warm
+phases. A failed warm phase is recorded in its detail and does not hold
+readiness back: the database works, only colder.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import db
+
+HOT_TABLES = ("card_set", "card", "card_condition", "inventory_item")
+
+# (name, fn) pairs run in the caches phase; fn returns anything
+Warmer = Tuple[str, Callable[[], Any]]
+
+
+class StartupReport:
+    """Phase timings and readiness; read by GET /ready from any thread."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.current: Optional[str] = None
+        self.ready = False
+        self.total_ms: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time one phase; the block may set info["detail"]."""
+        self.current = name
+        info: Dict[str, Any] = {"detail": None}
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            info["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self.phases[name] = info
+            self.current = None
+
+    def mark_ready(self) -> None:
+        self.total_ms = round((time.perf_counter() - self._t0) * 1000, 1)
+        self.ready = True
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{name} {p['ms']} ms" for name, p in self.phases.items())
+        return f"startup: ready in {self.total_ms} ms ({parts})"
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = self.total_ms if self.ready else round((time.perf_counter() - self._t0) * 1000, 1)
+        return {
+            "ready": self.ready,
+            "phase": self.current,
+            "elapsed_ms": elapsed,
+            "phases": {name: dict(p) for name, p in self.phases.items()},
+        }
+
+
+# -----------------------
+# Bootstrap
+# -----------------------
+def bootstrap_sqlite(path: Path, scripts: Optional[Sequence[Path]] = None,
+                     source: Optional[Path] = None) -> bool:
+    """Create the database file at `path`, a copy of `source` or else built from the SQL scripts; False if it already exists."""
+    path = Path(path)
+    if path.exists():
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.bootstrap-{os.getpid()}")
+    tmp.unlink(missing_ok=True)
+    try:
+        conn = sqlite3.connect(str(tmp), isolation_level=None)
+        try:
+            if source is not None:
+                src = sqlite3.connect(f"{Path(source).resolve().as_uri()}?mode=ro", uri=True)
+                try:
+                    src.backup(conn)
+                finally:
+                    src.close()
+            else:
+                db.build_database(conn, scripts)
+        finally:
+            conn.close()
+        try:
+            os.link(tmp, path)  # atomic, and fails instead of replacing a file another worker just made
+        except FileExistsError:
+            return False
+    finally:
+        tmp.unlink(missing_ok=True)
+    return True
+
+
+def _bootstrap_postgres(backend) -> bool:
+    with backend.connection() as conn:
+        exists = conn.execute("SELECT to_regclass('card_set') AS t;").fetchone()["t"]
+    if exists:
+        return False
+    backend.init_schema(seed=True)  # one connection, committed once at the end
+    return True
+
+
+# -----------------------
+# Warm-up
+# -----------------------
+def warm_indexes(backend) -> int:
+    """Read each hot table and each of its indexes once; returns the number of b-trees read."""
+    read = 0
+    with backend.connection() as conn:
+        for table in HOT_TABLES:
+            # COUNT(*) walks every page of the b-tree it counts
+            conn.execute(f"SELECT COUNT(*) FROM {table} NOT INDEXED;").fetchone()
+            read += 1
+            for index in conn.execute(f"PRAGMA index_list({table});").fetchall():
+                try:
+                    conn.execute(f'SELECT COUNT(*) FROM {table} INDEXED BY "{index["name"]}";').fetchone()
+                    read += 1
+                except sqlite3.OperationalError:
+                    pass  # a partial index can't serve an unfiltered count
+    return read
+
+
+def prepare(report: Optional[StartupReport] = None, path: Optional[Path] = None,
+            require_wal: bool = False) -> StartupReport:
+    """resolve, bootstrap and schema: after this the database is usable. `path` overrides POKEMON_DB_PATH."""
+    report = report or StartupReport()
+    with report.phase("resolve") as info:
+        if path is not None:
+            db.use_backend(db.SQLiteBackend(Path(path)))
+        backend = db.get_backend()
+        where = getattr(backend, "path", None) or getattr(backend, "label", "")  # label: in-memory
+        info["detail"] = f"{backend.name} {where}".strip()
+
+    with report.phase("bootstrap") as info:
+        if backend.name == "postgres":
+            created = _bootstrap_postgres(backend)
+        elif getattr(backend, "read_only", False):
+            created = False  # replicas come from the shipper, never from the scripts
+        elif isinstance(backend, db.MemoryBackend):
+            created = backend.load_scripts()
+        else:
+            source = db.seed_db() if backend.path == db.RUNTIME_DB else None
+            created = bootstrap_sqlite(backend.path, source=source)
+            if created and source is not None:
+                info["detail"] = f"copied from {source}"
+        info["detail"] = info["detail"] or ("created from SQL scripts" if created else "existing database")
+
+    with report.phase("schema") as info:
+        info["detail"] = f"journal_mode={db.check_wal(required=require_wal)}"
+    return report
+
+
+def warm(report: StartupReport, warmers: Sequence[Warmer] = ()) -> StartupReport:
+    """pool, indexes and caches, then mark the report ready."""
+    backend = db.get_backend()
+    with report.phase("pool") as info:
+        try:
+            if backend.name == "postgres":
+                info["detail"] = f"{backend.open_pool()} connection(s)"
+            else:
+                info["detail"] = "none (SQLite connects per call)"
+        except Exception as e:
+            info["detail"] = f"failed: {e}"
+
+    with report.phase("indexes") as info:
+        try:
+            if backend.name == "sqlite":
+                info["detail"] = f"{warm_indexes(backend)} b-tree(s) read"
+            else:
+                info["detail"] = "skipped (PostgreSQL)"
+        except db.DB_ERRORS as e:
+            info["detail"] = f"failed: {e}"
+
+    with report.phase("caches") as info:
+        done = []
+        for name, fn in warmers:
+            try:
+                fn()
+                done.append(name)
+            except Exception as e:
+                done.append(f"{name} failed: {e}")
+        info["detail"] = ", ".join(done) or "none"
+
+    report.mark_ready()
+    return report
+
+
+def warm_in_background(report: StartupReport, warmers: Sequence[Warmer] = ()) -> threading.Thread:
+    def run() -> None:
+        warm(report, warmers)
+        print(report.summary(), file=sys.stderr)
+
+    thread = threading.Thread(target=run, name="pokemon-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# -----------------------
+# CLI
+# -----------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create (if missing), migrate and warm the database.")
+    parser.add_argument("--db", type=Path, default=None, help="SQLite file (default: POKEMON_DB_PATH, else data/pokemon_cards.db)")
+    parser.add_argument("--no-warm", action="store_true", help="stop after the schema phase")
+    args = parser.parse_args()
+
+    try:
+        report = prepare(path=args.db)
+    except (OSError, RuntimeError, *db.DB_ERRORS) as e:
+        sys.exit(f"startup failed: {e}")
+    if args.no_warm:
+        report.mark_ready()
+    else:
+        warm(report)
+    print(json.dumps(report.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
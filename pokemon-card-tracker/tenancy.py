@@ -0,0 +1,60 @@
+# tenancy.py
+"""
+Per-tenant routing for the API (multi-tenant collections).
+
+Requests that carry an X-Tenant-Id header run against that tenant's shard
+(tenants/<tenant_id>.db, see db.ShardCache): inventory, sales, want lists,
+lot merges, set completion and the change feed are all per tenant, while
+sets, cards and conditions come from the shared catalog, which tenants can
+read but not write. Requests without the header use the main database as
+before, so single-user setups are unaffected.
+
+The middleware is plain ASGI so the tenant context variable is set before
+FastAPI dispatches; sync endpoints run in the threadpool with a copy of
+that context, so repositories pick up the right shard with no extra
+arguments.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from fastapi.responses import JSONResponse
+
+import db
+
+TENANT_HEADER = b"x-tenant-id"
+CATALOG_PREFIXES = ("/sets", "/cards", "/conditions")
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class TenantMiddleware:
+    def __init__(self, app, untenanted: Iterable[str] = ("/admin/tenants",)):
+        self.app = app
+        self.untenanted = tuple(untenanted)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        raw = dict(scope["headers"]).get(TENANT_HEADER)
+        path = scope["path"]
+        if raw is None or path.startswith(self.untenanted):
+            return await self.app(scope, receive, send)
+
+        tenant_id = raw.decode("latin-1").strip()
+        error = None
+        try:
+            if not db.shards().exists(tenant_id):
+                error = (404, f"unknown tenant {tenant_id}")
+        except ValueError as e:
+            error = (400, str(e))
+        except RuntimeError as e:  # not on SQLite
+            error = (501, str(e))
+        if error is None and scope["method"] not in READ_METHODS and path.startswith(CATALOG_PREFIXES):
+            # /sets/{id}/completion and /sets/{id}/inventory are reads; no tenant writes go under the catalog
+            error = (403, "the card catalog is read-only for tenants")
+        if error is not None:
+            return await JSONResponse({"detail": error[1]}, status_code=error[0])(scope, receive, send)
+
+        with db.use_tenant(tenant_id):
+            await self.app(scope, receive, send)
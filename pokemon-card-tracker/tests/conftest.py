@@ -0,0 +1,69 @@
+# conftest.py
+"""
+Shared fixtures. Every test that uses `client` gets its own in-memory clone
+of the seeded database (db.memory_clone()), served in-process by the API:
+
+    def test_something(client):
+        assert client.get("/sets").status_code == 200
+
+Run from pokemon-card-tracker/ with: python -m pytest -q
+"""
+
+import os
+
+# no background warm-up or maintenance threads while the suite imports api
+os.environ.setdefault("POKEMON_WARMUP", "0")
+os.environ.setdefault("POKEMON_MAINT_SECS", "0")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import db
+
+
+@pytest.fixture
+def backend():
+    clone = db.memory_clone()
+    yield clone
+    clone.close()
+
+
+@pytest.fixture
+def client(backend):
+    # not entered as a context manager: the lifespan would prepare the file database
+    previous = api.use_database(backend)
+    try:
+        yield TestClient(api.app)
+    finally:
+        api.use_database(previous)
+
+
+@pytest.fixture
+def file_backend(tmp_path):
+    """A seeded SQLite file (WAL), for what needs a real file: backups, replicas, tenants."""
+    from startup import bootstrap_sqlite
+
+    path = tmp_path / "pokemon_cards.db"
+    bootstrap_sqlite(path)
+    backend = db.SQLiteBackend(path)
+    backend.startup_check(require_wal=True)
+    previous = db.use_backend(backend)
+    try:
+        yield backend
+    finally:
+        db.use_backend(previous)
+
+
+@pytest.fixture
+def write_behind(client):
+    """`client` with inventory writes going through a WriteBehindQueue (POKEMON_WRITE_BEHIND=1)."""
+    from writebehind import WriteBehindQueue
+
+    queue = WriteBehindQueue(api.inv_repo, flush_ms=5)
+    previous, api.biz._write_queue = api.biz._write_queue, queue
+    try:
+        yield client
+    finally:
+        api.biz._write_queue = previous
+        queue.stop()
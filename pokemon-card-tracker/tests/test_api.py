@@ -0,0 +1,91 @@
+# test_api.py
+"""The API tier end to end (API -> business -> repositories) on an in-memory clone."""
+
+import pytest
+
+import api
+
+ITEM = {"card_id": 1, "condition_id": 1, "quantity": 2, "purchase_price": 3.5, "purchase_date": "2026-01-15"}
+
+
+def test_lists_the_seeded_catalog(client):
+    sets = client.get("/sets")
+    assert sets.status_code == 200
+    assert len(sets.json()) > 0
+    assert client.get("/conditions").status_code == 200
+
+
+def test_inventory_crud(client):
+    created = client.post("/inventory", json=ITEM)
+    assert created.status_code == 201
+    item_id = created.json()["item_id"]
+
+    assert client.get(f"/inventory/{item_id}").json()["quantity"] == 2
+    assert client.put(f"/inventory/{item_id}", json={"quantity": 5}).status_code == 200
+    assert client.get(f"/inventory/{item_id}").json()["quantity"] == 5
+    assert client.delete(f"/inventory/{item_id}").status_code == 200
+    assert client.get(f"/inventory/{item_id}").status_code == 404
+
+
+def test_each_test_gets_a_fresh_database(client):
+    # test_inventory_crud's row (and its change_log entries) must not be here
+    before = client.get("/changes/latest").json()["last_seq"]
+    client.post("/inventory", json=ITEM)
+    assert client.get("/changes/latest").json()["last_seq"] == before + 1
+
+
+def test_business_rules_answer_400(client):
+    assert client.post("/inventory", json={**ITEM, "quantity": 0}).status_code in (400, 422)
+    graded = {**ITEM, "is_graded": 1, "graded_company": "PSA", "grade": 11}
+    assert client.post("/inventory", json=graded).status_code == 400
+    assert client.post("/inventory", json={**ITEM, "card_id": 999999}).status_code == 400
+
+
+def test_change_feed_returns_new_rows(client):
+    since = client.get("/changes/latest").json()["last_seq"]
+    item_id = client.post("/inventory", json=ITEM).json()["item_id"]
+    changes = client.get("/changes", params={"since": since}).json()["changes"]
+    assert [(c["table_name"], c["row_id"], c["op"]) for c in changes] == [("inventory_item", item_id, "insert")]
+
+
+def test_want_list_matches_new_inventory(client):
+    card = client.get("/cards/1").json()
+    set_code = next(s["set_code"] for s in client.get("/sets").json() if s["set_id"] == card["set_id"])
+    want = client.post("/want-lists", json={
+        "customer": "Ash", "entries": [{"set_code": set_code, "card_number": card["card_number"]}],
+    }).json()
+    before = want["entries"][0]["available"]
+    client.post("/inventory", json=ITEM)
+    entries = client.get(f"/want-lists/{want['want_list_id']}/matches").json()["entries"]
+    assert entries[0]["available"] == before + ITEM["quantity"]
+
+
+def test_write_behind_maps_check_violations_to_400(client, write_behind):
+    item_id = client.post("/inventory", json=ITEM).json()["item_id"]
+    r = client.put(f"/inventory/{item_id}", json={"is_graded": 1, "graded_company": "XYZ", "grade": 9})
+    assert r.status_code == 400, r.text
+    assert client.put(f"/inventory/{item_id}", json={"quantity": 4}).status_code == 200
+    assert client.get(f"/inventory/{item_id}").json()["quantity"] == 4
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"is_graded": 1},
+        {"is_graded": 1, "graded_company": "PSA", "grade": 11},
+        {"card_id": 999999},
+        {"condition_id": 999999},
+    ],
+)
+def test_constraints_and_precheck_give_the_same_message(client, payload):
+    item_id = client.post("/inventory", json=ITEM).json()["item_id"]
+    details = {}
+    for mode in ("constraints", "precheck"):
+        previous, api.biz.validation = api.biz.validation, mode
+        try:
+            r = client.put(f"/inventory/{item_id}", json=payload)
+        finally:
+            api.biz.validation = previous
+        assert r.status_code == 400, (mode, r.text)
+        details[mode] = r.json()["detail"]
+    assert details["constraints"] == details["precheck"]
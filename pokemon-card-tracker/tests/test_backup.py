@@ -0,0 +1,55 @@
+# test_backup.py
+"""Online backups (backup.py) must not stall writers, and must produce a verifiable snapshot."""
+
+import threading
+import time
+
+from backup import BackupManager
+from repositories import InventoryRepository
+
+ITEM = {"card_id": 4, "condition_id": 1, "quantity": 1, "purchase_price": 1.0, "purchase_date": "2026-01-01"}
+
+
+def _latencies(op, stop: threading.Event, seconds: float) -> list:
+    out = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline and not stop.is_set():
+        start = time.perf_counter()
+        op()
+        out.append((time.perf_counter() - start) * 1000)
+    return sorted(out)
+
+
+def _p99(sorted_ms: list) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(0.99 * len(sorted_ms)))]
+
+
+def test_writes_keep_flowing_during_a_backup(file_backend, tmp_path):
+    repo = InventoryRepository()
+    repo.bulk_create(ITEM for _ in range(20000))  # enough pages for a multi-step backup
+    hot = repo.create(**ITEM)
+    op = lambda: repo.adjust(hot, 1)
+    manager = BackupManager(tmp_path / "backups", keep=1, pages=64)
+
+    baseline = _latencies(op, threading.Event(), 0.5)
+
+    done = threading.Event()
+    jobs = []
+
+    def backups() -> None:
+        deadline = time.perf_counter() + 1.0
+        while time.perf_counter() < deadline:
+            jobs.append(manager.run(file_backend))
+        done.set()
+
+    runner = threading.Thread(target=backups)
+    runner.start()
+    during = _latencies(op, done, 30.0)
+    runner.join()
+
+    assert jobs and all(j["state"] == "done" for j in jobs), jobs
+    assert jobs[-1]["pages_total"] > manager.pages  # really copied in several steps
+    assert len(during) > 0
+    # a writer may wait for one backup step, never for a whole backup
+    assert _p99(during) < max(10 * _p99(baseline), 50.0), (_p99(baseline), _p99(during))
+    assert manager.verify(jobs[-1]["snapshot"])
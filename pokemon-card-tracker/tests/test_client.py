@@ -0,0 +1,62 @@
+# test_client.py
+"""client.py retry rules, against an httpx.MockTransport (no server)."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from client import AsyncPokemonClient, PokemonClient
+
+
+def _failing_once(error_cls, body):
+    """Transport whose first request raises error_cls; later ones answer 200 with body."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append((request.method, request.url.path))
+        if len(calls) == 1:
+            raise error_cls("boom", request=request)
+        return httpx.Response(200, json=body)
+
+    return calls, handler
+
+
+@pytest.mark.parametrize("error_cls", [httpx.ReadTimeout, httpx.RemoteProtocolError])
+def test_post_is_not_resent_after_it_may_have_run(error_cls):
+    calls, handler = _failing_once(error_cls, {"item_id": 12, "quantity": 3})
+    with PokemonClient(transport=httpx.MockTransport(handler), backoff_s=0) as api:
+        with pytest.raises(error_cls):
+            api.adjust(12, -1)
+    assert calls == [("POST", "/inventory/12/adjust")]
+
+
+@pytest.mark.parametrize("error_cls", [httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout])
+def test_post_is_retried_when_it_was_never_sent(error_cls):
+    calls, handler = _failing_once(error_cls, {"item_id": 12, "quantity": 3})
+    with PokemonClient(transport=httpx.MockTransport(handler), backoff_s=0) as api:
+        assert api.adjust(12, -1) == {"item_id": 12, "quantity": 3}
+    assert calls == [("POST", "/inventory/12/adjust")] * 2
+
+
+def test_get_is_retried_after_a_read_timeout():
+    calls, handler = _failing_once(httpx.ReadTimeout, {"card_id": 1})
+    with PokemonClient(transport=httpx.MockTransport(handler), backoff_s=0) as api:
+        assert api.get_card(1) == {"card_id": 1}
+    assert len(calls) == 2
+
+
+def test_async_client_follows_the_same_rules():
+    async def run():
+        calls, handler = _failing_once(httpx.ReadTimeout, {"item_id": 1})
+        async with AsyncPokemonClient(transport=httpx.MockTransport(handler), backoff_s=0) as api:
+            with pytest.raises(httpx.ReadTimeout):
+                await api.create_item(card_id=1, condition_id=1)
+        assert calls == [("POST", "/inventory")]
+
+        calls, handler = _failing_once(httpx.ConnectError, {"item_id": 1})
+        async with AsyncPokemonClient(transport=httpx.MockTransport(handler), backoff_s=0) as api:
+            assert await api.create_item(card_id=1, condition_id=1) == {"item_id": 1}
+        assert len(calls) == 2
+
+    asyncio.run(run())
@@ -0,0 +1,127 @@
+# test_postgres.py
+"""
+PostgresBackend against a real server. The backend tests are skipped unless
+POKEMON_TEST_PG_URL points at a database they may create and drop tables in:
+
+    POKEMON_TEST_PG_URL=postgresql://localhost/pokemon_test python -m pytest -q tests/test_postgres.py
+
+The placeholder rewriting tests need no server.
+"""
+
+import os
+
+import pytest
+
+import db
+from db import _pg_sql, violated_constraint
+
+PG_URL = os.environ.get("POKEMON_TEST_PG_URL", "")
+TABLE = f"pokemon_test_{os.getpid()}"
+
+
+# -----------------------
+# _pg_sql (no server)
+# -----------------------
+def test_placeholders_become_percent_s():
+    assert _pg_sql("SELECT * FROM card WHERE card_id = ? AND set_id = ?;") == (
+        "SELECT * FROM card WHERE card_id = %s AND set_id = %s;"
+    )
+
+
+def test_literal_percent_is_escaped():
+    assert _pg_sql("SELECT * FROM card WHERE card_name LIKE 'Pika%' AND set_id = ?;") == (
+        "SELECT * FROM card WHERE card_name LIKE 'Pika%%' AND set_id = %s;"
+    )
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT '?' AS q, ?;", "SELECT '?' AS q, %s;"),
+        ("SELECT 'it''s ?' AS q WHERE x = ?;", "SELECT 'it''s ?' AS q WHERE x = %s;"),
+        ('SELECT "odd?name" FROM t WHERE x = ?;', 'SELECT "odd?name" FROM t WHERE x = %s;'),
+        ("SELECT ? -- why?\nFROM t;", "SELECT %s -- why?\nFROM t;"),
+        ("SELECT /* ? */ ?;", "SELECT /* ? */ %s;"),
+    ],
+)
+def test_question_marks_in_literals_and_comments_are_kept(sql, expected):
+    assert _pg_sql(sql) == expected
+
+
+# -----------------------
+# PostgresBackend (needs POKEMON_TEST_PG_URL)
+# -----------------------
+@pytest.fixture(scope="module")
+def pg():
+    if not PG_URL:
+        pytest.skip("POKEMON_TEST_PG_URL is not set")
+    if db.psycopg is None:
+        pytest.skip("psycopg is not installed")
+    backend = db.PostgresBackend(PG_URL, min_size=1, max_size=2)
+    with backend.connection() as conn:
+        conn.execute(f"CREATE TABLE {TABLE}_parent (id INTEGER PRIMARY KEY);")
+        conn.execute(
+            f"""
+            CREATE TABLE {TABLE} (
+              id      INTEGER PRIMARY KEY,
+              name    TEXT NOT NULL,
+              qty     INTEGER NOT NULL,
+              parent  INTEGER REFERENCES {TABLE}_parent(id),
+              CONSTRAINT ck_test_qty CHECK (qty >= 0),
+              CONSTRAINT uq_test_name UNIQUE (name)
+            );
+            """
+        )
+        conn.execute(f"INSERT INTO {TABLE}_parent (id) VALUES (1);")
+    yield backend
+    with backend.connection() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE};")
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE}_parent;")
+    backend.pool.close()
+
+
+@pytest.fixture
+def rows(pg):
+    yield
+    with pg.connection() as conn:
+        conn.execute(f"DELETE FROM {TABLE};")
+
+
+def test_question_mark_in_literal_reaches_the_server(pg):
+    with pg.connection() as conn:
+        row = conn.execute("SELECT '?' AS q, 'a%b' AS pct, ? AS p;", (7,)).fetchone()
+    assert (row["q"], row["pct"], row["p"]) == ("?", "a%b", 7)
+
+
+def test_bulk_insert_copies_rows(pg, rows):
+    data = [(i, f"card {i}", i % 5, 1 if i % 2 else None) for i in range(1, 2001)]
+    with pg.connection() as conn:
+        pg.bulk_insert(conn, TABLE, ("id", "name", "qty", "parent"), data)
+    with pg.connection() as conn:
+        row = conn.execute(f"SELECT COUNT(*) AS n, SUM(qty) AS q, COUNT(parent) AS p FROM {TABLE};").fetchone()
+    assert (row["n"], row["q"], row["p"]) == (2000, sum(r[2] for r in data), 1000)
+
+
+def test_iter_query_streams_every_row_in_order(pg):
+    # more rows than one fetch of the named cursor, so several round trips
+    got = [r["n"] for r in pg.iter_query("SELECT n FROM generate_series(1, ?) AS n ORDER BY n;", (2500,), size=1000)]
+    assert got == list(range(1, 2501))
+
+
+@pytest.mark.parametrize(
+    "sql, params, expected",
+    [
+        ("INSERT INTO {t} (id, name, qty) VALUES (?, ?, ?);", (1, "a", -1), ("check", "ck_test_qty")),
+        ("INSERT INTO {t} (id, name, qty) VALUES (?, ?, ?);", (2, "dup", 1), ("unique", "uq_test_name")),
+        ("INSERT INTO {t} (id, name, qty) VALUES (?, ?, ?);", (3, None, 1), ("not_null", "{t}.name")),
+        ("INSERT INTO {t} (id, name, qty, parent) VALUES (?, ?, ?, ?);", (4, "b", 1, 99), ("foreign_key", "{t}_parent_fkey")),
+    ],
+)
+def test_violated_constraint_reads_psycopg_diagnostics(pg, rows, sql, params, expected):
+    with pg.connection() as conn:
+        conn.execute(f"INSERT INTO {TABLE} (id, name, qty) VALUES (100, 'dup', 0);")
+    with pytest.raises(db.psycopg.IntegrityError) as info:
+        with pg.connection() as conn:
+            conn.execute(sql.format(t=TABLE), params)
+    kind, name = expected
+    assert violated_constraint(info.value) == (kind, name.format(t=TABLE))
@@ -0,0 +1,33 @@
+# test_sales.py
+"""Sales months archived to their own file (SaleRepository.archive_month / get_month)."""
+
+from pathlib import Path
+
+import pytest
+
+from business import PokemonCardBusiness
+from repositories import InventoryRepository
+
+ITEM = {"card_id": 4, "condition_id": 1, "quantity": 5, "purchase_price": 1.0, "purchase_date": "2020-01-01"}
+
+
+@pytest.mark.parametrize("folder", ["plain", "a#b", "c?d", "e%20f"])
+def test_archived_month_is_read_from_its_own_file(file_backend, tmp_path, folder):
+    biz = PokemonCardBusiness()
+    item_id = InventoryRepository().create(**ITEM)
+    biz.record_sale(item_id, 9.5, quantity=2, sold_at="2020-03-04")
+
+    path = biz.archive_sales_month("2020-03", tmp_path / folder)
+    assert folder in path
+    assert [(s["item_id"], s["quantity"]) for s in biz.list_sales("2020-03")] == [(item_id, 2)]
+
+
+def test_missing_archive_file_is_reported(file_backend, tmp_path):
+    biz = PokemonCardBusiness()
+    item_id = InventoryRepository().create(**ITEM)
+    biz.record_sale(item_id, 9.5, sold_at="2020-03-04")
+    path = biz.archive_sales_month("2020-03", tmp_path / "archive")
+
+    Path(path).unlink()
+    with pytest.raises(FileNotFoundError):
+        biz.list_sales("2020-03")
@@ -0,0 +1,43 @@
+# test_singleflight.py
+"""SingleFlight: concurrent callers for one key share the leader's result or error."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _run_together(flights, n, fn):
+    """n threads call flights.do("k", fn) while the leader is held inside fn."""
+    release = threading.Event()
+
+    def held():
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(n) as pool:
+        futs = [pool.submit(flights.do, "k", held) for _ in range(n)]
+        while flights.stats["leaders"] + flights.stats["followers"] < n:
+            threading.Event().wait(0.001)
+        release.set()
+        return [f.exception() or f.result() for f in futs]
+
+
+def test_concurrent_callers_share_one_flight():
+    calls = []
+    flights = SingleFlight()
+    results = _run_together(flights, 8, lambda: calls.append(1) or "rows")
+    assert results == ["rows"] * 8 and len(calls) == 1
+    assert flights.snapshot() == {"max_keys": 1024, "in_flight": 0, "leaders": 1, "followers": 7, "bypassed": 0, "errors": 0}
+
+
+def test_error_is_shared_and_counted_once_per_flight():
+    flights = SingleFlight()
+    results = _run_together(flights, 4, lambda: 1 / 0)
+    assert all(isinstance(r, ZeroDivisionError) for r in results)
+    assert flights.stats["errors"] == 1 and flights.in_flight() == 0
+    with pytest.raises(ZeroDivisionError):
+        flights.do("k", lambda: 1 / 0)  # the key was forgotten: a fresh flight
+    assert flights.stats["leaders"] == 2 and flights.stats["errors"] == 2
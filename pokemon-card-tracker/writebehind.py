@@ -0,0 +1,236 @@
+# writebehind.py
+"""
+Optional write-behind mode for inventory writes (card-show scanning bursts).
+
+Inventory creates and updates are accepted into an in-process queue and
+committed in group transactions (InventoryRepository.apply_batch) every
+flush_ms milliseconds or as soon as max_ops operations are waiting,
+whichever comes first. One transaction and one fsync then cover the whole
+group instead of one per request.
+
+- Repeated updates to the same item_id coalesce into one UPDATE (later
+  fields win, so five quantity edits become one write).
+- durable ack: the caller waits until its group has committed.
+- fast ack: the caller returns as soon as the op is queued. Creates always
+  wait because the caller needs the new item_id; they still share the
+  group commit.
+- pending(item_id) exposes queued fields so reads can overlay them
+  (read-your-writes).
+- A group whose transaction fails on a lock/busy timeout is retried after
+  each of RETRY_DELAYS_S. A group that still fails is dropped: waiting
+  callers get the error, and the dropped updates (which fast-ack callers
+  never hear about) are kept in dropped_updates() with last_error.
+
+Enable with POKEMON_WRITE_BEHIND=1 (see api.py).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from db import is_transient
+from repositories import InventoryRepository
+
+# waits before each retry of a group whose transaction failed transiently; then it is dropped
+RETRY_DELAYS_S = (0.05, 0.25, 1.0)
+DROPPED_KEPT = 100  # most recent dropped updates kept for GET /admin/write-behind
+
+
+class WriteBehindQueue:
+    def __init__(self, inv_repo: InventoryRepository, flush_ms: int = 50, max_ops: int = 500):
+        if flush_ms <= 0 or max_ops <= 0:
+            raise ValueError("flush_ms and max_ops must be positive")
+        self.inv_repo = inv_repo
+        self.flush_ms = flush_ms
+        self.max_ops = max_ops
+
+        self._cond = threading.Condition()
+        self._creates: List[Tuple[Dict[str, Any], Future]] = []
+        self._updates: Dict[int, Dict[str, Any]] = {}          # item_id -> merged fields
+        self._update_waiters: Dict[int, List[Future]] = {}
+        self._inflight: Dict[int, Dict[str, Any]] = {}          # taken by the flusher, not committed yet
+        self._oldest: Optional[float] = None
+        self._stopping = False
+        self._force = False
+
+        self.stats = {"ops": 0, "coalesced": 0, "flushes": 0, "rows_written": 0, "errors": 0,
+                      "retries": 0, "dropped_ops": 0, "last_error": None}
+        self._dropped: deque = deque(maxlen=DROPPED_KEPT)
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    # -----------------------
+    # producer side
+    # -----------------------
+    def submit_create(self, fields: Dict[str, Any]) -> Future:
+        fut: Future = Future()
+        with self._cond:
+            self._ensure_running()
+            self._creates.append((dict(fields), fut))
+            self._note_op()
+        return fut
+
+    def submit_update(self, item_id: int, fields: Dict[str, Any]) -> Future:
+        fut: Future = Future()
+        with self._cond:
+            self._ensure_running()
+            if item_id in self._updates:
+                self._updates[item_id].update(fields)
+                self.stats["coalesced"] += 1
+            else:
+                self._updates[item_id] = dict(fields)
+            self._update_waiters.setdefault(item_id, []).append(fut)
+            self._note_op()
+        return fut
+
+    def pending(self, item_id: int) -> Optional[Dict[str, Any]]:
+        """Queued (not yet committed) fields for item_id, if any."""
+        with self._cond:
+            if item_id not in self._inflight and item_id not in self._updates:
+                return None
+            fields = dict(self._inflight.get(item_id, {}))
+            fields.update(self._updates.get(item_id, {}))
+            return fields
+
+    def pending_all(self) -> Dict[int, Dict[str, Any]]:
+        with self._cond:
+            merged = {k: dict(v) for k, v in self._inflight.items()}
+            for k, v in self._updates.items():
+                merged.setdefault(k, {}).update(v)
+            return merged
+
+    def discard(self, item_id: int) -> None:
+        """Drop queued updates for an item that is about to be deleted."""
+        with self._cond:
+            self._updates.pop(item_id, None)
+            for fut in self._update_waiters.pop(item_id, []):
+                fut.set_result(False)
+
+    def flush(self) -> None:
+        """Commit everything queued right now (used on shutdown)."""
+        self._flush_once()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Ask the flusher to commit now and wait until nothing is queued or in flight."""
+        idle = lambda: not (self._creates or self._updates or self._inflight)
+        with self._cond:
+            if idle():
+                return True
+            self._force = True
+            self._cond.notify_all()
+            return self._cond.wait_for(idle, timeout)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._flush_once()
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._creates) + len(self._updates)
+
+    def dropped_updates(self) -> List[Dict[str, Any]]:
+        """Updates lost with a group that could not be committed, newest last."""
+        with self._cond:
+            return list(self._dropped)
+
+    # -----------------------
+    # flusher
+    # -----------------------
+    def _ensure_running(self) -> None:
+        if self._stopping:
+            raise RuntimeError("write-behind queue is stopped")
+
+    def _note_op(self) -> None:
+        self.stats["ops"] += 1
+        if self._oldest is None:
+            # first op of a new group: wake the flusher so it starts the flush_ms timer
+            self._oldest = time.monotonic()
+            self._cond.notify_all()
+        elif len(self._creates) + len(self._updates) >= self.max_ops:
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    depth = len(self._creates) + len(self._updates)
+                    if depth >= self.max_ops or (self._force and depth):
+                        break
+                    if self._oldest is not None:
+                        remaining = self.flush_ms / 1000 - (time.monotonic() - self._oldest)
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+            self._flush_once()
+
+    def _flush_once(self) -> None:
+        with self._cond:
+            creates, self._creates = self._creates, []
+            updates, self._updates = self._updates, {}
+            waiters, self._update_waiters = self._update_waiters, {}
+            self._inflight = updates
+            self._oldest = None
+        if not creates and not updates:
+            return
+        try:
+            self._commit(creates, updates, waiters)
+        finally:
+            with self._cond:
+                self._inflight = {}
+                self._force = False
+                self._cond.notify_all()  # wake drain() waiters
+
+    def _commit(self, creates, updates, waiters) -> None:
+        update_items = list(updates.items())
+        for delay in RETRY_DELAYS_S + (None,):
+            try:
+                results = self.inv_repo.apply_batch([f for f, _ in creates], update_items)
+                break
+            except Exception as e:  # whole transaction failed (e.g. database locked)
+                self.stats["errors"] += 1
+                self.stats["last_error"] = f"{type(e).__name__}: {e}"
+                if delay is None or not is_transient(e):
+                    self._drop(creates, update_items, waiters, e)
+                    return
+                self.stats["retries"] += 1
+                time.sleep(delay)  # new ops keep queueing; reads still see this group as pending
+
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += len(results)
+
+        for (_, fut), result in zip(creates, results[: len(creates)]):
+            self._resolve(fut, result)
+        for (item_id, _), result in zip(update_items, results[len(creates):]):
+            for fut in waiters.get(item_id, []):
+                self._resolve(fut, result)
+
+    def _drop(self, creates, update_items, waiters, error: Exception) -> None:
+        at = time.time()
+        with self._cond:
+            for item_id, fields in update_items:
+                self._dropped.append({"item_id": item_id, "fields": fields, "error": str(error), "at": at})
+        self.stats["dropped_ops"] += len(creates) + sum(len(futs) for futs in waiters.values())
+        for _, fut in creates:
+            fut.set_exception(error)
+        for futs in waiters.values():
+            for fut in futs:
+                fut.set_exception(error)
+
+    def _resolve(self, fut: Future, result: Any) -> None:
+        if isinstance(result, Exception):
+            self.stats["errors"] += 1
+            fut.set_exception(result)
+        else:
+            fut.set_result(result)